@@ -0,0 +1,50 @@
+"""1h bucket cache
+
+Revision ID: 20261019_000003
+Revises: 20251224_000002
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "20261019_000003"
+down_revision = "20251224_000002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bucket_1h",
+        sa.Column("bucket_ts", sa.BigInteger(), primary_key=True, nullable=False),
+        sa.Column("ingested_at", sa.BigInteger(), nullable=False),
+    )
+
+    op.create_table(
+        "item_bucket_1h",
+        sa.Column("bucket_ts", sa.BigInteger(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("avg_high", sa.Integer(), nullable=True),
+        sa.Column("high_vol", sa.Integer(), nullable=False),
+        sa.Column("avg_low", sa.Integer(), nullable=True),
+        sa.Column("low_vol", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket_ts", "item_id"),
+    )
+
+    op.create_index(
+        "ix_item_bucket_1h_item_ts",
+        "item_bucket_1h",
+        ["item_id", "bucket_ts"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_item_bucket_1h_item_ts", table_name="item_bucket_1h")
+    op.drop_table("item_bucket_1h")
+    op.drop_table("bucket_1h")
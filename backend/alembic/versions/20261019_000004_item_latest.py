@@ -0,0 +1,34 @@
+"""latest price cache
+
+Revision ID: 20261019_000004
+Revises: 20261019_000003
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "20261019_000004"
+down_revision = "20261019_000003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "item_latest",
+        sa.Column("item_id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("high", sa.Integer(), nullable=True),
+        sa.Column("high_time", sa.BigInteger(), nullable=True),
+        sa.Column("low", sa.Integer(), nullable=True),
+        sa.Column("low_time", sa.BigInteger(), nullable=True),
+        sa.Column("fetched_at", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("item_latest")
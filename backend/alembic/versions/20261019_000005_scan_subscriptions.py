@@ -0,0 +1,54 @@
+"""saved scan subscriptions
+
+Revision ID: 20261019_000005
+Revises: 20261019_000004
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+revision = "20261019_000005"
+down_revision = "20261019_000004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scan_subscription",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True, nullable=False),
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("request", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+        sa.Column("last_evaluated_ts", sa.BigInteger(), nullable=True),
+    )
+    op.create_table(
+        "scan_subscription_result",
+        sa.Column(
+            "subscription_id",
+            sa.Integer(),
+            sa.ForeignKey("scan_subscription.id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column("item_id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("dump_bucket_ts", sa.BigInteger(), primary_key=True, nullable=False),
+        sa.Column("first_seen_ts", sa.BigInteger(), nullable=False),
+        sa.Column("last_seen_ts", sa.BigInteger(), nullable=False),
+        sa.Column("result", postgresql.JSONB(), nullable=False),
+    )
+    op.create_index(
+        "ix_scan_subscription_result_first_seen", "scan_subscription_result", ["subscription_id", "first_seen_ts"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scan_subscription_result_first_seen", table_name="scan_subscription_result")
+    op.drop_table("scan_subscription_result")
+    op.drop_table("scan_subscription")
@@ -0,0 +1,61 @@
+"""leaner bucket tables: one btree per table, BRIN on bucket_ts, no empty rows
+
+Revision ID: 20261019_000006
+Revises: 20261019_000005
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "20261019_000006"
+down_revision = "20261019_000005"
+branch_labels = None
+depends_on = None
+
+# item_bucket_5m and item_bucket_1h: the primary key becomes (item_id, bucket_ts), which serves per-item reads
+# (series, backtests by item) and the ingest upsert; time-range scans (scan windows, prune, cold export) use a
+# BRIN index on bucket_ts, which ingest keeps correlated by appending bucket by bucket. 32 pages per range is
+# about one and a half 5m buckets of rows.
+BUCKET_TABLES = ("item_bucket_5m", "item_bucket_1h")
+BRIN_PAGES_PER_RANGE = 32
+
+
+def _swap_primary_key(table: str, columns: str) -> None:
+    # Build the new key's index first, so the table is never without a unique index.
+    op.execute(f"CREATE UNIQUE INDEX {table}_pkey_new ON {table} ({columns})")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_pkey_new")
+
+
+def upgrade() -> None:
+    for table in BUCKET_TABLES:
+        # Items listed with no trades on either side carry no information; ingest no longer stores them.
+        op.execute(
+            f"DELETE FROM {table} WHERE high_vol = 0 AND low_vol = 0 AND avg_high IS NULL AND avg_low IS NULL"
+        )
+        op.drop_index(f"ix_{table}_item_ts", table_name=table)
+        _swap_primary_key(table, "item_id, bucket_ts")
+        op.create_index(
+            f"ix_{table}_bucket_ts_brin",
+            table,
+            ["bucket_ts"],
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": BRIN_PAGES_PER_RANGE, "autosummarize": "on"},
+        )
+
+    # Same columns as the primary key.
+    op.drop_index("ix_item_timeseries_24h_item_ts", table_name="item_timeseries_24h")
+
+
+def downgrade() -> None:
+    # Deleted empty rows are not restored.
+    op.create_index("ix_item_timeseries_24h_item_ts", "item_timeseries_24h", ["item_id", "bucket_ts"], unique=False)
+
+    for table in BUCKET_TABLES:
+        op.drop_index(f"ix_{table}_bucket_ts_brin", table_name=table)
+        _swap_primary_key(table, "bucket_ts, item_id")
+        op.create_index(f"ix_{table}_item_ts", table, ["item_id", "bucket_ts"], unique=False)
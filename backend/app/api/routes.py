@@ -3,14 +3,24 @@ from __future__ import annotations
 from fastapi import APIRouter
 
 from app.api.routes_health import router as health_router
+from app.api.routes_metrics import router as metrics_router
+from app.api.routes_profiles import router as profiles_router
+from app.api.routes_related import router as related_router
 from app.api.routes_scan import router as scan_router
+from app.api.routes_search import router as search_router
 from app.api.routes_series import router as series_router
 from app.api.routes_spreads import router as spreads_router
+from app.api.routes_subscriptions import router as subscriptions_router
 
 router = APIRouter()
 router.include_router(health_router)
+router.include_router(metrics_router)
+router.include_router(profiles_router)
+router.include_router(related_router)
 router.include_router(scan_router)
+router.include_router(search_router)
 router.include_router(series_router)
 router.include_router(spreads_router)
+router.include_router(subscriptions_router)
 
 
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.db.instrumentation import update_pool_metrics
+from app.db.session import POOL_CAPACITY, engine
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """
+    Prometheus exposition of stage timings, upstream latency/errors, SQL timings and DB pool usage/saturation.
+    """
+    update_pool_metrics(engine.pool, capacity=POOL_CAPACITY)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
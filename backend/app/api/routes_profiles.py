@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.core.profiling import PROFILE_HEADER, PROFILE_QUERY_PARAM, is_authorized, list_profiles, profile_path
+
+router = APIRouter()
+
+
+def _require_access(request: Request) -> None:
+    # Same gate as triggering a profile; 404 so the endpoints are invisible when profiling is off.
+    value = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_PARAM)
+    if not is_authorized(value):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/profiles", include_in_schema=False)
+def profiles(request: Request) -> dict[str, list[dict[str, object]]]:
+    _require_access(request)
+    return {"profiles": [{"id": p.name, "bytes": p.stat().st_size} for p in list_profiles()]}
+
+
+@router.get("/profiles/{profile_id}", include_in_schema=False)
+def profile(profile_id: str, request: Request) -> FileResponse:
+    _require_access(request)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="profile not found")
+    return FileResponse(path, media_type="text/html", filename=path.name)
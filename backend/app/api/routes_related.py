@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.api.responses import json_response
+from app.core.metrics import StageTimer, stage
+from app.osrs.client import OsrsPricesClient
+from app.osrs.ingest import ensure_buckets_cached, ensure_mapping_cached, floor_to_5m
+from app.osrs.mapping import item_meta
+from app.scan.related import MAX_K, get_related_index
+
+router = APIRouter()
+
+
+class RelatedItem(BaseModel):
+    item_id: int
+    name: str
+    correlation: float
+    # 5m returns both items have in the window.
+    overlap: int
+
+
+class RelatedItemsResponse(BaseModel):
+    item_id: int
+    as_of: int
+    hours: int
+    related: list[RelatedItem]
+
+
+@router.get("/items/{item_id}/related", response_model=RelatedItemsResponse)
+async def related_items(
+    item_id: int,
+    hours: int = Query(24, ge=1, le=24),
+    k: int = Query(10, ge=1, le=MAX_K),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Items whose 5m mid-price returns correlate most with this one's over the last `hours`: candidates to move
+    with it when it dumps. Computed for all items at once and cached until the next bucket.
+    """
+    with StageTimer("item_related"):
+        now = floor_to_5m(int(time.time()))
+        client = OsrsPricesClient()
+        try:
+            await ensure_mapping_cached(db, client)
+            await ensure_buckets_cached(db, client, [now - 300 * i for i in range(hours * 12)])
+        finally:
+            await client.aclose()
+
+        table = await asyncio.to_thread(get_related_index().table, db, now, hours=hours)
+        if table is None:
+            raise HTTPException(status_code=503, detail=f"bucket {now} has not been ingested yet")
+        with stage("neighbours") as st:
+            neighbours = table.neighbours(item_id, k) or []
+            id_to_meta = item_meta(db)
+            st.rows = len(neighbours)
+        return json_response(
+            RelatedItemsResponse(
+                item_id=item_id,
+                as_of=table.as_of,
+                hours=hours,
+                related=[
+                    RelatedItem(item_id=j, name=id_to_meta.get(j, (f"item_{j}", None))[0], correlation=c, overlap=o)
+                    for j, c, o in neighbours
+                ],
+            )
+        )
@@ -1,102 +1,302 @@
 from __future__ import annotations
 
+import json
 import time
-from collections import defaultdict
+from collections.abc import AsyncIterator, Callable
+from typing import Literal
 
 from fastapi import APIRouter
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 import numpy as np
-from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
-from app.db.models import ItemBucket5m, ItemMapping
+from app.api.responses import json_response
+from app.core.metrics import StageTimer, stage
 from app.osrs.client import OsrsPricesClient
-from app.osrs.ingest import ensure_buckets_cached, ensure_mapping_cached, floor_to_5m
-from app.scan.compute import scan_item_series
-from app.scan.schemas import ScanRequest, ScanResponse
+from app.osrs.ingest import ensure_buckets_1h_cached, ensure_buckets_cached, ensure_mapping_cached, floor_to_5m
+from app.osrs.latest import LatestPrices, latest_prices
+from app.osrs.mapping import ItemMeta
+from app.scan.compute import baseline_blocks, baseline_hour_ts, scan_item_series, scan_window_blocks
+from app.scan.ewma_index import get_ewma_index
+from app.scan.kernels import SeriesKernels
+from app.scan.schemas import BaselineStat, ScanRequest, ScanResponse, ScanResult, ScanSweepRequest, ScanSweepResponse
+from app.scan.topk import TopK
+from app.scan.window import buy_limit_ok, load_hourly, load_window, price_ok, sort_and_trim
+from app.store.summary import get_summary_index
 
 router = APIRouter()
 
 
+def _ewma_results(
+    db: Session,
+    now: int,
+    req: ScanRequest,
+    id_to_meta: ItemMeta,
+    per_item: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]],
+    latest: LatestPrices | None,
+) -> dict[int, ScanResult] | None:
+    # baseline_stat="ewma" evaluates every item in one vectorized pass up front, against the held EWMA state;
+    # None for the other modes.
+    if req.baseline_stat != BaselineStat.ewma:
+        return None
+    with stage("scan_ewma") as st:
+        out = get_ewma_index().scan(
+            db,
+            now,
+            per_item,
+            req,
+            name_of=lambda item_id: id_to_meta.get(item_id, (f"item_{item_id}", None))[0],
+            latest_low=latest.low_at if latest is not None else None,
+        )
+        st.rows = len(per_item)
+    return out
+
+
+def _scan_candidates(db: Session, req: ScanRequest, now: int, blocks: int) -> Callable[[ItemMeta], set[int] | None]:
+    """
+    Filter pushdown from the rolling 24h summary: items that cannot pass the row-count, volume or buy-limit
+    checks of scan_item_series are not loaded at all. Conservative, since the scan's "daily" volume sums the
+    last 288 rows an item traded in (at least the last 24h); price filters need the baseline and stay post-scan.
+    """
+
+    def candidates(id_to_meta: ItemMeta) -> set[int] | None:
+        summary = get_summary_index().snapshot(db, now)
+        if summary is None:
+            return None  # some bucket of the day is missing: load everything
+        # At most (blocks - 288) of an item's rows in the window fall outside the last 24h.
+        need_rows = max(baseline_blocks(req) + req.event_window_blocks + 2, 288)
+        keep = summary.trade_buckets_24h + (blocks - 288) >= need_rows
+        if req.max_daily_volume_24h is not None:
+            keep &= summary.low_vol_24h <= req.max_daily_volume_24h
+        if req.min_daily_volume_24h is not None:
+            # Only exact when the item traded in every bucket of the day (its last 288 rows are the day).
+            keep &= (summary.trade_buckets_24h < 288) | (summary.low_vol_24h >= req.min_daily_volume_24h)
+        return {
+            item_id
+            for item_id in summary.item_ids[keep].tolist()
+            if buy_limit_ok(req, id_to_meta.get(item_id, ("", None))[1])
+        }
+
+    return candidates
+
+
 @router.post("/scan", response_model=ScanResponse)
-async def scan(req: ScanRequest, db: Session = Depends(get_db)) -> ScanResponse:
-    # Compute needed bucket timestamps for the scan window (aligned to 5m).
-    now = floor_to_5m(int(time.time()))
-    # We need baseline window plus event+still-low windows plus a small buffer.
-    blocks = req.baseline_hours * 12 + req.event_window_blocks + req.still_low_blocks + 4
-    # Daily volume metrics need a full 24h window ending now (288 buckets).
-    blocks = max(blocks, 288 + 8)
-    bucket_ts_list = [now - 300 * i for i in range(blocks)]
-
-    client = OsrsPricesClient()
-    try:
-        await ensure_mapping_cached(db, client)
-        ingest_meta = await ensure_buckets_cached(db, client, bucket_ts_list)
-    finally:
-        await client.aclose()
-
-    # Load mapping and time window data from DB
-    mapping_rows = db.execute(select(ItemMapping.item_id, ItemMapping.name, ItemMapping.limit)).all()
-    id_to_meta = {int(r[0]): (str(r[1]), (int(r[2]) if r[2] is not None else None)) for r in mapping_rows}
-
-    rows = db.execute(
-        select(
-            ItemBucket5m.item_id,
-            ItemBucket5m.bucket_ts,
-            ItemBucket5m.avg_low,
-            ItemBucket5m.low_vol,
-        ).where(ItemBucket5m.bucket_ts.in_(bucket_ts_list))
-    ).all()
-
-    per_item: dict[int, list[tuple[int, int | None, int]]] = defaultdict(list)
-    for item_id, bucket_ts, avg_low, low_vol in rows:
-        per_item[int(item_id)].append((int(bucket_ts), int(avg_low) if avg_low is not None else None, int(low_vol)))
-
-    results = []
-    for item_id, series in per_item.items():
-        name, buy_limit = id_to_meta.get(item_id, (f"item_{item_id}", None))
-
-        if req.min_buy_limit is not None:
-            if buy_limit is None or buy_limit < req.min_buy_limit:
+async def scan(
+    req: ScanRequest,
+    timings: bool = Query(False, description="Include per-stage timings in meta."),
+    db: Session = Depends(get_db),
+) -> Response:
+    with StageTimer("scan") as timer:
+        # Compute needed bucket timestamps for the scan window (aligned to 5m).
+        now = floor_to_5m(int(time.time()))
+        blocks = scan_window_blocks(req)
+        bucket_ts_list = [now - 300 * i for i in range(blocks)]
+        hour_ts = baseline_hour_ts(req, now)
+
+        client = OsrsPricesClient()
+        try:
+            await ensure_mapping_cached(db, client)
+            ingest_meta = await ensure_buckets_cached(db, client, bucket_ts_list)
+            if hour_ts:
+                ingest_meta["1h"] = await ensure_buckets_1h_cached(db, client, hour_ts)
+        finally:
+            await client.aclose()
+
+        # Load mapping and time window data from DB
+        id_to_meta, per_item = load_window(db, bucket_ts_list, _scan_candidates(db, req, now, blocks))
+        hourly = load_hourly(db, hour_ts, per_item.keys())
+        latest = latest_prices(db) if req.use_latest_price else None
+
+        ewma = _ewma_results(db, now, req, id_to_meta, per_item, latest)
+        results = []
+        with stage("scan_item_series") as st:
+            for item_id, (bucket_ts_arr, avg_low_arr, low_vol_arr) in per_item.items():
+                name, buy_limit = id_to_meta.get(item_id, (f"item_{item_id}", None))
+                if not buy_limit_ok(req, buy_limit):
+                    continue
+
+                r = ewma.get(item_id) if ewma is not None else scan_item_series(
+                    item_id=item_id,
+                    name=name,
+                    bucket_ts=bucket_ts_arr,
+                    avg_low=avg_low_arr,
+                    low_vol=low_vol_arr,
+                    req=req,
+                    baseline_1h=hourly.get(item_id),
+                    latest_low=latest.low_at(item_id) if latest is not None else None,
+                )
+                if r is not None and price_ok(req, r):
+                    results.append(r)
+            st.rows = len(per_item)
+
+        with stage("sort"):
+            results = sort_and_trim(results, req)
+
+        meta: dict[str, object] = {"ingest": ingest_meta, "candidates": len(per_item)}
+        if timings:
+            meta["timings"] = timer.as_meta()
+        return json_response(ScanResponse(results=results, meta=meta))
+
+
+@router.post("/scan/stream")
+async def scan_stream(
+    req: ScanRequest,
+    mode: Literal["top_k", "as_found"] = Query(
+        "top_k",
+        description="top_k: keep the best `limit` rows in a bounded heap and stream them sorted once the scan ends. "
+        "as_found: stream each row as soon as it is detected and stop after `limit` rows. `sort_by` is ignored: rows "
+        "come in item order, so with more than `limit` matches they are an arbitrary subset, not the best ones.",
+    ),
+    timings: bool = Query(False, description="Include per-stage timings in the trailing meta line."),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Same scan as POST /scan, streamed as NDJSON: one `{"result": ...}` line per row, then a `{"meta": ...}` line.
+
+    Only the DB work happens before the response starts; detection runs while streaming, so the session is not
+    held open and, in `as_found` mode, the first rows arrive before the scan has finished. `as_found` trades
+    ranking for latency: it ignores `sort_by` and returns the first `limit` matches found, in item order.
+    """
+    timer = StageTimer("scan_stream")
+    with timer:
+        now = floor_to_5m(int(time.time()))
+        blocks = scan_window_blocks(req)
+        bucket_ts_list = [now - 300 * i for i in range(blocks)]
+        hour_ts = baseline_hour_ts(req, now)
+
+        client = OsrsPricesClient()
+        try:
+            await ensure_mapping_cached(db, client)
+            ingest_meta = await ensure_buckets_cached(db, client, bucket_ts_list)
+            if hour_ts:
+                ingest_meta["1h"] = await ensure_buckets_1h_cached(db, client, hour_ts)
+        finally:
+            await client.aclose()
+
+        id_to_meta, per_item = load_window(db, bucket_ts_list, _scan_candidates(db, req, now, blocks))
+        hourly = load_hourly(db, hour_ts, per_item.keys())
+        latest = latest_prices(db) if req.use_latest_price else None
+        # The EWMA pass catches up the held state from Postgres, so it runs before the response too.
+        ewma = _ewma_results(db, now, req, id_to_meta, per_item, latest)
+
+    async def lines() -> AsyncIterator[bytes]:
+        top = TopK(req.limit, req.sort_by)
+        emitted = 0
+        t0 = time.perf_counter()
+        for item_id, (bucket_ts_arr, avg_low_arr, low_vol_arr) in per_item.items():
+            name, buy_limit = id_to_meta.get(item_id, (f"item_{item_id}", None))
+            if not buy_limit_ok(req, buy_limit):
                 continue
-        if req.max_buy_limit is not None:
-            if buy_limit is None or buy_limit > req.max_buy_limit:
+            r = ewma.get(item_id) if ewma is not None else scan_item_series(
+                item_id=item_id,
+                name=name,
+                bucket_ts=bucket_ts_arr,
+                avg_low=avg_low_arr,
+                low_vol=low_vol_arr,
+                req=req,
+                baseline_1h=hourly.get(item_id),
+                latest_low=latest.low_at(item_id) if latest is not None else None,
+            )
+            if r is None or not price_ok(req, r):
                 continue
+            if mode == "as_found":
+                yield b'{"result":' + r.model_dump_json().encode() + b"}\n"
+                emitted += 1
+                if emitted >= req.limit:
+                    break
+            else:
+                top.push(r)
+        timer.record("scan_item_series", time.perf_counter() - t0, len(per_item))
 
-        series.sort(key=lambda x: x[0])  # ascending time
+        for r in top.results():
+            yield b'{"result":' + r.model_dump_json().encode() + b"}\n"
+            emitted += 1
 
-        bucket_ts_arr = np.array([s[0] for s in series], dtype="int64")
-        avg_low_arr = np.array([np.nan if s[1] is None else float(s[1]) for s in series], dtype="float64")
-        low_vol_arr = np.array([float(s[2]) for s in series], dtype="float64")
+        meta: dict[str, object] = {"ingest": ingest_meta, "candidates": len(per_item), "results": emitted, "mode": mode}
+        if timings:
+            meta["timings"] = timer.as_meta()
+        yield json.dumps({"meta": meta}, separators=(",", ":")).encode() + b"\n"
 
-        r = scan_item_series(
-            item_id=item_id,
-            name=name,
-            bucket_ts=bucket_ts_arr,
-            avg_low=avg_low_arr,
-            low_vol=low_vol_arr,
-            req=req,
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/scan/sweep", response_model=ScanSweepResponse)
+async def scan_sweep(
+    body: ScanSweepRequest,
+    timings: bool = Query(False, description="Include per-stage timings in meta."),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Evaluate several ScanRequest variants over one ingested + loaded window (the largest any variant needs).
+
+    Each item's series is converted once; variants that share baseline/event window parameters also share the
+    rolling baselines, event prices and volume sums computed for it (see SeriesKernels).
+    """
+    if any(v.baseline_resolution != "5m" or v.use_latest_price or v.baseline_stat == BaselineStat.ewma for v in body.variants):
+        raise HTTPException(
+            status_code=422, detail="scan sweeps support 5m median/mean baselines without use_latest_price only"
         )
-        if r is not None:
-            if req.min_price is not None and r.baseline_price < req.min_price:
-                continue
-            if req.max_price is not None and r.baseline_price > req.max_price:
-                continue
-            results.append(r)
+    with StageTimer("scan_sweep") as timer:
+        variants = body.variants
+        now = floor_to_5m(int(time.time()))
+        blocks = max(scan_window_blocks(v) for v in variants)
+        bucket_ts_list = [now - 300 * i for i in range(blocks)]
+
+        client = OsrsPricesClient()
+        try:
+            await ensure_mapping_cached(db, client)
+            ingest_meta = await ensure_buckets_cached(db, client, bucket_ts_list)
+        finally:
+            await client.aclose()
 
-    # Sort and trim
-    if req.sort_by == "most_recent":
-        results.sort(key=lambda r: r.dump_bucket_ts, reverse=True)
-    elif req.sort_by == "biggest_volume":
-        results.sort(key=lambda r: r.event_volume, reverse=True)
-    elif req.sort_by == "biggest_event_daily_pct":
-        results.sort(key=lambda r: (r.event_daily_pct or -1.0), reverse=True)
-    else:
-        results.sort(key=lambda r: r.price_drop_pct)  # more negative first
+        id_to_meta, per_item = load_window(db, bucket_ts_list)
+        # Each variant sees only its own window: rows with bucket_ts >= its first bucket.
+        window_start = [now - 300 * (scan_window_blocks(v) - 1) for v in variants]
 
-    results = results[: req.limit]
+        results: list[list[ScanResult]] = [[] for _ in variants]
+        candidates = [0 for _ in variants]
+        with stage("scan_kernels") as st:
+            for item_id, (bucket_ts_arr, avg_low_arr, low_vol_arr) in per_item.items():
+                name, buy_limit = id_to_meta.get(item_id, (f"item_{item_id}", None))
+                kernels = SeriesKernels(avg_low_arr, low_vol_arr)
+                n = bucket_ts_arr.size
 
-    return ScanResponse(results=results, meta={"ingest": ingest_meta, "candidates": len(per_item)})
+                for vi, req in enumerate(variants):
+                    start = int(np.searchsorted(bucket_ts_arr, window_start[vi], side="left"))
+                    if start < n:
+                        candidates[vi] += 1
+                    if not buy_limit_ok(req, buy_limit):
+                        continue
+                    d = kernels.evaluate(start=start, end=n, req=req)
+                    if d is None:
+                        continue
+                    r = ScanResult(
+                        item_id=item_id,
+                        name=name,
+                        dump_bucket_ts=int(bucket_ts_arr[d.t]),
+                        baseline_price=d.baseline_price,
+                        event_price=d.event_price,
+                        price_drop_pct=d.price_drop_pct,
+                        event_volume=d.event_volume,
+                        baseline_mean_5m_volume=d.baseline_mean_5m_volume,
+                        daily_volume_24h=d.daily_volume_24h,
+                        event_daily_pct=d.event_daily_pct,
+                        still_low=True,
+                        latest_price=d.latest_price,
+                    )
+                    if price_ok(req, r):
+                        results[vi].append(r)
+            st.rows = len(per_item) * len(variants)
 
+        with stage("sort"):
+            per_variant = [
+                ScanResponse(results=sort_and_trim(res, req), meta={"candidates": candidates[vi]})
+                for vi, (req, res) in enumerate(zip(variants, results))
+            ]
 
+        meta: dict[str, object] = {"ingest": ingest_meta, "candidates": len(per_item), "window_blocks": blocks}
+        if timings:
+            meta["timings"] = timer.as_meta()
+        return json_response(ScanSweepResponse(variants=per_variant, meta=meta))
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, Query, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.api.responses import json_response
+from app.core.metrics import StageTimer, stage
+from app.osrs.search import get_search_index
+
+router = APIRouter()
+
+
+class ItemSearchResult(BaseModel):
+    item_id: int
+    name: str
+    buy_limit: int | None = None
+    daily_volume_24h: int
+    # "exact" | "prefix" | "word_prefix" | "fuzzy"
+    match: str
+
+
+class ItemSearchResponse(BaseModel):
+    query: str
+    results: list[ItemSearchResult]
+
+
+@router.get("/items/search", response_model=ItemSearchResponse)
+def search_items(
+    q: str = Query(..., min_length=1, max_length=100, description="Item name or its beginning; typos are tolerated."),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Autocomplete over item names from the in-memory search index, ranked by match quality then 24h volume.
+    """
+    with StageTimer("item_search"):
+        with stage("search") as st:
+            hits = get_search_index().search(db, q, limit=limit)
+            st.rows = len(hits)
+        return json_response(ItemSearchResponse(query=q, results=[ItemSearchResult(**asdict(h)) for h in hits]))
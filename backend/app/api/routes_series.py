@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import math
 import time
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.api.responses import json_response
+from app.core.metrics import StageTimer, stage
 from app.db.models import ItemBucket5m
+from app.db.queries import ts_in
 from app.osrs.client import OsrsPricesClient
 from app.osrs.ingest import ensure_buckets_cached, floor_to_5m
+from app.store.cold import query_history
+from app.store.columnar import get_store
 
 router = APIRouter()
 
@@ -30,48 +36,109 @@ async def item_series(
     item_id: int,
     hours: int = Query(24, ge=1, le=48),
     db: Session = Depends(get_db),
-) -> ItemSeriesResponse:
+) -> Response:
     """
     Return a fixed-step 5m series for the last `hours` hours ending at 'now', aligned to 5m boundaries.
     """
-    end_ts = floor_to_5m(int(time.time()))
-    start_ts = end_ts - hours * 3600
-    start_ts = floor_to_5m(start_ts)
-
-    bucket_ts_list = list(range(start_ts, end_ts + 1, 300))
-
-    # Ensure buckets are present (optional but makes charts work even if scan wasn't run yet).
-    client = OsrsPricesClient()
-    try:
-        await ensure_buckets_cached(db, client, bucket_ts_list)
-    finally:
-        await client.aclose()
-
-    rows = db.execute(
-        select(ItemBucket5m.bucket_ts, ItemBucket5m.avg_low)
-        .where(ItemBucket5m.item_id == item_id)
-        .where(ItemBucket5m.bucket_ts.in_(bucket_ts_list))
-    ).all()
-    by_ts = {int(ts): (int(avg) if avg is not None else None) for ts, avg in rows}
-
-    rows_h = db.execute(
-        select(ItemBucket5m.bucket_ts, ItemBucket5m.avg_high)
-        .where(ItemBucket5m.item_id == item_id)
-        .where(ItemBucket5m.bucket_ts.in_(bucket_ts_list))
-    ).all()
-    by_ts_h = {int(ts): (int(avg) if avg is not None else None) for ts, avg in rows_h}
-
-    timestamps = bucket_ts_list
-    avg_low = [by_ts.get(ts) for ts in bucket_ts_list]
-    avg_high = [by_ts_h.get(ts) for ts in bucket_ts_list]
-
-    return ItemSeriesResponse(
-        item_id=item_id,
-        start_ts=start_ts,
-        end_ts=end_ts,
-        timestamps=timestamps,
-        avg_low=avg_low,
-        avg_high=avg_high,
-    )
-
-
+    with StageTimer("item_series"):
+        end_ts = floor_to_5m(int(time.time()))
+        start_ts = end_ts - hours * 3600
+        start_ts = floor_to_5m(start_ts)
+
+        bucket_ts_list = list(range(start_ts, end_ts + 1, 300))
+
+        # Ensure buckets are present (optional but makes charts work even if scan wasn't run yet).
+        client = OsrsPricesClient()
+        try:
+            await ensure_buckets_cached(db, client, bucket_ts_list)
+        finally:
+            await client.aclose()
+
+        store = get_store()
+        view = store.complete_window(bucket_ts_list) if store is not None else None
+        if view is not None:
+            with stage("load_columnar") as st:
+                row = store.row(item_id)
+                if row is None:
+                    avg_low = [None] * len(bucket_ts_list)
+                    avg_high = [None] * len(bucket_ts_list)
+                else:
+                    traded = view.traded[row].view(bool)
+                    avg_low = [int(v) if t and not math.isnan(v) else None for t, v in zip(traded.tolist(), view.avg_low[row].tolist())]
+                    avg_high = [int(v) if t and not math.isnan(v) else None for t, v in zip(traded.tolist(), view.avg_high[row].tolist())]
+                st.rows = len(bucket_ts_list)
+        else:
+            with stage("load_rows") as st:
+                rows = db.execute(
+                    select(ItemBucket5m.bucket_ts, ItemBucket5m.avg_low)
+                    .where(ItemBucket5m.item_id == item_id)
+                    .where(ts_in(ItemBucket5m.bucket_ts, bucket_ts_list, step=300))
+                ).all()
+                by_ts = {int(ts): (int(avg) if avg is not None else None) for ts, avg in rows}
+
+                rows_h = db.execute(
+                    select(ItemBucket5m.bucket_ts, ItemBucket5m.avg_high)
+                    .where(ItemBucket5m.item_id == item_id)
+                    .where(ts_in(ItemBucket5m.bucket_ts, bucket_ts_list, step=300))
+                ).all()
+                by_ts_h = {int(ts): (int(avg) if avg is not None else None) for ts, avg in rows_h}
+                st.rows = len(rows) + len(rows_h)
+
+            avg_low = [by_ts.get(ts) for ts in bucket_ts_list]
+            avg_high = [by_ts_h.get(ts) for ts in bucket_ts_list]
+
+        timestamps = bucket_ts_list
+        return json_response(
+            ItemSeriesResponse(
+                item_id=item_id,
+                start_ts=start_ts,
+                end_ts=end_ts,
+                timestamps=timestamps,
+                avg_low=avg_low,
+                avg_high=avg_high,
+            )
+        )
+
+
+_MAX_HISTORY_SECONDS = 90 * 86400
+
+
+@router.get("/items/{item_id}/history", response_model=ItemSeriesResponse)
+def item_history(
+    item_id: int,
+    start_ts: int | None = Query(None, description="Unix seconds; defaults to 7 days before end_ts."),
+    end_ts: int | None = Query(None, description="Unix seconds; defaults to now."),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Fixed-step 5m series over an arbitrary past range (up to 90 days) from stored history only: Postgres plus
+    the Parquet cold store. Unlike /series it never fetches missing buckets from upstream.
+    """
+    with StageTimer("item_history"):
+        end_ts = floor_to_5m(end_ts if end_ts is not None else int(time.time()))
+        start_ts = floor_to_5m(start_ts if start_ts is not None else end_ts - 7 * 86400)
+        if start_ts > end_ts or end_ts - start_ts > _MAX_HISTORY_SECONDS:
+            raise HTTPException(status_code=422, detail="start_ts..end_ts must be a non-empty range of at most 90 days")
+
+        with stage("load_history") as st:
+            data = query_history(db, "item_bucket_5m", start_ts, end_ts, item_ids=[item_id], columns=("avg_low", "avg_high"))
+            st.rows = int(data["bucket_ts"].size)
+
+        timestamps = list(range(start_ts, end_ts + 1, 300))
+        idx = (data["bucket_ts"] - start_ts) // 300
+        avg_low: list[int | None] = [None] * len(timestamps)
+        avg_high: list[int | None] = [None] * len(timestamps)
+        for i, lo, hi in zip(idx.tolist(), data["avg_low"].tolist(), data["avg_high"].tolist()):
+            avg_low[i] = None if math.isnan(lo) else int(lo)
+            avg_high[i] = None if math.isnan(hi) else int(hi)
+
+        return json_response(
+            ItemSeriesResponse(
+                item_id=item_id,
+                start_ts=start_ts,
+                end_ts=end_ts,
+                timestamps=timestamps,
+                avg_low=avg_low,
+                avg_high=avg_high,
+            )
+        )
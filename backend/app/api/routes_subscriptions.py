@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.api.responses import json_response
+from app.db.models import ScanSubscription, ScanSubscriptionResult
+from app.scan.schemas import (
+    Subscription,
+    SubscriptionCreate,
+    SubscriptionResult,
+    SubscriptionResultsResponse,
+)
+
+router = APIRouter()
+
+
+def _to_schema(row: ScanSubscription) -> Subscription:
+    return Subscription(
+        id=row.id,
+        name=row.name,
+        request=row.request,
+        created_at=row.created_at,
+        last_evaluated_ts=row.last_evaluated_ts,
+    )
+
+
+def _get_or_404(db: Session, subscription_id: int) -> ScanSubscription:
+    row = db.get(ScanSubscription, subscription_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="subscription not found")
+    return row
+
+
+@router.post("/subscriptions", response_model=Subscription, status_code=201)
+def create_subscription(body: SubscriptionCreate, db: Session = Depends(get_db)) -> Subscription:
+    """
+    Save a ScanRequest; it is evaluated after each new 5m bucket (SUBSCRIPTIONS_ENABLED) from then on.
+    """
+    row = ScanSubscription(name=body.name, request=body.request.model_dump(mode="json"), created_at=int(time.time()))
+    db.add(row)
+    db.commit()
+    return _to_schema(row)
+
+
+@router.get("/subscriptions", response_model=list[Subscription])
+def list_subscriptions(db: Session = Depends(get_db)) -> list[Subscription]:
+    rows = db.execute(select(ScanSubscription).order_by(ScanSubscription.id)).scalars().all()
+    return [_to_schema(r) for r in rows]
+
+
+@router.get("/subscriptions/{subscription_id}", response_model=Subscription)
+def get_subscription(subscription_id: int, db: Session = Depends(get_db)) -> Subscription:
+    return _to_schema(_get_or_404(db, subscription_id))
+
+
+@router.delete("/subscriptions/{subscription_id}", status_code=204)
+def delete_subscription(subscription_id: int, db: Session = Depends(get_db)) -> Response:
+    _get_or_404(db, subscription_id)
+    db.execute(delete(ScanSubscription).where(ScanSubscription.id == subscription_id))
+    db.commit()
+    return Response(status_code=204)
+
+
+@router.get("/subscriptions/{subscription_id}/results", response_model=SubscriptionResultsResponse)
+def subscription_results(
+    subscription_id: int,
+    since: int | None = Query(
+        None, description="Only dumps first reported by an evaluation after this bucket (a previous response's as_of)."
+    ),
+    current: bool = Query(False, description="Only dumps still reported by the latest evaluation."),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    Stored results of a subscription, newest first: a read of what the evaluator already computed, no scan.
+    """
+    sub = _get_or_404(db, subscription_id)
+    stmt = select(ScanSubscriptionResult).where(ScanSubscriptionResult.subscription_id == subscription_id)
+    if since is not None:
+        stmt = stmt.where(ScanSubscriptionResult.first_seen_ts > since)
+    if current:
+        stmt = stmt.where(ScanSubscriptionResult.last_seen_ts == sub.last_evaluated_ts)
+    stmt = stmt.order_by(ScanSubscriptionResult.first_seen_ts.desc(), ScanSubscriptionResult.dump_bucket_ts.desc())
+    rows = db.execute(stmt.limit(limit)).scalars().all()
+    return json_response(
+        SubscriptionResultsResponse(
+            subscription_id=subscription_id,
+            as_of=sub.last_evaluated_ts,
+            results=[
+                SubscriptionResult(first_seen_ts=r.first_seen_ts, last_seen_ts=r.last_seen_ts, result=r.result)
+                for r in rows
+            ],
+        )
+    )
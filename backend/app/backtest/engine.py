@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.backtest.schemas import BacktestConfigResult, BacktestParams, BacktestTrade
+from app.db.models import ItemBucket5m, ItemMapping
+from app.scan.compute import scan_window_blocks
+from app.scan.kernels import Detection, SeriesKernels
+from app.scan.schemas import BaselineStat, ScanRequest
+from app.store.cold import union_cold
+
+
+@dataclass
+class RaggedSeries:
+    """
+    Per-item 5m rows in CSR layout: rows of item_ids[k] are [offsets[k], offsets[k+1]), ascending bucket_ts.
+    Like the API, an item only has rows for buckets in which it traded.
+    """
+
+    item_ids: np.ndarray
+    offsets: np.ndarray
+    bucket_ts: np.ndarray
+    avg_low: np.ndarray
+    low_vol: np.ndarray
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {k: getattr(self, k) for k in ("item_ids", "offsets", "bucket_ts", "avg_low", "low_vol")}
+
+
+def load_ragged_series(db: Session, start_ts: int, end_ts: int, *, chunk_rows: int = 200_000) -> RaggedSeries:
+    """
+    Load item_bucket_5m rows in [start_ts, end_ts] with one streamed query, converting chunk by chunk, plus any
+    cold-stored (Parquet) days in the range.
+    """
+    stmt = (
+        select(ItemBucket5m.item_id, ItemBucket5m.bucket_ts, ItemBucket5m.avg_low, ItemBucket5m.low_vol)
+        .where(ItemBucket5m.bucket_ts >= start_ts)
+        .where(ItemBucket5m.bucket_ts <= end_ts)
+        .execution_options(yield_per=chunk_rows)
+    )
+    cols: list[list[np.ndarray]] = [[], [], [], []]
+    # Core execution on the session's connection: the ORM result layer costs more than the query here.
+    for part in db.connection().execute(stmt).partitions():
+        # Transpose to columns first: handing Row objects to numpy directly is several times slower.
+        for out, col, dtype in zip(cols, zip(*part), ("int64", "int64", "float64", "float64")):
+            out.append(np.array(col, dtype=dtype))  # None -> NaN for avg_low
+    item_col, bucket_ts, avg_low, low_vol = (
+        np.concatenate(c) if c else np.empty(0, dtype=d) for c, d in zip(cols, ("int64", "int64", "float64", "float64"))
+    )
+    # Days already moved to the Parquet cold store (if configured) are read back through DuckDB.
+    merged = union_cold(
+        {"item_id": item_col, "bucket_ts": bucket_ts, "avg_low": avg_low, "low_vol": low_vol},
+        "item_bucket_5m",
+        start_ts,
+        end_ts,
+    )
+    item_col, bucket_ts, avg_low, low_vol = merged["item_id"], merged["bucket_ts"], merged["avg_low"], merged["low_vol"]
+
+    # Sorting here is cheaper than an ORDER BY over the whole range in Postgres.
+    order = np.lexsort((bucket_ts, item_col))
+    item_col, bucket_ts, avg_low, low_vol = item_col[order], bucket_ts[order], avg_low[order], low_vol[order]
+    item_ids, first = np.unique(item_col, return_index=True)
+    offsets = np.append(first, item_col.size).astype("int64")
+    return RaggedSeries(item_ids=item_ids, offsets=offsets, bucket_ts=bucket_ts, avg_low=avg_low, low_vol=low_vol)
+
+
+# ---- shared memory --------------------------------------------------------------
+#
+# The loaded series is published once into shared memory; pool workers attach to it instead of receiving a
+# pickled copy per task (or re-querying Postgres).
+
+_SharedSpec = dict[str, tuple[str, tuple[int, ...], str]]
+
+
+def _publish(arrays: dict[str, np.ndarray]) -> tuple[_SharedSpec, list[shared_memory.SharedMemory]]:
+    spec: _SharedSpec = {}
+    handles = []
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        spec[name] = (shm.name, arr.shape, arr.dtype.str)
+        handles.append(shm)
+    return spec, handles
+
+
+def _attach(spec: _SharedSpec) -> tuple[dict[str, np.ndarray], list[shared_memory.SharedMemory]]:
+    arrays = {}
+    handles = []
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        arrays[name] = arr
+        handles.append(shm)
+    return arrays, handles
+
+
+# ---- shard evaluation -------------------------------------------------------------
+
+_worker: dict[str, Any] = {}
+
+
+def _init_worker(spec: _SharedSpec, configs: list[ScanRequest], params: BacktestParams, buy_limits: np.ndarray) -> None:
+    arrays, handles = _attach(spec)
+    _worker.update(series=RaggedSeries(**arrays), handles=handles, configs=configs, params=params, buy_limits=buy_limits)
+
+
+def _outcome(
+    kernels: SeriesKernels, ts: np.ndarray, end: int, now: int, d: Detection, params: BacktestParams
+) -> tuple[float, int, bool] | None:
+    entry = d.latest_price
+    if entry is None or entry <= 0:
+        return None
+    target = entry + params.recover_fraction * (d.baseline_price - entry)
+    stop = int(np.searchsorted(ts, now + params.horizon_hours * 3600, side="right"))
+    future = kernels.avg_low[end:stop]
+    finite = np.isfinite(future)
+    hit = np.nonzero(finite & (future >= target))[0]
+    if hit.size:
+        j = end + int(hit[0])
+        return float(kernels.avg_low[j]), int(ts[j]), True
+    seen = np.nonzero(finite)[0]
+    if seen.size:
+        j = end + int(seen[-1])
+        return float(kernels.avg_low[j]), int(ts[j]), False
+    return entry, now, False
+
+
+def _run_shard(now_lo: int, now_hi: int) -> list[list[BacktestTrade]]:
+    """
+    Evaluate every config at every "now" in [now_lo, now_hi] for all items; returns trades per config.
+    """
+    series: RaggedSeries = _worker["series"]
+    configs: list[ScanRequest] = _worker["configs"]
+    params: BacktestParams = _worker["params"]
+    buy_limits: np.ndarray = _worker["buy_limits"]
+
+    nows = np.arange(now_lo, now_hi + 1, 300 * params.step_blocks, dtype="int64")
+    lookback = max(scan_window_blocks(c) for c in configs) * 300
+    horizon = params.horizon_hours * 3600
+    out: list[list[BacktestTrade]] = [[] for _ in configs]
+
+    for k, item_id in enumerate(series.item_ids.tolist()):
+        o0, o1 = int(series.offsets[k]), int(series.offsets[k + 1])
+        all_ts = series.bucket_ts[o0:o1]
+        a = o0 + int(np.searchsorted(all_ts, now_lo - lookback, side="right"))
+        b = o0 + int(np.searchsorted(all_ts, now_hi + horizon, side="right"))
+        if b - a < 288:
+            continue
+        ts = series.bucket_ts[a:b]
+        kernels = SeriesKernels(series.avg_low[a:b], series.low_vol[a:b])
+        ends = np.searchsorted(ts, nows, side="right")
+        limit = int(buy_limits[k])
+
+        for ci, req in enumerate(configs):
+            if req.min_buy_limit is not None and (limit < 0 or limit < req.min_buy_limit):
+                continue
+            if req.max_buy_limit is not None and (limit < 0 or limit > req.max_buy_limit):
+                continue
+
+            L, M = req.baseline_hours * 12, req.event_window_blocks
+            starts = np.searchsorted(ts, nows - (scan_window_blocks(req) - 1) * 300, side="left")
+            static = kernels.static_candidates(req)
+            # Only "now"s whose window holds enough rows and at least one now-independent candidate can fire.
+            has_cand = np.searchsorted(static, ends - M - 1) > np.searchsorted(static, starts + L)
+            possible = np.nonzero(has_cand & (ends - starts >= max(L + M + 2, 288)))[0]
+
+            seen: set[int] = set()
+            for i in possible.tolist():
+                start, end, now = int(starts[i]), int(ends[i]), int(nows[i])
+                d = kernels.evaluate(start=start, end=end, req=req)
+                if d is None:
+                    continue
+                if req.min_price is not None and d.baseline_price < req.min_price:
+                    continue
+                if req.max_price is not None and d.baseline_price > req.max_price:
+                    continue
+                dump_ts = int(ts[d.t])
+                if dump_ts in seen:
+                    continue
+                seen.add(dump_ts)
+                outcome = _outcome(kernels, ts, end, now, d, params)
+                if outcome is None:
+                    continue
+                exit_price, exit_ts, recovered = outcome
+                out[ci].append(
+                    BacktestTrade(
+                        item_id=item_id,
+                        dump_bucket_ts=dump_ts,
+                        detected_at=now,
+                        baseline_price=d.baseline_price,
+                        entry_price=float(d.latest_price or 0.0),
+                        exit_price=exit_price,
+                        exit_ts=exit_ts,
+                        recovered=recovered,
+                        profit_pct=exit_price * (1 - params.sell_tax_pct) / float(d.latest_price or 1.0) - 1.0,
+                    )
+                )
+    return out
+
+
+def _summarize(config: ScanRequest, trades: list[BacktestTrade], *, include_trades: bool) -> BacktestConfigResult:
+    hits = [t for t in trades if t.recovered]
+    profits = np.array([t.profit_pct for t in trades], dtype="float64")
+    return BacktestConfigResult(
+        config=config,
+        signals=len(trades),
+        hits=len(hits),
+        hit_rate=(len(hits) / len(trades)) if trades else None,
+        mean_profit_pct=float(np.mean(profits)) if profits.size else None,
+        median_profit_pct=float(np.median(profits)) if profits.size else None,
+        mean_minutes_to_recover=float(np.mean([(t.exit_ts - t.detected_at) / 60 for t in hits])) if hits else None,
+        trades=trades if include_trades else [],
+    )
+
+
+def run_backtest(
+    db: Session,
+    configs: list[ScanRequest],
+    params: BacktestParams,
+    *,
+    workers: int | None = None,
+    shards: int | None = None,
+    include_trades: bool = False,
+) -> list[BacktestConfigResult]:
+    """
+    Replay stored 5m history at every "now" in [params.start_ts, params.end_ts] for each config.
+
+    History is loaded once, published to shared memory and evaluated in time shards by a process pool.
+    A dump (item, dump_bucket_ts) counts once per config, at the first "now" that detects it.
+    """
+    if not configs:
+        return []
+    if any(c.baseline_resolution != "5m" or c.use_latest_price or c.baseline_stat == BaselineStat.ewma for c in configs):
+        raise ValueError(
+            "backtests replay 5m history with median/mean baselines only; use baseline_resolution='5m' without "
+            "use_latest_price or baseline_stat='ewma'"
+        )
+    start = params.start_ts - params.start_ts % 300
+    end = params.end_ts - params.end_ts % 300
+    lookback = max(scan_window_blocks(c) for c in configs) * 300
+    series = load_ragged_series(db, start - lookback, end + params.horizon_hours * 3600)
+
+    limit_rows = db.execute(select(ItemMapping.item_id, ItemMapping.limit)).all()
+    limit_by_id = {int(i): (int(lim) if lim is not None else -1) for i, lim in limit_rows}
+    buy_limits = np.array([limit_by_id.get(int(i), -1) for i in series.item_ids], dtype="int64")
+
+    workers = workers or os.cpu_count() or 1
+    step = 300 * params.step_blocks
+    n_nows = (end - start) // step + 1
+    shards = max(1, min(shards or workers * 4, n_nows))
+    bounds = np.linspace(0, n_nows, shards + 1).astype("int64")
+    ranges = [(start + int(bounds[i]) * step, start + (int(bounds[i + 1]) - 1) * step) for i in range(shards) if bounds[i + 1] > bounds[i]]
+
+    spec, handles = _publish(series.arrays())
+    del series
+    try:
+        if workers == 1:
+            _init_worker(spec, configs, params, buy_limits)
+            per_shard = [_run_shard(lo, hi) for lo, hi in ranges]
+            _worker.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec, configs, params, buy_limits)) as pool:
+                per_shard = list(pool.map(_run_shard, *zip(*ranges)))
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+    results = []
+    for ci, config in enumerate(configs):
+        # The same dump can be detected in adjacent shards; keep its earliest detection.
+        first: dict[tuple[int, int], BacktestTrade] = {}
+        for shard in per_shard:
+            for t in shard[ci]:
+                key = (t.item_id, t.dump_bucket_ts)
+                if key not in first or t.detected_at < first[key].detected_at:
+                    first[key] = t
+        trades = sorted(first.values(), key=lambda t: (t.detected_at, t.item_id))
+        results.append(_summarize(config, trades, include_trades=include_trades))
+    return results
+
+
+# ---- CLI ----------------------------------------------------------------------------
+
+
+def _parse_ts(value: str) -> int:
+    if value.isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest dump-detection configs over stored item_bucket_5m history.")
+    parser.add_argument("--from", dest="start", required=True, help="unix seconds or ISO date/time (UTC)")
+    parser.add_argument("--to", dest="end", required=True, help="unix seconds or ISO date/time (UTC)")
+    parser.add_argument("--configs", default=None, help="JSON file with a list of ScanRequest objects (default: one default config)")
+    parser.add_argument("--step-blocks", type=int, default=1)
+    parser.add_argument("--horizon-hours", type=int, default=24)
+    parser.add_argument("--recover-fraction", type=float, default=0.5)
+    parser.add_argument("--sell-tax-pct", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="write full results (including trades) as JSON")
+    args = parser.parse_args(argv)
+
+    raw_configs: list[dict[str, Any]] = [{}]
+    if args.configs:
+        with open(args.configs) as f:
+            raw_configs = json.load(f)
+    configs = [ScanRequest(**c) for c in raw_configs]
+    params = BacktestParams(
+        start_ts=_parse_ts(args.start),
+        end_ts=_parse_ts(args.end),
+        step_blocks=args.step_blocks,
+        horizon_hours=args.horizon_hours,
+        recover_fraction=args.recover_fraction,
+        sell_tax_pct=args.sell_tax_pct,
+    )
+
+    from app.db.session import session_scope
+
+    t0 = time.perf_counter()
+    db = session_scope()
+    try:
+        results = run_backtest(db, configs, params, workers=args.workers, include_trades=args.out is not None)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - t0
+
+    print(f"{'#':>3}{'signals':>9}{'hit rate':>10}{'mean profit':>13}{'median profit':>15}{'min to recover':>16}")
+    for i, r in enumerate(results):
+        def pct(v: float | None) -> str:
+            return "-" if v is None else f"{v * 100:.2f}%"
+
+        mins = "-" if r.mean_minutes_to_recover is None else f"{r.mean_minutes_to_recover:.0f}"
+        print(f"{i:>3}{r.signals:>9}{pct(r.hit_rate):>10}{pct(r.mean_profit_pct):>13}{pct(r.median_profit_pct):>15}{mins:>16}")
+    print(f"{len(configs)} config(s) in {elapsed:.1f}s")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump([r.model_dump(mode="json") for r in results], f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+from app.scan.schemas import ScanRequest
+
+
+class BacktestParams(BaseModel):
+    start_ts: int = Field(ge=0)
+    end_ts: int = Field(ge=0)
+
+    # Evaluate the detector every `step_blocks` 5m buckets between start_ts and end_ts (1 = every "now").
+    step_blocks: int = Field(1, ge=1, le=288)
+
+    # Outcome of a signal: buy at the latest avgLowPrice when it is first detected, then within `horizon_hours`
+    # sell at the first bucket whose avgLowPrice recovers `recover_fraction` of the way back to the baseline.
+    # Otherwise sell at the last price seen in the horizon. Prices are instant-sell (avgLowPrice) to stay conservative.
+    horizon_hours: int = Field(24, ge=1, le=24 * 14)
+    recover_fraction: float = Field(0.5, gt=0.0, le=1.0)
+    sell_tax_pct: float = Field(0.02, ge=0.0, le=0.1)
+
+
+class BacktestTrade(BaseModel):
+    item_id: int
+    dump_bucket_ts: int
+    detected_at: int
+    baseline_price: float
+    entry_price: float
+    exit_price: float
+    exit_ts: int
+    recovered: bool
+    profit_pct: float
+
+
+class BacktestConfigResult(BaseModel):
+    config: ScanRequest
+    signals: int
+    hits: int
+    hit_rate: float | None = None
+    mean_profit_pct: float | None = None
+    median_profit_pct: float | None = None
+    mean_minutes_to_recover: float | None = None
+    trades: list[BacktestTrade] = []
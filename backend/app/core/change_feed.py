@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from typing import Any, Generic, TypeVar
+
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "runestreet_changes"
+# Event kinds. `resync` is local only: sent to every handler after (re)connecting, since notifications sent
+# while this process was not listening are lost.
+BUCKET_5M = "bucket_5m"
+MAPPING = "mapping"
+TIMESERIES_24H = "timeseries_24h"
+LATEST = "latest"
+RESYNC = "resync"
+
+# pg_notify payloads must stay under 8000 bytes; item id lists are split to stay well below.
+_MAX_IDS_PER_NOTIFY = 500
+
+Event = dict[str, Any]
+Handler = Callable[[Event], None]
+
+_handlers: dict[str, list[Handler]] = defaultdict(list)
+_connected = False
+
+
+def notify(db: Session, kind: str, **fields: Any) -> None:
+    """
+    Queue a change event on the session's transaction; Postgres delivers it to listeners only on commit.
+    """
+    if kind == TIMESERIES_24H and len(fields.get("item_ids", ())) > _MAX_IDS_PER_NOTIFY:
+        ids = list(fields.pop("item_ids"))
+        for i in range(0, len(ids), _MAX_IDS_PER_NOTIFY):
+            notify(db, kind, item_ids=ids[i : i + _MAX_IDS_PER_NOTIFY], **fields)
+        return
+    payload = json.dumps({"kind": kind, **fields}, separators=(",", ":"))
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+def subscribe(kinds: str | Iterable[str], handler: Handler) -> None:
+    """
+    Call `handler(event)` on the event loop for each event of the given kind(s) ("*" for all). Handlers must be
+    quick and must not block; `resync` is delivered to every handler.
+    """
+    for kind in [kinds] if isinstance(kinds, str) else kinds:
+        _handlers[kind].append(handler)
+
+
+def feed_connected() -> bool:
+    """
+    True while this process is listening, i.e. it will hear about changes made by other processes.
+    """
+    return _connected
+
+
+def dispatch(event: Event) -> None:
+    kind = event.get("kind")
+    if kind == RESYNC:
+        targets = list(dict.fromkeys(h for hs in _handlers.values() for h in hs))
+    else:
+        targets = [*_handlers.get(str(kind), ()), *_handlers.get("*", ())]
+    for handler in targets:
+        try:
+            handler(event)
+        except Exception:
+            log.exception("change feed handler failed for %s", kind)
+
+
+def _libpq_url() -> str:
+    # SQLAlchemy's URL carries the driver (`postgresql+psycopg`); libpq wants the plain scheme.
+    url = make_url(settings.sqlalchemy_database_url()).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def run_listener(stop: asyncio.Event) -> None:
+    """
+    Background task: LISTEN on the change channel and dispatch events, reconnecting with backoff.
+    """
+    global _connected
+    backoff = 1.0
+    while not stop.is_set():
+        try:
+            async with await psycopg.AsyncConnection.connect(_libpq_url(), autocommit=True) as conn:
+                await conn.execute(f"LISTEN {CHANNEL}")
+                _connected, backoff = True, 1.0
+                dispatch({"kind": RESYNC})
+                while not stop.is_set():
+                    async for n in conn.notifies(timeout=1.0):
+                        try:
+                            event = json.loads(n.payload)
+                        except ValueError:
+                            log.warning("ignoring malformed change event %r", n.payload)
+                            continue
+                        dispatch(event)
+        except Exception:
+            log.exception("change feed listener disconnected")
+        finally:
+            _connected = False
+        if not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 30.0)
+
+
+T = TypeVar("T")
+
+
+class FeedCache(Generic[T]):
+    """
+    A single cached value that lives up to `ttl_seconds` and is dropped on any event of `kinds` (or a resync).
+    It only caches while the feed is connected; without it every call loads, exactly as if there were no cache.
+    """
+
+    def __init__(self, kinds: str | Iterable[str], *, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._value: T | None = None
+        self._expires = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+        subscribe(kinds, lambda _event: self.clear())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._value = None
+            self._version += 1
+
+    def get_or_load(self, load: Callable[[], T]) -> T:
+        if not _connected:
+            return load()
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires:
+                return self._value
+            version = self._version
+        value = load()
+        with self._lock:
+            # An invalidation that arrived while loading means `value` may already be stale: don't keep it.
+            if version == self._version:
+                self._value, self._expires = value, time.monotonic() + self.ttl_seconds
+        return value
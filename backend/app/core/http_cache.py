@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import gzip
+import hashlib
+import json
+import re
+import time
+from typing import Any
+
+from sqlalchemy import func, select
+
+from app.core.change_feed import BUCKET_5M, FeedCache
+from app.core.metrics import HTTP_CACHE
+from app.core.settings import settings
+
+
+@functools.cache
+def _brotli() -> Any:
+    # brotli is optional: ~15-20% smaller than gzip on scan JSON. Without it responses are gzipped.
+    try:
+        import brotli
+    except ImportError:  # pragma: no cover - depends on environment
+        return None
+    return brotli
+
+
+Scope = dict[str, Any]
+
+# (method, path, route label). Only endpoints whose body is a function of the request and the stored 5m buckets
+# (the newest of which versions the tag); /scan/stream is excluded (NDJSON, progressive).
+_CACHEABLE = (
+    ("GET", re.compile(r"^/api/items/\d+/series$"), "series"),
+    ("GET", re.compile(r"^/api/items/\d+/related$"), "related"),
+    ("POST", re.compile(r"^/api/scan$"), "scan"),
+    ("POST", re.compile(r"^/api/scan/sweep$"), "scan_sweep"),
+    ("POST", re.compile(r"^/api/spreads/scan$"), "spreads_scan"),
+)
+
+# Bodies above this are compressed off the event loop.
+_THREAD_COMPRESS_BYTES = 64 * 1024
+
+# Newest ingested bucket, dropped on every `bucket_5m` change event (re-read per request without the feed).
+_latest_bucket: FeedCache[int] = FeedCache(BUCKET_5M, ttl_seconds=60.0)
+
+
+def latest_ingested_bucket() -> int:
+    """
+    max(bucket_5m.bucket_ts): the data version of every cacheable endpoint, whichever process ingested it.
+    """
+
+    def load() -> int:
+        from app.db.models import Bucket5m
+        from app.db.session import SessionLocal
+
+        with SessionLocal() as db:
+            return int(db.execute(select(func.max(Bucket5m.bucket_ts))).scalar_one_or_none() or 0)
+
+    return _latest_bucket.get_or_load(load)
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    for k, v in scope.get("headers") or ():
+        if k.lower() == name:
+            return v.decode("latin-1")
+    return None
+
+
+def _route(scope: Scope) -> str | None:
+    method, path = scope.get("method"), scope.get("path", "")
+    for m, pattern, label in _CACHEABLE:
+        if m == method and pattern.match(path):
+            return label
+    return None
+
+
+def _canonical_body(body: bytes) -> tuple[bytes, bool]:
+    """
+    The JSON body with sorted keys (so key order does not change the ETag), and whether it asks for /latest
+    prices anywhere (top level or a sweep variant). Unparseable bodies are hashed as-is; the route rejects them.
+    """
+    if not body:
+        return b"", False
+    try:
+        obj = json.loads(body)
+    except ValueError:
+        return body, False
+    uses_latest = False
+    if isinstance(obj, dict):
+        nested = [v for vs in obj.values() if isinstance(vs, list) for v in vs if isinstance(v, dict)]
+        uses_latest = any(bool(d.get("use_latest_price")) for d in [obj, *nested])
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode(), uses_latest
+
+
+def _current_bucket(now: float) -> int:
+    return int(now) - int(now) % 300
+
+
+def validators(scope: Scope, body: bytes, now: float, ingested_ts: int) -> tuple[str, int]:
+    """
+    Weak ETag and max-age for a cacheable request at `now`, read before the route runs. The tag is
+    `W/"<ingested_ts>-<hash>"`: the newest ingested 5m bucket and a hash of method, path, query and canonical
+    body, so a response is never tagged newer than the data it was computed from. It is fresh until the next
+    5m boundary only once the current bucket is in, and max-age is 0 before that. Scans using /latest prices
+    also change with every poll, so their tag carries the poll slot and they expire with it.
+    """
+    current = _current_bucket(now)
+    expires = current + 300 if ingested_ts >= current else now
+    canonical, uses_latest = _canonical_body(body)
+    version = str(ingested_ts)
+    if uses_latest:
+        poll = settings.latest_poll_seconds
+        slot = int(now // poll)
+        version += f".{slot}"
+        expires = min(expires, int((slot + 1) * poll))
+    h = hashlib.sha1()
+    for part in (scope.get("method", "").encode(), scope.get("path", "").encode(), scope.get("query_string", b""), canonical):
+        h.update(part)
+        h.update(b"\0")
+    return f'W/"{version}-{h.hexdigest()[:16]}"', max(0, int(expires - now))
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored on both sides.
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    want = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == want for tag in if_none_match.split(","))
+
+
+class HttpCacheMiddleware:
+    """
+    Pure ASGI middleware for the endpoints in `_CACHEABLE`: once the current 5m bucket is ingested, a request
+    whose If-None-Match matches the current ETag gets 304 before the route runs (no DB session); 200 responses carry ETag and
+    `Cache-Control: max-age` up to the next 5m boundary. POST scans get 304 too, not the 412 RFC 9110 prescribes
+    for unsafe methods: they are read-only queries, and 304 is what lets a polling client skip the body. Shared
+    caches never store POST responses (and get `private`), so only clients that send If-None-Match see it.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Any, send: Any) -> None:
+        route = _route(scope) if scope["type"] == "http" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        chunks: list[bytes] = []
+        more = scope["method"] == "POST"
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        now = time.time()
+        ingested_ts = await asyncio.to_thread(latest_ingested_bucket)
+        etag, max_age = validators(scope, body, now, ingested_ts)
+        visibility = "public" if scope["method"] == "GET" else "private"
+        headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", f"{visibility}, max-age={max_age}".encode()),
+        ]
+        # Until the current bucket is in, the route runs so it can ingest it on demand.
+        if ingested_ts >= _current_bucket(now) and etag_matches(_header(scope, b"if-none-match"), etag):
+            HTTP_CACHE.labels(route, "not_modified").inc()
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        HTTP_CACHE.labels(route, "miss").inc()
+
+        replayed = False
+
+        async def replay() -> dict[str, Any]:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def send_with_validators(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
+
+        await self.app(scope, replay, send_with_validators)
+
+
+def _accepted(accept_encoding: str | None) -> set[str]:
+    out: set[str] = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            out.add(coding.strip().lower())
+    return out
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    accepted = _accepted(accept_encoding)
+    if "br" in accepted and _brotli() is not None:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return _brotli().compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing complete `application/json` responses of at least `compression_min_bytes`.
+    Streaming (NDJSON) and already-encoded responses, and everything else, pass through unbuffered.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Any, send: Any) -> None:
+        encoding = choose_encoding(_header(scope, b"accept-encoding")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: dict[str, Any] | None = None
+        chunks: list[bytes] = []
+
+        async def send_compressed(message: dict[str, Any]) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                names = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = names.get(b"content-type", b"").split(b";")[0].strip()
+                if content_type == b"application/json" and b"content-encoding" not in names:
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                body = b"".join(chunks)
+                headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+                if len(body) >= settings.compression_min_bytes:
+                    if len(body) >= _THREAD_COMPRESS_BYTES:
+                        body = await asyncio.to_thread(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                headers.append((b"content-length", str(len(body)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from prometheus_client import Counter, Gauge, Histogram
+
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "runestreet_stage_duration_seconds",
+    "Time spent per request stage.",
+    ["endpoint", "stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+STAGE_ROWS = Counter("runestreet_stage_rows_total", "Rows/items processed per request stage.", ["endpoint", "stage"])
+
+UPSTREAM_SECONDS = Histogram(
+    "runestreet_upstream_request_duration_seconds",
+    "OSRS prices API request latency (per attempt).",
+    ["endpoint"],
+    buckets=_LATENCY_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter("runestreet_upstream_errors_total", "Failed OSRS prices API attempts.", ["endpoint", "kind"])
+UPSTREAM_CACHE = Counter("runestreet_upstream_cache_total", "Raw payload cache lookups.", ["endpoint", "result"])
+HTTP_CACHE = Counter(
+    "runestreet_http_cache_total", "Conditional requests to cacheable endpoints (not_modified/miss).", ["route", "result"]
+)
+
+DB_POOL_CONNECTIONS = Gauge("runestreet_db_pool_connections", "SQLAlchemy connection pool state.", ["state"])
+DB_POOL_SATURATION = Gauge(
+    "runestreet_db_pool_saturation", "Checked-out connections / (pool size + max overflow); at 1 checkouts wait."
+)
+DB_POOL_EXHAUSTED = Counter(
+    "runestreet_db_pool_exhausted_total", "Checkouts that took the last connection the pool may open."
+)
+DB_QUERY_SECONDS = Histogram(
+    "runestreet_db_query_duration_seconds", "SQL statement execution time.", ["endpoint"], buckets=_LATENCY_BUCKETS
+)
+DB_SLOW_QUERIES = Counter("runestreet_db_slow_queries_total", "Statements slower than DB_SLOW_QUERY_MS.", ["endpoint"])
+INGEST_LEADER = Gauge("runestreet_ingest_leader", "1 while this process holds the ingest advisory lock.")
+
+
+class _StageHandle:
+    __slots__ = ("rows",)
+
+    def __init__(self) -> None:
+        self.rows: int | None = None
+
+
+class StageTimer:
+    """
+    Per-request stage timings. While active (`with StageTimer("scan"):`), `stage()` blocks anywhere in the
+    call tree record into it and into the Prometheus stage histograms; repeated stages accumulate.
+    """
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self._started = time.perf_counter()
+        self._stages: dict[str, list[float]] = {}  # name -> [seconds, rows, calls]
+        self._token: Any = None
+
+    def __enter__(self) -> StageTimer:
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        _current.reset(self._token)
+
+    def record(self, name: str, seconds: float, rows: int | None = None) -> None:
+        acc = self._stages.setdefault(name, [0.0, 0, 0])
+        acc[0] += seconds
+        acc[1] += rows or 0
+        acc[2] += 1
+        STAGE_SECONDS.labels(self.endpoint, name).observe(seconds)
+        if rows:
+            STAGE_ROWS.labels(self.endpoint, name).inc(rows)
+
+    def as_meta(self) -> dict[str, object]:
+        return {
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "stages": {
+                name: {"ms": round(sec * 1000, 3), "rows": int(rows), "calls": int(calls)}
+                for name, (sec, rows, calls) in self._stages.items()
+            },
+        }
+
+
+_current: ContextVar[StageTimer | None] = ContextVar("runestreet_stage_timer", default=None)
+
+
+def current_endpoint() -> str | None:
+    """
+    Endpoint label of the active StageTimer, if any.
+    """
+    timer = _current.get()
+    return timer.endpoint if timer is not None else None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[_StageHandle]:
+    """
+    Time a block into the active StageTimer (no-op outside one). Set `.rows` on the handle to count rows.
+    """
+    handle = _StageHandle()
+    timer = _current.get()
+    if timer is None:
+        yield handle
+        return
+    t0 = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        timer.record(name, time.perf_counter() - t0, handle.rows)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+from app.core.settings import settings
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+_ID_RE = re.compile(r"^[0-9]+-[0-9a-f]{8}-[a-z0-9_]+\.html$")
+
+Scope = dict[str, Any]
+
+
+def profile_dir() -> Path:
+    return Path(settings.profiling_dir)
+
+
+def trigger_value(scope: Scope) -> str | None:
+    """
+    Profile trigger carried by the request (header wins over query param), or None.
+    """
+    for name, value in scope.get("headers") or ():
+        if name == PROFILE_HEADER.encode("latin-1"):
+            return value.decode("latin-1")
+    qs = scope.get("query_string") or b""
+    if PROFILE_QUERY_PARAM.encode() in qs:
+        values = parse_qs(qs.decode("latin-1")).get(PROFILE_QUERY_PARAM)
+        if values:
+            return values[0]
+    return None
+
+
+def is_authorized(value: str | None) -> bool:
+    # No token, no profiling: create_app refuses PROFILING_ENABLED without PROFILING_TOKEN.
+    if not settings.profiling_enabled or not settings.profiling_token or value is None:
+        return False
+    return value == settings.profiling_token
+
+
+def list_profiles() -> list[Path]:
+    d = profile_dir()
+    if not d.is_dir():
+        return []
+    return sorted((p for p in d.iterdir() if _ID_RE.match(p.name)), key=lambda p: p.name, reverse=True)
+
+
+def profile_path(profile_id: str) -> Path | None:
+    if not _ID_RE.match(profile_id):
+        return None
+    p = profile_dir() / profile_id
+    return p if p.is_file() else None
+
+
+def _prune() -> None:
+    for old in list_profiles()[settings.profiling_keep :]:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware: requests without a valid trigger pass straight through (one header scan), so it can
+    stay installed next to the scan endpoints. Triggered requests run under pyinstrument's sampling profiler
+    (HTML); the artifact id is returned in the `X-Profile-Id` response header.
+
+    pyinstrument sets one profiling hook per thread, so only one request per process is profiled at a time;
+    a trigger arriving meanwhile gets 409. With `async_mode="enabled"` time the event loop spends on other
+    requests shows up as `[await]` in the profile rather than as their frames.
+    """
+
+    def __init__(self, app: Any) -> None:
+        from pyinstrument import Profiler
+
+        self.app = app
+        self._profiler_cls = Profiler
+        self._active = False
+
+    async def __call__(self, scope: Scope, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not is_authorized(trigger_value(scope)):
+            await self.app(scope, receive, send)
+            return
+        if self._active:
+            body = json.dumps({"detail": "another request is being profiled"}).encode()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 409,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        slug = re.sub(r"[^a-z0-9]+", "_", scope.get("path", "").lower()).strip("_")[:60] or "root"
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}-{slug}.html"
+
+        async def send_with_id(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        d = profile_dir()
+        d.mkdir(parents=True, exist_ok=True)
+        # No await between the check above and here, so no other request can start profiling in between.
+        self._active = True
+        profiler = self._profiler_cls(interval=0.001, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            self._active = False
+            (d / profile_id).write_text(profiler.output_html())
+            _prune()
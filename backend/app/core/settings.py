@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import AnyHttpUrl, Field
 from pydantic.aliases import AliasChoices
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,10 +17,153 @@ class Settings(BaseSettings):
     )
     osrs_user_agent: str = Field(validation_alias=AliasChoices("OSRS_USER_AGENT", "osrs_user_agent"))
 
+    # SQLAlchemy connection pool per process (see app/db/session.py): workers × (size + overflow) must stay below
+    # Postgres `max_connections`. Connections older than `db_pool_recycle_seconds` are replaced (-1: never).
+    db_pool_size: int = Field(default=5, ge=1, validation_alias=AliasChoices("DB_POOL_SIZE", "db_pool_size"))
+    db_max_overflow: int = Field(default=10, ge=0, validation_alias=AliasChoices("DB_MAX_OVERFLOW", "db_max_overflow"))
+    db_pool_timeout_seconds: float = Field(
+        default=30.0, gt=0, validation_alias=AliasChoices("DB_POOL_TIMEOUT_SECONDS", "db_pool_timeout_seconds")
+    )
+    db_pool_recycle_seconds: int = Field(
+        default=1800, ge=-1, validation_alias=AliasChoices("DB_POOL_RECYCLE_SECONDS", "db_pool_recycle_seconds")
+    )
+    # psycopg prepares a statement server-side once the same SQL has run this many times on a connection (0: on
+    # first use, -1: never, e.g. behind PgBouncer in transaction mode). See app/db/queries.py.
+    db_prepare_threshold: int = Field(
+        default=2, ge=-1, validation_alias=AliasChoices("DB_PREPARE_THRESHOLD", "db_prepare_threshold")
+    )
+    # Statements slower than this are logged with their parameters by the `app.db.slow_query` logger (0 disables).
+    db_slow_query_ms: float = Field(default=500.0, ge=0, validation_alias=AliasChoices("DB_SLOW_QUERY_MS", "db_slow_query_ms"))
+
+    # Optional on-disk cache of raw upstream responses (see app/osrs/cache.py).
+    # `readwrite`: store and serve settled /5m and /1h buckets only.
+    # `record`: store every response (the latest fetch wins) for a later replay, never serve from disk.
+    # `replay`: serve everything from disk and never call the upstream.
+    osrs_cache_dir: str | None = Field(default=None, validation_alias=AliasChoices("OSRS_CACHE_DIR", "osrs_cache_dir"))
+    osrs_cache_mode: Literal["readwrite", "record", "replay"] = Field(
+        default="readwrite", validation_alias=AliasChoices("OSRS_CACHE_MODE", "osrs_cache_mode")
+    )
+
+    # Optional memory-mapped columnar copy of item_bucket_5m written by ingest (see app/store/columnar.py).
+    # When set, scan/spreads/series read windows the store fully covers from it instead of Postgres.
+    columnar_store_dir: str | None = Field(
+        default=None, validation_alias=AliasChoices("COLUMNAR_STORE_DIR", "columnar_store_dir")
+    )
+    columnar_item_capacity: int = Field(
+        default=8192, ge=1, validation_alias=AliasChoices("COLUMNAR_ITEM_CAPACITY", "columnar_item_capacity")
+    )
+
+    # Optional day-partitioned Parquet cold tier for old 5m / 24h history (see app/store/cold.py; needs duckdb).
+    # Backtests and /items/{id}/history read Postgres and these files as one table.
+    cold_storage_dir: str | None = Field(default=None, validation_alias=AliasChoices("COLD_STORAGE_DIR", "cold_storage_dir"))
+
+    # Optional shared-memory window of recent 5m buckets, shared by all workers on a host (see app/store/hot_window.py).
+    hot_window_name: str | None = Field(default=None, validation_alias=AliasChoices("HOT_WINDOW_NAME", "hot_window_name"))
+    hot_window_hours: int = Field(default=26, ge=1, validation_alias=AliasChoices("HOT_WINDOW_HOURS", "hot_window_hours"))
+    hot_window_items: int = Field(default=6144, ge=1, validation_alias=AliasChoices("HOT_WINDOW_ITEMS", "hot_window_items"))
+    hot_window_poll_seconds: float = Field(
+        default=5.0, gt=0, validation_alias=AliasChoices("HOT_WINDOW_POLL_SECONDS", "hot_window_poll_seconds")
+    )
+    # The updater saves the window here periodically and on shutdown, and a fresh segment is restored from it,
+    # so a deploy reads only the buckets since the snapshot from Postgres. Put it on a persistent volume.
+    hot_window_snapshot_path: str | None = Field(
+        default=None, validation_alias=AliasChoices("HOT_WINDOW_SNAPSHOT_PATH", "hot_window_snapshot_path")
+    )
+    hot_window_snapshot_seconds: float = Field(
+        default=300.0, gt=0, validation_alias=AliasChoices("HOT_WINDOW_SNAPSHOT_SECONDS", "hot_window_snapshot_seconds")
+    )
+
+    # Warm up before accepting traffic (see app/core/warmup.py): run the scan kernels once, open a DB connection,
+    # load mapping and build the 24h summary, waiting up to `warmup_timeout_seconds` for the hot window.
+    warmup_on_startup: bool = Field(default=False, validation_alias=AliasChoices("WARMUP_ON_STARTUP", "warmup_on_startup"))
+    warmup_timeout_seconds: float = Field(
+        default=60.0, ge=0, validation_alias=AliasChoices("WARMUP_TIMEOUT_SECONDS", "warmup_timeout_seconds")
+    )
+
+    # Ingest leader election across replicas/workers (see app/osrs/leader.py). When enabled, only the holder of a
+    # Postgres advisory lock calls the upstream and writes; it ingests the last `ingest_window_hours` in the
+    # background every `ingest_leader_poll_seconds`, and every other process only reads.
+    ingest_leader_election: bool = Field(
+        default=False, validation_alias=AliasChoices("INGEST_LEADER_ELECTION", "ingest_leader_election")
+    )
+    ingest_leader_poll_seconds: float = Field(
+        default=15.0, gt=0, validation_alias=AliasChoices("INGEST_LEADER_POLL_SECONDS", "ingest_leader_poll_seconds")
+    )
+    ingest_window_hours: int = Field(default=26, ge=1, validation_alias=AliasChoices("INGEST_WINDOW_HOURS", "ingest_window_hours"))
+    # Completed 1h buckets the leader keeps ingested, for scans with `baseline_resolution="1h"` (0 disables).
+    ingest_window_hours_1h: int = Field(
+        default=8 * 24, ge=0, validation_alias=AliasChoices("INGEST_WINDOW_HOURS_1H", "ingest_window_hours_1h")
+    )
+    ingest_timeseries_top_k: int = Field(
+        default=200, ge=0, validation_alias=AliasChoices("INGEST_TIMESERIES_TOP_K", "ingest_timeseries_top_k")
+    )
+
+    # Historical backfill CLI (see app/osrs/backfill.py): upstream requests in flight and started per second.
+    backfill_concurrency: int = Field(default=4, ge=1, validation_alias=AliasChoices("BACKFILL_CONCURRENCY", "backfill_concurrency"))
+    backfill_requests_per_second: float = Field(
+        default=4.0, ge=0, validation_alias=AliasChoices("BACKFILL_REQUESTS_PER_SECOND", "backfill_requests_per_second")
+    )
+
+    # Poll upstream /latest into `item_latest` (see app/osrs/latest.py) for scans with `use_latest_price`. Only
+    # processes allowed to ingest poll; the rest read the table.
+    latest_poller_enabled: bool = Field(default=False, validation_alias=AliasChoices("LATEST_POLLER_ENABLED", "latest_poller_enabled"))
+    latest_poll_seconds: float = Field(
+        default=60.0, ge=5, validation_alias=AliasChoices("LATEST_POLL_SECONDS", "latest_poll_seconds")
+    )
+
+    # Saved scan subscriptions (see app/scan/subscriptions.py): the process allowed to ingest evaluates them after
+    # each new 5m bucket (woken by the change feed, or every `subscriptions_poll_seconds`) and stores the results.
+    subscriptions_enabled: bool = Field(default=False, validation_alias=AliasChoices("SUBSCRIPTIONS_ENABLED", "subscriptions_enabled"))
+    subscriptions_poll_seconds: float = Field(
+        default=30.0, gt=0, validation_alias=AliasChoices("SUBSCRIPTIONS_POLL_SECONDS", "subscriptions_poll_seconds")
+    )
+    # Stored results not re-detected for this long are deleted.
+    subscriptions_retention_hours: int = Field(
+        default=7 * 24, ge=1, validation_alias=AliasChoices("SUBSCRIPTIONS_RETENTION_HOURS", "subscriptions_retention_hours")
+    )
+
+    # Related-item tables (see app/scan/related.py): every worker recomputes the window lengths it has served when
+    # a 5m bucket lands (woken by the change feed, or every `related_poll_seconds`), off the request path.
+    related_precompute_enabled: bool = Field(
+        default=True, validation_alias=AliasChoices("RELATED_PRECOMPUTE_ENABLED", "related_precompute_enabled")
+    )
+    related_poll_seconds: float = Field(
+        default=30.0, gt=0, validation_alias=AliasChoices("RELATED_POLL_SECONDS", "related_poll_seconds")
+    )
+
+    # Background LISTEN on the Postgres change feed (see app/core/change_feed.py). Ingest always NOTIFYs; listening
+    # lets in-process caches use long TTLs and the hot-window updater react to buckets other processes ingest.
+    change_feed_enabled: bool = Field(default=False, validation_alias=AliasChoices("CHANGE_FEED_ENABLED", "change_feed_enabled"))
+
+    # HTTP caching of /series and the scan endpoints (see app/core/http_cache.py): weak ETags from the newest ingested 5m bucket
+    # and a hash of the request, 304 on a matching If-None-Match before any DB work, max-age to the next bucket.
+    # Off by default: POST scans answer 304 too, which only clients that send If-None-Match themselves expect.
+    http_cache_enabled: bool = Field(default=False, validation_alias=AliasChoices("HTTP_CACHE_ENABLED", "http_cache_enabled"))
+    # JSON responses of at least this many bytes are compressed (brotli when installed and accepted, else gzip);
+    # 0 disables compression.
+    compression_min_bytes: int = Field(
+        default=1024, ge=0, validation_alias=AliasChoices("COMPRESSION_MIN_BYTES", "compression_min_bytes")
+    )
+    compression_gzip_level: int = Field(
+        default=6, ge=1, le=9, validation_alias=AliasChoices("COMPRESSION_GZIP_LEVEL", "compression_gzip_level")
+    )
+    compression_brotli_quality: int = Field(
+        default=4, ge=0, le=11, validation_alias=AliasChoices("COMPRESSION_BROTLI_QUALITY", "compression_brotli_quality")
+    )
+
     cors_allowed_origins: str | None = Field(
         default=None, validation_alias=AliasChoices("CORS_ALLOWED_ORIGINS", "cors_allowed_origins")
     )
 
+    # Opt-in request profiling (see app/core/profiling.py). When enabled, a request carrying `X-Profile: <token>`
+    # or `?profile=<token>` runs under a profiler and its artifact is kept in `profiling_dir`. The token is required.
+    profiling_enabled: bool = Field(default=False, validation_alias=AliasChoices("PROFILING_ENABLED", "profiling_enabled"))
+    profiling_token: str | None = Field(default=None, validation_alias=AliasChoices("PROFILING_TOKEN", "profiling_token"))
+    profiling_dir: str = Field(
+        default="/tmp/runestreet-profiles", validation_alias=AliasChoices("PROFILING_DIR", "profiling_dir")
+    )
+    profiling_keep: int = Field(default=50, ge=1, validation_alias=AliasChoices("PROFILING_KEEP", "profiling_keep"))
+
     def sqlalchemy_database_url(self) -> str:
         """
         Railway Postgres commonly provides DATABASE_URL like:
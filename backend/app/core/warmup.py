@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from app.core.settings import settings
+
+log = logging.getLogger(__name__)
+
+
+def _warm_kernels() -> None:
+    """
+    Run every detector/metrics code path once on a tiny synthetic series, so first-call costs (lazy imports,
+    NumPy dispatch setup, pydantic serializers) are paid here rather than by the first request.
+    """
+    from app.scan.compute import scan_item_series
+    from app.scan.kernels import SeriesKernels
+    from app.scan.schemas import ScanRequest, ScanResponse
+    from app.spreads.compute import compute_daily_metrics_from_5m
+
+    rng = np.random.default_rng(0)
+    n = 300
+    bucket_ts = 300 * np.arange(n, dtype="int64")
+    avg_low = 100.0 + rng.standard_normal(n)
+    avg_low[200] = 50.0  # one dump, so the full candidate path runs
+    low_vol = rng.poisson(10.0, n).astype("float64")
+    low_vol[200] = 500.0
+    req = ScanRequest()
+    r = scan_item_series(item_id=1, name="warmup", bucket_ts=bucket_ts, avg_low=avg_low, low_vol=low_vol, req=req)
+    SeriesKernels(avg_low, low_vol).evaluate(start=0, end=n, req=req)
+    compute_daily_metrics_from_5m(avg_low[-288:], avg_low[-288:] * 1.02, low_vol[-288:], low_vol[-288:])
+    ScanResponse(results=[r] if r is not None else [], meta={}).model_dump_json()
+
+
+def _warm_data() -> None:
+    """
+    Open a pooled DB connection and load what every scan needs first: mapping metadata and the 24h summary.
+    """
+    from sqlalchemy import text
+
+    from app.db.session import SessionLocal
+    from app.osrs.ingest import floor_to_5m
+    from app.osrs.mapping import item_meta
+    from app.store.cold import ColdStore
+    from app.store.summary import get_summary_index
+
+    ColdStore.from_settings()  # imports duckdb now if the cold tier is configured
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+        item_meta(db)
+        get_summary_index().snapshot(db, floor_to_5m(int(time.time())))
+
+
+async def _wait_for_hot_window(deadline: float) -> bool:
+    from app.osrs.ingest import floor_to_5m
+    from app.store.hot_window import get_hot_window
+
+    while time.monotonic() < deadline:
+        hot = get_hot_window()
+        end_ts = hot.end_ts if hot is not None else None
+        # Restored (or synced) up to roughly now: older than that means the updater is still filling it.
+        if end_ts is not None and end_ts >= floor_to_5m(int(time.time())) - 3600:
+            return True
+        await asyncio.sleep(0.2)
+    return False
+
+
+async def warm_up() -> dict[str, float]:
+    """
+    Lifespan start-up step (WARMUP_ON_STARTUP): the server accepts requests only once this returns, so the first
+    scan after a deploy runs at steady-state speed. Returns seconds spent per step.
+    """
+    out: dict[str, float] = {}
+    deadline = time.monotonic() + settings.warmup_timeout_seconds
+
+    t0 = time.perf_counter()
+    await asyncio.to_thread(_warm_kernels)
+    out["kernels"] = time.perf_counter() - t0
+
+    if settings.hot_window_name:
+        t0 = time.perf_counter()
+        if not await _wait_for_hot_window(deadline):
+            log.warning("warm-up: hot window not filled after %.0fs; continuing", settings.warmup_timeout_seconds)
+        out["hot_window"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.to_thread(_warm_data)
+    except Exception:
+        log.exception("warm-up: loading data failed; the first request will load it")
+    out["data"] = time.perf_counter() - t0
+
+    log.info("warm-up done: %s", ", ".join(f"{k} {v:.2f}s" for k, v in out.items()))
+    return out
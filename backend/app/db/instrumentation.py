@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import Pool
+
+from app.core.metrics import (
+    DB_POOL_CONNECTIONS,
+    DB_POOL_EXHAUSTED,
+    DB_POOL_SATURATION,
+    DB_QUERY_SECONDS,
+    DB_SLOW_QUERIES,
+    current_endpoint,
+)
+
+slow_log = logging.getLogger("app.db.slow_query")
+
+_MAX_STATEMENT_CHARS = 2000
+_MAX_PARAMS_CHARS = 1000
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]}… ({len(text)} chars)"
+
+
+def instrument_queries(engine: Engine, *, slow_query_ms: float) -> None:
+    """
+    Time every statement into `runestreet_db_query_duration_seconds` (labelled with the request's endpoint) and
+    log those slower than `slow_query_ms` with their parameters.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        seconds = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+        endpoint = current_endpoint() or "other"
+        DB_QUERY_SECONDS.labels(endpoint).observe(seconds)
+        if slow_query_ms and seconds * 1000 >= slow_query_ms:
+            DB_SLOW_QUERIES.labels(endpoint).inc()
+            slow_log.warning(
+                "slow query: %.1f ms (endpoint=%s, rows=%s)\n%s\nparameters: %s",
+                seconds * 1000,
+                endpoint,
+                cursor.rowcount,
+                _clip(" ".join(statement.split()), _MAX_STATEMENT_CHARS),
+                _clip(repr(parameters), _MAX_PARAMS_CHARS),
+            )
+
+
+def pool_status(pool: Pool, *, capacity: int) -> dict[str, float]:
+    """
+    Connection counts of a QueuePool and its saturation (checked out / `capacity`). Other pool classes (e.g.
+    NullPool) expose none of these and yield an empty dict.
+    """
+    if not hasattr(pool, "checkedout"):
+        return {}
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "checked_out": checked_out,
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "saturation": checked_out / capacity if capacity > 0 else 0.0,
+    }
+
+
+def update_pool_metrics(pool: Pool, *, capacity: int) -> dict[str, float]:
+    status = pool_status(pool, capacity=capacity)
+    for state in ("size", "checked_out", "checked_in", "overflow"):
+        if state in status:
+            DB_POOL_CONNECTIONS.labels(state).set(status[state])
+    if "saturation" in status:
+        DB_POOL_SATURATION.set(status["saturation"])
+    return status
+
+
+def instrument_pool(pool: Pool, *, capacity: int) -> None:
+    """
+    Count checkouts that take the pool's last connection: the gauges are sampled when /metrics is scraped and
+    miss short bursts, this counter does not.
+    """
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_conn: Any, record: Any, proxy: Any) -> None:
+        if hasattr(pool, "checkedout") and pool.checkedout() >= capacity:
+            DB_POOL_EXHAUSTED.inc()
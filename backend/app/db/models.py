@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Boolean, Integer, Text
+from sqlalchemy import BigInteger, Boolean, ForeignKey, Index, Integer, PrimaryKeyConstraint, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
@@ -30,9 +31,48 @@ class Bucket5m(Base):
 
 class ItemBucket5m(Base):
     __tablename__ = "item_bucket_5m"
+    # Per-item reads use the primary key; time-range scans use the BRIN index (rows are appended bucket by bucket).
+    __table_args__ = (
+        PrimaryKeyConstraint("item_id", "bucket_ts"),
+        Index(
+            "ix_item_bucket_5m_bucket_ts_brin",
+            "bucket_ts",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32, "autosummarize": "on"},
+        ),
+    )
+
+    bucket_ts: Mapped[int] = mapped_column(BigInteger)
+    item_id: Mapped[int] = mapped_column(Integer)
+
+    avg_high: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    high_vol: Mapped[int] = mapped_column(Integer)
+    avg_low: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    low_vol: Mapped[int] = mapped_column(Integer)
+
+
+class Bucket1h(Base):
+    __tablename__ = "bucket_1h"
 
     bucket_ts: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ingested_at: Mapped[int] = mapped_column(BigInteger)
+
+
+class ItemBucket1h(Base):
+    __tablename__ = "item_bucket_1h"
+    # Per-item reads use the primary key; time-range scans use the BRIN index (rows are appended bucket by bucket).
+    __table_args__ = (
+        PrimaryKeyConstraint("item_id", "bucket_ts"),
+        Index(
+            "ix_item_bucket_1h_bucket_ts_brin",
+            "bucket_ts",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32, "autosummarize": "on"},
+        ),
+    )
+
+    bucket_ts: Mapped[int] = mapped_column(BigInteger)
+    item_id: Mapped[int] = mapped_column(Integer)
 
     avg_high: Mapped[int | None] = mapped_column(Integer, nullable=True)
     high_vol: Mapped[int] = mapped_column(Integer)
@@ -59,3 +99,42 @@ class ItemTimeseries24h(Base):
     low_vol: Mapped[int] = mapped_column(Integer)
 
 
+class ItemLatest(Base):
+    __tablename__ = "item_latest"
+
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    high: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    high_time: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    low: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    low_time: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    fetched_at: Mapped[int] = mapped_column(BigInteger)
+
+
+class ScanSubscription(Base):
+    __tablename__ = "scan_subscription"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(Text)
+    request: Mapped[dict] = mapped_column(JSONB)  # ScanRequest.model_dump(mode="json")
+    created_at: Mapped[int] = mapped_column(BigInteger)
+    # Bucket ("now") of the last evaluation; None until the first one.
+    last_evaluated_ts: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+
+class ScanSubscriptionResult(Base):
+    """
+    One detected dump per (subscription, item, dump bucket). Re-detections at later buckets refresh `result` and
+    `last_seen_ts`; `first_seen_ts` is the evaluation that first reported it ("new since" reads by it).
+    """
+
+    __tablename__ = "scan_subscription_result"
+    __table_args__ = (Index("ix_scan_subscription_result_first_seen", "subscription_id", "first_seen_ts"),)
+
+    subscription_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("scan_subscription.id", ondelete="CASCADE"), primary_key=True
+    )
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    dump_bucket_ts: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    first_seen_ts: Mapped[int] = mapped_column(BigInteger)
+    last_seen_ts: Mapped[int] = mapped_column(BigInteger)
+    result: Mapped[dict] = mapped_column(JSONB)  # ScanResult.model_dump(mode="json")
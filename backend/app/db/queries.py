@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import BigInteger, ColumnElement, Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+
+# Predicate builders whose SQL text does not depend on how many values are passed. `col.in_(list)` renders one
+# placeholder per value, so a 288-bucket window is a different statement from a 289-bucket one and every request
+# binds hundreds of parameters. With constant text psycopg prepares the statement server-side once it has run
+# `DB_PREPARE_THRESHOLD` times on a connection, and later executions skip parsing and planning.
+
+
+def ts_in(column: Any, bucket_ts: Iterable[int], *, step: int) -> ColumnElement[bool]:
+    """
+    `column IN bucket_ts` for a column of `step`-aligned bucket timestamps: a two-parameter BETWEEN (an index
+    range scan) when the timestamps are consecutive, which every scan/spreads/series window is, otherwise
+    `column = ANY(:array)`.
+    """
+    ts = sorted({int(t) for t in bucket_ts})
+    if ts and ts[-1] - ts[0] == step * (len(ts) - 1):
+        return column.between(ts[0], ts[-1])
+    return column == any_(bindparam(None, ts, type_=ARRAY(BigInteger)))
+
+
+def ids_in(column: Any, ids: Iterable[int]) -> ColumnElement[bool]:
+    """
+    `column IN ids` as `column = ANY(:array)`: one bound array whatever the number of ids.
+    """
+    return column == any_(bindparam(None, sorted({int(i) for i in ids}), type_=ARRAY(Integer)))
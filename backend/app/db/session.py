@@ -1,16 +1,39 @@
 from __future__ import annotations
 
+from typing import Any
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.settings import settings
-
-
-engine = create_engine(settings.sqlalchemy_database_url(), pool_pre_ping=True)
+from app.db.instrumentation import instrument_pool, instrument_queries
+
+
+def _connect_args(url: str) -> dict[str, Any]:
+    if make_url(url).get_driver_name() != "psycopg":
+        return {}
+    # Server-side prepared statements (psycopg3 only); the query builders in app/db/queries.py keep SQL text
+    # stable so repeated scans hit them.
+    threshold = settings.db_prepare_threshold
+    return {"prepare_threshold": None if threshold < 0 else threshold}
+
+
+_url = settings.sqlalchemy_database_url()
+engine = create_engine(
+    _url,
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    connect_args=_connect_args(_url),
+)
+POOL_CAPACITY = settings.db_pool_size + settings.db_max_overflow
+instrument_queries(engine, slow_query_ms=settings.db_slow_query_ms)
+instrument_pool(engine.pool, capacity=POOL_CAPACITY)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
 def session_scope() -> Session:
     return SessionLocal()
-
-
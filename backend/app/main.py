@@ -1,14 +1,62 @@
 from __future__ import annotations
 
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router as api_router
+from app.core.change_feed import run_listener
+from app.core.http_cache import CompressionMiddleware, HttpCacheMiddleware
+from app.core.profiling import ProfilingMiddleware
 from app.core.settings import settings
+from app.core.warmup import warm_up
+from app.osrs.latest import run_latest_poller
+from app.osrs.leader import run_leader_election
+from app.scan.related import run_precompute as run_related_precompute
+from app.scan.subscriptions import run_subscription_evaluator
+from app.store.hot_window import run_updater
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    tasks: list[asyncio.Task[None]] = []
+    stop = asyncio.Event()
+    if settings.change_feed_enabled:
+        tasks.append(asyncio.create_task(run_listener(stop)))
+    if settings.hot_window_name:
+        # Every worker competes for the updater lock; the winner keeps the shared window current.
+        tasks.append(asyncio.create_task(run_updater(stop)))
+    if settings.ingest_leader_election:
+        # One process across all replicas holds the advisory lock and ingests; the rest only read.
+        tasks.append(asyncio.create_task(run_leader_election(stop)))
+    if settings.latest_poller_enabled:
+        tasks.append(asyncio.create_task(run_latest_poller(stop)))
+    if settings.subscriptions_enabled:
+        tasks.append(asyncio.create_task(run_subscription_evaluator(stop)))
+    if settings.related_precompute_enabled:
+        tasks.append(asyncio.create_task(run_related_precompute(stop)))
+    if settings.warmup_on_startup:
+        # After the background tasks start: warm-up waits for the hot-window updater to restore/fill the window.
+        await warm_up()
+    try:
+        yield
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Runestreet Dump Detector", version="0.1.0")
+    app = FastAPI(title="Runestreet Dump Detector", version="0.1.0", lifespan=lifespan)
+
+    # Middleware added later wraps what was added before: CORS must see 304s from the HTTP cache, and compression
+    # only the bodies that are actually sent.
+    if settings.http_cache_enabled:
+        app.add_middleware(HttpCacheMiddleware)
+    if settings.compression_min_bytes:
+        app.add_middleware(CompressionMiddleware)
 
     if settings.cors_allowed_origins:
         origins = [o.strip() for o in settings.cors_allowed_origins.split(",") if o.strip()]
@@ -19,8 +67,16 @@ def create_app() -> FastAPI:
                 allow_credentials=True,
                 allow_methods=["*"],
                 allow_headers=["*"],
+                expose_headers=["ETag"],
             )
 
+    if settings.profiling_enabled:
+        # Not installed at all unless enabled, so the default deployment pays nothing. Profiles expose code paths
+        # and timings, so triggering and downloading them always needs the token.
+        if not settings.profiling_token:
+            raise RuntimeError("PROFILING_ENABLED requires PROFILING_TOKEN")
+        app.add_middleware(ProfilingMiddleware)
+
     app.include_router(api_router, prefix="/api")
     return app
 
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.settings import settings
+from app.db.models import Bucket5m
+from app.db.session import SessionLocal
+from app.osrs.client import _SETTLED_AFTER_SECONDS, OsrsPricesClient
+from app.osrs.ingest import _bucket_rows, floor_to_5m, now_ts
+
+BucketRows = tuple[int, list[dict[str, Any]]]
+
+_COLUMNS = ("bucket_ts", "item_id", "avg_high", "high_vol", "avg_low", "low_vol")
+
+
+class RateLimiter:
+    """
+    Spaces acquisitions at least 1 / `per_second` apart across all tasks (no limit when `per_second` <= 0).
+    """
+
+    def __init__(self, per_second: float) -> None:
+        self._interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            self._next = max(now, self._next) + self._interval
+
+
+def pending_buckets(from_ts: int, to_ts: int) -> list[int]:
+    """
+    5m buckets in [from_ts, to_ts] not yet in `bucket_5m`, oldest first. `bucket_5m` is the checkpoint: a bucket
+    is recorded there in the same transaction as its rows.
+    """
+    with SessionLocal() as db:
+        done = set(
+            db.execute(select(Bucket5m.bucket_ts).where(Bucket5m.bucket_ts.between(from_ts, to_ts))).scalars().all()
+        )
+    return [ts for ts in range(from_ts, to_ts + 1, 300) if ts not in done]
+
+
+def load_buckets(buckets: list[BucketRows]) -> int:
+    """
+    Bulk-load fetched buckets in one transaction: COPY the rows into a temp table, upsert them into
+    `item_bucket_5m` in primary-key order, then checkpoint the buckets in `bucket_5m`. Returns rows loaded.
+    """
+    n_rows = sum(len(rows) for _, rows in buckets)
+    with SessionLocal() as db:
+        conn = db.connection().connection.driver_connection
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS backfill_rows (LIKE item_bucket_5m) ON COMMIT DELETE ROWS")
+            with cur.copy(f"COPY backfill_rows ({', '.join(_COLUMNS)}) FROM STDIN") as copy:
+                for _, rows in buckets:
+                    for row in rows:
+                        copy.write_row(tuple(row[c] for c in _COLUMNS))
+        db.execute(
+            text(
+                f"INSERT INTO item_bucket_5m ({', '.join(_COLUMNS)}) "
+                f"SELECT {', '.join(_COLUMNS)} FROM backfill_rows ORDER BY bucket_ts, item_id "
+                "ON CONFLICT (item_id, bucket_ts) DO UPDATE SET avg_high = EXCLUDED.avg_high, "
+                "high_vol = EXCLUDED.high_vol, avg_low = EXCLUDED.avg_low, low_vol = EXCLUDED.low_vol"
+            )
+        )
+        ingested_at = now_ts()
+        db.execute(
+            insert(Bucket5m)
+            .values([{"bucket_ts": ts, "ingested_at": ingested_at} for ts, _ in buckets])
+            .on_conflict_do_nothing(index_elements=[Bucket5m.bucket_ts])
+        )
+        # No change-feed events: backfilled history is older than every in-process window, and the hot-window
+        # updater polls `bucket_5m` anyway.
+        db.commit()
+    return n_rows
+
+
+async def backfill(
+    bucket_ts_list: list[int],
+    *,
+    concurrency: int,
+    requests_per_second: float,
+    batch_buckets: int,
+    report: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Fetch and load `bucket_ts_list` (oldest first). Up to `concurrency` requests are in flight, started no
+    faster than `requests_per_second`; fetched buckets are loaded `batch_buckets` at a time, in order, on a
+    worker thread while the next batch downloads. A bucket whose fetch fails after the client's retries is
+    skipped and stays pending for the next run.
+    """
+    limiter = RateLimiter(requests_per_second)
+    sem = asyncio.Semaphore(concurrency)
+    client = OsrsPricesClient()
+    stats: dict[str, Any] = {"requested": len(bucket_ts_list), "buckets": 0, "rows": 0, "failed": []}
+    t0 = time.perf_counter()
+
+    async def fetch(ts: int) -> list[dict[str, Any]]:
+        async with sem:
+            await limiter.wait()
+            payload = await client.get_5m_bucket(ts)
+        data = payload.get("data")
+        return _bucket_rows(ts, data) if isinstance(data, dict) else []
+
+    def progress(loaded: list[BucketRows], n_rows: int) -> None:
+        stats["buckets"] += len(loaded)
+        stats["rows"] += n_rows
+        elapsed = time.perf_counter() - t0
+        stats["seconds"] = round(elapsed, 2)
+        stats["buckets_per_second"] = round(stats["buckets"] / elapsed, 2) if elapsed > 0 else None
+        stats["rows_per_second"] = round(stats["rows"] / elapsed) if elapsed > 0 else None
+        stats["last_bucket_ts"] = loaded[-1][0]
+        if report is not None:
+            report(stats)
+
+    # Fetches run ahead of loading by a bounded window, so a slow database cannot pile up payloads in memory.
+    lookahead = max(concurrency, 2 * batch_buckets)
+    queue = iter(bucket_ts_list)
+    in_flight: deque[tuple[int, asyncio.Task[list[dict[str, Any]]]]] = deque()
+    batch: list[BucketRows] = []
+    loading: asyncio.Future[int] | None = None
+    loading_batch: list[BucketRows] = []
+
+    def top_up() -> None:
+        while len(in_flight) < lookahead:
+            ts = next(queue, None)
+            if ts is None:
+                return
+            in_flight.append((ts, asyncio.create_task(fetch(ts))))
+
+    try:
+        top_up()
+        while in_flight:
+            ts, task = in_flight.popleft()
+            try:
+                batch.append((ts, await task))
+            except Exception as e:
+                stats["failed"].append(ts)
+                print(f"[backfill] bucket {ts} failed: {e!r}")
+            top_up()
+            if batch and (len(batch) >= batch_buckets or not in_flight):
+                if loading is not None:
+                    progress(loading_batch, await loading)
+                loading_batch, batch = batch, []
+                loading = asyncio.ensure_future(asyncio.to_thread(load_buckets, loading_batch))
+        if loading is not None:
+            progress(loading_batch, await loading)
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+        await client.aclose()
+    stats["remaining"] = len(bucket_ts_list) - stats["buckets"]
+    return stats
+
+
+def _report(stats: dict[str, Any]) -> None:
+    done, requested = stats["buckets"], stats["requested"]
+    rate = stats["buckets_per_second"] or 0.0
+    eta = (requested - done - len(stats["failed"])) / rate if rate > 0 else float("nan")
+    print(
+        f"[backfill] {done}/{requested} buckets ({100.0 * done / max(requested, 1):.1f}%), "
+        f"{rate:.2f} buckets/s, {stats['rows_per_second']:,} rows/s, eta {eta / 60:.1f} min"
+    )
+
+
+def main() -> None:
+    """
+    Resumable historical backfill of `item_bucket_5m`: rerunning the same command after an interruption or
+    failure fetches only the buckets not yet checkpointed in `bucket_5m`.
+    """
+    p = argparse.ArgumentParser(description="Backfill 5m buckets from the OSRS prices API into Postgres.")
+    p.add_argument("--from", dest="from_ts", type=int, required=True, help="First bucket_ts (unix seconds).")
+    p.add_argument(
+        "--to", dest="to_ts", type=int, default=None, help="Last bucket_ts (unix seconds; default: latest settled)."
+    )
+    p.add_argument("--concurrency", type=int, default=settings.backfill_concurrency)
+    p.add_argument(
+        "--rate", type=float, default=settings.backfill_requests_per_second, help="Upstream requests/s (0: unlimited)."
+    )
+    p.add_argument("--batch", type=int, default=12, help="Buckets per bulk-load transaction.")
+    args = p.parse_args()
+    if args.concurrency < 1 or args.batch < 1:
+        p.error("--concurrency and --batch must be at least 1")
+
+    # Recent buckets can still be filled in upstream; checkpointing one early would freeze it incomplete.
+    settled = floor_to_5m(now_ts() - 300 - _SETTLED_AFTER_SECONDS)
+    from_ts = floor_to_5m(args.from_ts)
+    to_ts = min(floor_to_5m(args.to_ts) if args.to_ts is not None else settled, settled)
+    if to_ts < from_ts:
+        p.error(f"nothing to do: --to is before --from once capped to the last settled bucket ({settled})")
+
+    pending = pending_buckets(from_ts, to_ts)
+    total = (to_ts - from_ts) // 300 + 1
+    print(f"[backfill] {from_ts}..{to_ts}: {total} buckets, {total - len(pending)} already loaded, {len(pending)} to fetch")
+    try:
+        stats = asyncio.run(
+            backfill(
+                pending,
+                concurrency=args.concurrency,
+                requests_per_second=args.rate,
+                batch_buckets=args.batch,
+                report=_report,
+            )
+        )
+    except KeyboardInterrupt:
+        raise SystemExit("[backfill] interrupted; loaded batches are committed, rerun the same command to resume")
+    print(json.dumps(stats))
+    if stats["failed"]:
+        raise SystemExit(f"[backfill] {len(stats['failed'])} buckets failed; rerun to retry them")
+
+
+if __name__ == "__main__":
+    main()
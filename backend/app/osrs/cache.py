@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlencode
+
+from app.core.settings import settings
+
+try:  # zstd is optional; gzip is always available.
+    import zstandard as _zstd
+except ImportError:  # pragma: no cover - depends on environment
+    _zstd = None
+
+
+_CODEC_SUFFIXES = (".zst", ".gz")
+
+
+def cache_key(path: str, params: dict[str, Any] | None = None) -> str:
+    """
+    Content address for an upstream request: sha256 over the endpoint and its sorted query params.
+    """
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(f"{path}?{query}".encode("utf-8")).hexdigest()
+
+
+def _compress(raw: bytes, suffix: str) -> bytes:
+    if suffix == ".zst":
+        assert _zstd is not None
+        return _zstd.ZstdCompressor(level=10).compress(raw)
+    return gzip.compress(raw, compresslevel=6)
+
+
+def _decompress(blob: bytes, suffix: str) -> bytes:
+    if suffix == ".zst":
+        if _zstd is None:
+            raise RuntimeError("zstandard is not installed; cannot read .zst cache entries")
+        return _zstd.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class RawPayloadCache:
+    """
+    On-disk cache of raw upstream response bodies.
+
+    Layout: `<root>/<endpoint>/<key[:2]>/<key>.json.{zst,gz}` where `key` is `cache_key(path, params)`.
+    In `replay` mode the client must serve every request from here and never touch the network; in `record` mode
+    it stores every response (including unsettled buckets) and serves nothing from here.
+    """
+
+    def __init__(self, root: str | os.PathLike[str], *, replay: bool = False, record: bool = False) -> None:
+        self.root = Path(root)
+        self.replay = replay
+        self.record = record
+        self._suffix = ".zst" if _zstd is not None else ".gz"
+
+    @classmethod
+    def from_settings(cls) -> RawPayloadCache | None:
+        if not settings.osrs_cache_dir:
+            return None
+        mode = settings.osrs_cache_mode
+        return cls(settings.osrs_cache_dir, replay=mode == "replay", record=mode == "record")
+
+    def _entry_path(self, path: str, params: dict[str, Any] | None, suffix: str) -> Path:
+        key = cache_key(path, params)
+        endpoint = path.strip("/").replace("/", "_") or "root"
+        return self.root / endpoint / key[:2] / f"{key}.json{suffix}"
+
+    def get(self, path: str, params: dict[str, Any] | None = None) -> bytes | None:
+        # Prefer the active codec but still read entries written with the other one.
+        for suffix in (self._suffix, *[s for s in _CODEC_SUFFIXES if s != self._suffix]):
+            p = self._entry_path(path, params, suffix)
+            try:
+                blob = p.read_bytes()
+            except FileNotFoundError:
+                continue
+            return _decompress(blob, suffix)
+        return None
+
+    def put(self, path: str, params: dict[str, Any] | None, raw: bytes) -> None:
+        p = self._entry_path(path, params, self._suffix)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial entry.
+        fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_compress(raw, self._suffix))
+            os.replace(tmp, p)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
@@ -1,26 +1,50 @@
 from __future__ import annotations
 
+import json
+import time
+from collections.abc import Callable
 from typing import Any
 
 import httpx
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
+from app.core.metrics import UPSTREAM_CACHE, UPSTREAM_ERRORS, UPSTREAM_SECONDS, stage
 from app.core.settings import settings
+from app.osrs.cache import RawPayloadCache
 
 
 class OsrsApiError(RuntimeError):
     pass
 
 
+_Validator = Callable[[Any, str], None]
+
+
+# A 5m/1h bucket is only treated as immutable (servable from the disk cache outside replay mode)
+# once it has been closed for a while; the upstream can still fill in very recent buckets.
+_SETTLED_AFTER_SECONDS = 15 * 60
+
+
 def _headers() -> dict[str, str]:
     # Required by OSRS wiki acceptable use policy; defaults like python-requests/curl are blocked.
     return {"User-Agent": settings.osrs_user_agent}
 
 
+def _require_list(data: Any, what: str) -> None:
+    if not isinstance(data, list):
+        raise OsrsApiError(f"{what} response not a list")
+
+
+def _require_data_field(data: Any, what: str) -> None:
+    if not isinstance(data, dict) or "data" not in data:
+        raise OsrsApiError(f"{what} response missing data field")
+
+
 class OsrsPricesClient:
-    def __init__(self) -> None:
+    def __init__(self, *, cache: RawPayloadCache | None = None) -> None:
         self._base = str(settings.osrs_base_url).rstrip("/")
         self._client = httpx.AsyncClient(base_url=self._base, headers=_headers(), timeout=30.0)
+        self._cache = cache if cache is not None else RawPayloadCache.from_settings()
 
     async def aclose(self) -> None:
         await self._client.aclose()
@@ -31,43 +55,72 @@ class OsrsPricesClient:
         wait=wait_exponential_jitter(initial=0.5, max=8.0),
         retry=retry_if_exception_type((httpx.TimeoutException, httpx.NetworkError, OsrsApiError)),
     )
-    async def get_mapping(self) -> list[dict[str, Any]]:
-        resp = await self._client.get("/mapping")
+    async def _fetch(self, path: str, params: dict[str, Any], *, what: str, validate: _Validator) -> tuple[Any, bytes]:
+        t0 = time.perf_counter()
+        try:
+            resp = await self._client.get(path, params=params or None)
+        except httpx.TimeoutException:
+            UPSTREAM_ERRORS.labels(path, "timeout").inc()
+            raise
+        except httpx.NetworkError:
+            UPSTREAM_ERRORS.labels(path, "network").inc()
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels(path).observe(time.perf_counter() - t0)
         if resp.status_code != 200:
-            raise OsrsApiError(f"mapping failed: HTTP {resp.status_code}: {resp.text[:200]}")
+            UPSTREAM_ERRORS.labels(path, f"http_{resp.status_code // 100}xx").inc()
+            raise OsrsApiError(f"{what} failed: HTTP {resp.status_code}: {resp.text[:200]}")
         data = resp.json()
-        if not isinstance(data, list):
-            raise OsrsApiError("mapping response not a list")
-        return data
+        try:
+            validate(data, what)
+        except OsrsApiError:
+            UPSTREAM_ERRORS.labels(path, "invalid").inc()
+            raise
+        return data, resp.content
 
-    @retry(
-        reraise=True,
-        stop=stop_after_attempt(4),
-        wait=wait_exponential_jitter(initial=0.5, max=8.0),
-        retry=retry_if_exception_type((httpx.TimeoutException, httpx.NetworkError, OsrsApiError)),
-    )
-    async def get_5m_bucket(self, timestamp: int) -> dict[str, Any]:
-        resp = await self._client.get("/5m", params={"timestamp": timestamp})
-        if resp.status_code != 200:
-            raise OsrsApiError(f"5m failed: HTTP {resp.status_code}: {resp.text[:200]}")
-        data = resp.json()
-        if not isinstance(data, dict) or "data" not in data:
-            raise OsrsApiError("5m response missing data field")
-        return data
+    async def _get_json(self, path: str, params: dict[str, Any], *, what: str, validate: _Validator, immutable: bool) -> Any:
+        cache = self._cache
+        if cache is not None and ((immutable and not cache.record) or cache.replay):
+            raw = cache.get(path, params)
+            UPSTREAM_CACHE.labels(path, "hit" if raw is not None else "miss").inc()
+            if raw is not None:
+                data = json.loads(raw)
+                validate(data, what)
+                return data
+            if cache.replay:
+                raise OsrsApiError(f"{what} not in replay cache: {path} {params}")
 
-    @retry(
-        reraise=True,
-        stop=stop_after_attempt(4),
-        wait=wait_exponential_jitter(initial=0.5, max=8.0),
-        retry=retry_if_exception_type((httpx.TimeoutException, httpx.NetworkError, OsrsApiError)),
-    )
-    async def get_timeseries(self, item_id: int, timestep: str) -> dict[str, Any]:
-        resp = await self._client.get("/timeseries", params={"id": item_id, "timestep": timestep})
-        if resp.status_code != 200:
-            raise OsrsApiError(f"timeseries failed: HTTP {resp.status_code}: {resp.text[:200]}")
-        data = resp.json()
-        if not isinstance(data, dict) or "data" not in data:
-            raise OsrsApiError("timeseries response missing data field")
+        with stage("upstream_fetch"):
+            data, raw = await self._fetch(path, params, what=what, validate=validate)
+        # Only settled payloads outside record mode: an in-progress bucket stored under its key would be served as
+        # immutable, and partial, once it settles.
+        if cache is not None and (immutable or cache.record):
+            cache.put(path, params, raw)
         return data
 
+    async def get_mapping(self) -> list[dict[str, Any]]:
+        return await self._get_json("/mapping", {}, what="mapping", validate=_require_list, immutable=False)
+
+    async def get_latest(self) -> dict[str, Any]:
+        return await self._get_json("/latest", {}, what="latest", validate=_require_data_field, immutable=False)
 
+    async def get_5m_bucket(self, timestamp: int) -> dict[str, Any]:
+        settled = timestamp + 300 + _SETTLED_AFTER_SECONDS <= int(time.time())
+        return await self._get_json(
+            "/5m", {"timestamp": timestamp}, what="5m", validate=_require_data_field, immutable=settled
+        )
+
+    async def get_1h_bucket(self, timestamp: int) -> dict[str, Any]:
+        settled = timestamp + 3600 + _SETTLED_AFTER_SECONDS <= int(time.time())
+        return await self._get_json(
+            "/1h", {"timestamp": timestamp}, what="1h", validate=_require_data_field, immutable=settled
+        )
+
+    async def get_timeseries(self, item_id: int, timestep: str) -> dict[str, Any]:
+        return await self._get_json(
+            "/timeseries",
+            {"id": item_id, "timestep": timestep},
+            what="timeseries",
+            validate=_require_data_field,
+            immutable=False,
+        )
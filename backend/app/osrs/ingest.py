@@ -7,8 +7,17 @@ from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from app.db.models import Bucket5m, ItemBucket5m, ItemMapping
+from app.core.change_feed import BUCKET_5M, MAPPING, notify
+from app.core.metrics import stage
+from app.db.models import Bucket1h, Bucket5m, ItemBucket1h, ItemBucket5m, ItemMapping
+from app.db.queries import ts_in
 from app.osrs.client import OsrsPricesClient
+from app.osrs.leader import may_ingest
+from app.osrs.search import get_search_index
+from app.scan.ewma_index import get_ewma_index
+from app.store.columnar import get_store
+from app.store.hot_window import publish_bucket
+from app.store.summary import get_summary_index
 
 
 def now_ts() -> int:
@@ -20,6 +29,8 @@ def floor_to_5m(ts: int) -> int:
 
 
 async def ensure_mapping_cached(db: Session, client: OsrsPricesClient, *, max_age_seconds: int = 24 * 3600) -> None:
+    if not may_ingest():
+        return  # follower: the ingest leader keeps mapping fresh
     latest = db.execute(select(ItemMapping.mapping_fetched_at).order_by(ItemMapping.mapping_fetched_at.desc()).limit(1)).scalar_one_or_none()
     if latest is not None and (now_ts() - int(latest)) < max_age_seconds:
         return
@@ -61,18 +72,63 @@ async def ensure_mapping_cached(db: Session, client: OsrsPricesClient, *, max_ag
         )
         db.execute(stmt)
 
+    notify(db, MAPPING)
     db.commit()
+    get_search_index().mark_stale()
 
 
 def missing_bucket_ts(db: Session, bucket_ts_list: list[int]) -> list[int]:
     if not bucket_ts_list:
         return []
     existing = set(
-        db.execute(select(Bucket5m.bucket_ts).where(Bucket5m.bucket_ts.in_(bucket_ts_list))).scalars().all()
+        db.execute(select(Bucket5m.bucket_ts).where(ts_in(Bucket5m.bucket_ts, bucket_ts_list, step=300))).scalars().all()
     )
     return [ts for ts in bucket_ts_list if ts not in existing]
 
 
+def _bucket_rows(bucket_ts: int, data: dict[str, Any]) -> list[dict[str, Any]]:
+    # Per-item bucket rows from a /5m or /1h payload. Keys are item IDs as strings in practice. Entries with no
+    # trades on either side (no volume, no prices) are dropped: a missing row already means "did not trade".
+    rows: list[dict[str, Any]] = []
+    for k, v in data.items():
+        try:
+            item_id = int(k)
+        except Exception:
+            continue
+        if not isinstance(v, dict):
+            continue
+        row = {
+            "bucket_ts": bucket_ts,
+            "item_id": item_id,
+            "avg_high": v.get("avgHighPrice"),
+            "high_vol": int(v.get("highPriceVolume") or 0),
+            "avg_low": v.get("avgLowPrice"),
+            "low_vol": int(v.get("lowPriceVolume") or 0),
+        }
+        if row["high_vol"] == 0 and row["low_vol"] == 0 and row["avg_high"] is None and row["avg_low"] is None:
+            continue
+        rows.append(row)
+    return rows
+
+
+def upsert_bucket_rows(db: Session, model: type[ItemBucket5m] | type[ItemBucket1h], rows: list[dict[str, Any]]) -> None:
+    """
+    Upsert `_bucket_rows` output. Executed as one statement with the rows as parameter sets, which SQLAlchemy
+    batches into multi-row INSERTs: compiling one huge VALUES clause instead costs more than the insert itself.
+    """
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.item_id, model.bucket_ts],
+        set_={
+            "avg_high": stmt.excluded.avg_high,
+            "high_vol": stmt.excluded.high_vol,
+            "avg_low": stmt.excluded.avg_low,
+            "low_vol": stmt.excluded.low_vol,
+        },
+    )
+    db.execute(stmt, rows)
+
+
 async def ingest_5m_bucket(db: Session, client: OsrsPricesClient, bucket_ts: int) -> None:
     payload = await client.get_5m_bucket(bucket_ts)
     data = payload.get("data")
@@ -87,46 +143,79 @@ async def ingest_5m_bucket(db: Session, client: OsrsPricesClient, bucket_ts: int
         .on_conflict_do_nothing(index_elements=[Bucket5m.bucket_ts])
     )
 
-    # Insert per-item bucket rows. Keys are item IDs as strings in practice.
-    rows: list[dict[str, Any]] = []
-    for k, v in data.items():
-        try:
-            item_id = int(k)
-        except Exception:
-            continue
-        if not isinstance(v, dict):
-            continue
-        rows.append(
-            {
-                "bucket_ts": bucket_ts,
-                "item_id": item_id,
-                "avg_high": v.get("avgHighPrice"),
-                "high_vol": int(v.get("highPriceVolume") or 0),
-                "avg_low": v.get("avgLowPrice"),
-                "low_vol": int(v.get("lowPriceVolume") or 0),
-            }
-        )
+    rows = _bucket_rows(bucket_ts, data)
 
-    if rows:
-        stmt = insert(ItemBucket5m).values(rows)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=[ItemBucket5m.bucket_ts, ItemBucket5m.item_id],
-            set_={
-                "avg_high": stmt.excluded.avg_high,
-                "high_vol": stmt.excluded.high_vol,
-                "avg_low": stmt.excluded.avg_low,
-                "low_vol": stmt.excluded.low_vol,
-            },
-        )
-        db.execute(stmt)
+    with stage("ingest_upsert") as st:
+        st.rows = len(rows)
+        if rows:
+            upsert_bucket_rows(db, ItemBucket5m, rows)
 
-    db.commit()
+        notify(db, BUCKET_5M, bucket_ts=bucket_ts)
+        db.commit()
+
+    store = get_store()
+    if store is not None:
+        with stage("columnar_write") as st:
+            st.rows = store.write_bucket(bucket_ts, rows)["written"]
+    publish_bucket(bucket_ts, rows)
+    get_summary_index().apply_bucket(bucket_ts, rows)
+    get_ewma_index().apply_bucket(bucket_ts, rows)
 
 
 async def ensure_buckets_cached(db: Session, client: OsrsPricesClient, bucket_ts_list: list[int]) -> dict[str, Any]:
-    missing = missing_bucket_ts(db, bucket_ts_list)
+    with stage("missing_bucket_ts") as st:
+        missing = missing_bucket_ts(db, bucket_ts_list)
+        st.rows = len(bucket_ts_list)
+    if not may_ingest():
+        # Follower: read whatever the ingest leader has stored so far.
+        return {"requested": len(bucket_ts_list), "missing": len(missing), "role": "follower"}
     for ts in sorted(missing):
         await ingest_5m_bucket(db, client, ts)
     return {"requested": len(bucket_ts_list), "missing": len(missing)}
 
 
+def floor_to_1h(ts: int) -> int:
+    return ts - (ts % 3600)
+
+
+def missing_bucket_1h_ts(db: Session, bucket_ts_list: list[int]) -> list[int]:
+    if not bucket_ts_list:
+        return []
+    existing = set(
+        db.execute(select(Bucket1h.bucket_ts).where(ts_in(Bucket1h.bucket_ts, bucket_ts_list, step=3600))).scalars().all()
+    )
+    return [ts for ts in bucket_ts_list if ts not in existing]
+
+
+async def ingest_1h_bucket(db: Session, client: OsrsPricesClient, bucket_ts: int) -> None:
+    payload = await client.get_1h_bucket(bucket_ts)
+    data = payload.get("data")
+    if not isinstance(data, dict):
+        return
+
+    db.execute(
+        insert(Bucket1h)
+        .values(bucket_ts=bucket_ts, ingested_at=now_ts())
+        .on_conflict_do_nothing(index_elements=[Bucket1h.bucket_ts])
+    )
+
+    rows = _bucket_rows(bucket_ts, data)
+    with stage("ingest_upsert_1h") as st:
+        st.rows = len(rows)
+        if rows:
+            upsert_bucket_rows(db, ItemBucket1h, rows)
+        db.commit()
+
+
+async def ensure_buckets_1h_cached(db: Session, client: OsrsPricesClient, bucket_ts_list: list[int]) -> dict[str, Any]:
+    """
+    Same as ensure_buckets_cached for completed 1h buckets (`bucket_ts` = start of the hour).
+    """
+    with stage("missing_bucket_1h_ts") as st:
+        missing = missing_bucket_1h_ts(db, bucket_ts_list)
+        st.rows = len(bucket_ts_list)
+    if not may_ingest():
+        return {"requested": len(bucket_ts_list), "missing": len(missing), "role": "follower"}
+    for ts in sorted(missing):
+        await ingest_1h_bucket(db, client, ts)
+    return {"requested": len(bucket_ts_list), "missing": len(missing)}
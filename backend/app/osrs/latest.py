@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.change_feed import LATEST, FeedCache, notify
+from app.core.metrics import stage
+from app.core.settings import settings
+from app.db.models import ItemLatest
+from app.osrs.client import OsrsPricesClient
+from app.osrs.leader import may_ingest
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LatestPrices:
+    """
+    Last instant-buy (high) / instant-sell (low) trade per item from upstream `/latest`, as dense arrays indexed
+    by item id: NaN price and time 0 where an item has no trade on that side.
+    """
+
+    fetched_at: int
+    high: np.ndarray
+    high_time: np.ndarray
+    low: np.ndarray
+    low_time: np.ndarray
+
+    def low_at(self, item_id: int) -> tuple[float, int] | None:
+        """
+        (price, unix time) of the item's latest low trade, if any.
+        """
+        if item_id < 0 or item_id >= self.low.size or not np.isfinite(self.low[item_id]):
+            return None
+        return float(self.low[item_id]), int(self.low_time[item_id])
+
+
+def _from_rows(rows: list[tuple[Any, ...]], fetched_at: int) -> LatestPrices:
+    # rows: (item_id, high, high_time, low, low_time)
+    size = max((int(r[0]) for r in rows), default=-1) + 1
+    high, low = np.full(size, np.nan), np.full(size, np.nan)
+    high_time, low_time = np.zeros(size, dtype="int64"), np.zeros(size, dtype="int64")
+    for item_id, h, ht, lo, lt in rows:
+        if h is not None:
+            high[item_id], high_time[item_id] = float(h), int(ht or 0)
+        if lo is not None:
+            low[item_id], low_time[item_id] = float(lo), int(lt or 0)
+    return LatestPrices(fetched_at=fetched_at, high=high, high_time=high_time, low=low, low_time=low_time)
+
+
+# Every poll is announced on the change feed; the TTL only matters if a notification is missed.
+_cache: FeedCache[LatestPrices] = FeedCache(LATEST, ttl_seconds=settings.latest_poll_seconds)
+
+
+def latest_prices(db: Session) -> LatestPrices:
+    """
+    The latest prices as last persisted by the poller (one small query, cached between polls).
+    """
+
+    def load() -> LatestPrices:
+        with stage("load_latest") as st:
+            rows = db.execute(
+                select(
+                    ItemLatest.item_id,
+                    ItemLatest.high,
+                    ItemLatest.high_time,
+                    ItemLatest.low,
+                    ItemLatest.low_time,
+                    ItemLatest.fetched_at,
+                )
+            ).all()
+            st.rows = len(rows)
+        fetched_at = max((int(r[5]) for r in rows), default=0)
+        return _from_rows([tuple(r[:5]) for r in rows], fetched_at)
+
+    return _cache.get_or_load(load)
+
+
+async def poll_latest(db: Session, client: OsrsPricesClient) -> dict[str, Any]:
+    """
+    Fetch `/latest` once and upsert it into `item_latest`.
+    """
+    payload = await client.get_latest()
+    data = payload.get("data")
+    if not isinstance(data, dict):
+        return {"items": 0}
+
+    fetched_at = int(time.time())
+    rows: list[dict[str, Any]] = []
+    for k, v in data.items():
+        try:
+            item_id = int(k)
+        except Exception:
+            continue
+        if not isinstance(v, dict):
+            continue
+        rows.append(
+            {
+                "item_id": item_id,
+                "high": v.get("high"),
+                "high_time": v.get("highTime"),
+                "low": v.get("low"),
+                "low_time": v.get("lowTime"),
+                "fetched_at": fetched_at,
+            }
+        )
+
+    with stage("latest_upsert") as st:
+        st.rows = len(rows)
+        if rows:
+            stmt = insert(ItemLatest).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ItemLatest.item_id],
+                set_={c: getattr(stmt.excluded, c) for c in ("high", "high_time", "low", "low_time", "fetched_at")},
+            )
+            db.execute(stmt)
+        notify(db, LATEST, fetched_at=fetched_at)
+        db.commit()
+    return {"items": len(rows), "fetched_at": fetched_at}
+
+
+async def run_latest_poller(stop: asyncio.Event) -> None:
+    """
+    Background task: poll `/latest` every `latest_poll_seconds` while this process may ingest.
+    """
+    from app.db.session import SessionLocal
+
+    while not stop.is_set():
+        if may_ingest():
+            client = OsrsPricesClient()
+            try:
+                with SessionLocal() as db:
+                    await poll_latest(db, client)
+            except Exception:
+                log.exception("latest price poll failed")
+            finally:
+                await client.aclose()
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.latest_poll_seconds)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import Connection, create_engine, func, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core.metrics import INGEST_LEADER
+from app.core.settings import settings
+
+log = logging.getLogger(__name__)
+
+# Session-level advisory lock key shared by every replica ("runestre" as a bigint).
+_LOCK_KEY = 0x72756E6573747265
+
+_is_leader = False
+
+
+def is_leader() -> bool:
+    return _is_leader
+
+
+def may_ingest() -> bool:
+    """
+    Whether this process may call the upstream and write ingested rows. Always true unless leader election is
+    enabled, in which case only the advisory-lock holder ingests and everyone else only reads.
+    """
+    return not settings.ingest_leader_election or _is_leader
+
+
+def _set_leader(value: bool) -> None:
+    global _is_leader
+    if value != _is_leader:
+        log.info("ingest leader: pid %s %s leadership", os.getpid(), "acquired" if value else "lost")
+    _is_leader = value
+    INGEST_LEADER.set(1 if value else 0)
+
+
+class _LockHolder:
+    """
+    Owns the dedicated (unpooled) connection the advisory lock lives on. Postgres releases the lock when that
+    connection ends, so a crashed or partitioned leader is replaced by whoever polls next.
+    """
+
+    def __init__(self) -> None:
+        self._engine = create_engine(settings.sqlalchemy_database_url(), poolclass=NullPool)
+        self._conn: Connection | None = None
+
+    def try_acquire(self) -> bool:
+        conn = self._engine.connect()
+        try:
+            got = bool(conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": _LOCK_KEY}).scalar())
+            conn.commit()  # the lock is session-scoped; don't sit idle in a transaction
+        except Exception:
+            conn.close()
+            raise
+        if not got:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def check(self) -> bool:
+        """
+        True while the lock connection is alive (and so still holds the lock).
+        """
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            self.close()
+            return False
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def release(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+                self._conn.commit()
+            except Exception:
+                pass
+        self.close()
+        self._engine.dispose()
+
+
+def _timeseries_item_ids(db: Session) -> list[int]:
+    """
+    Items whose 24h series the leader keeps fresh: everything fetched before, plus the most traded items over
+    the last day (what the spreads shortlist draws from), since followers cannot fetch on demand.
+    """
+    from app.db.models import ItemBucket5m, ItemTimeseries24hMeta
+
+    known = db.execute(select(ItemTimeseries24hMeta.item_id)).scalars().all()
+    since = int(time.time()) - 24 * 3600
+    top = db.execute(
+        select(ItemBucket5m.item_id)
+        .where(ItemBucket5m.bucket_ts >= since)
+        .group_by(ItemBucket5m.item_id)
+        .order_by(func.sum(ItemBucket5m.low_vol + ItemBucket5m.high_vol).desc())
+        .limit(settings.ingest_timeseries_top_k)
+    ).scalars().all()
+    return sorted({int(i) for i in (*known, *top)})
+
+
+async def _ingest_once() -> None:
+    from app.db.session import SessionLocal
+    from app.osrs.client import OsrsPricesClient
+    from app.osrs.ingest import (
+        ensure_buckets_1h_cached,
+        ensure_buckets_cached,
+        ensure_mapping_cached,
+        floor_to_1h,
+        floor_to_5m,
+    )
+    from app.osrs.timeseries_24h import ensure_timeseries_24h_cached
+
+    now = floor_to_5m(int(time.time()))
+    bucket_ts_list = [now - 300 * i for i in range(settings.ingest_window_hours * 12)]
+    # Completed hours only: the current hour's bucket is not published yet.
+    hour_ts_list = [floor_to_1h(now) - 3600 * (i + 1) for i in range(settings.ingest_window_hours_1h)]
+    client = OsrsPricesClient()
+    try:
+        with SessionLocal() as db:
+            await ensure_mapping_cached(db, client)
+            await ensure_buckets_cached(db, client, bucket_ts_list)
+            await ensure_buckets_1h_cached(db, client, hour_ts_list)
+            await ensure_timeseries_24h_cached(db, client, _timeseries_item_ids(db))
+    finally:
+        await client.aclose()
+
+
+async def run_leader_election(stop: asyncio.Event) -> None:
+    """
+    Background task: try to take the ingest advisory lock every `ingest_leader_poll_seconds`; while holding it,
+    keep mapping, the recent 5m and 1h windows and the tracked 24h series current.
+    """
+    holder = _LockHolder()
+    try:
+        while not stop.is_set():
+            try:
+                if _is_leader:
+                    _set_leader(await asyncio.to_thread(holder.check))
+                else:
+                    _set_leader(await asyncio.to_thread(holder.try_acquire))
+                if _is_leader:
+                    await _ingest_once()
+            except Exception:
+                log.exception("ingest leader iteration failed")
+                if not await asyncio.to_thread(holder.check):
+                    _set_leader(False)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.ingest_leader_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _set_leader(False)
+        await asyncio.to_thread(holder.release)
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.change_feed import MAPPING, FeedCache
+from app.db.models import ItemMapping
+
+ItemMeta = dict[int, tuple[str, int | None]]
+
+# Mapping changes at most daily and every refresh is announced on the change feed, so a long TTL is safe.
+_item_meta_cache: FeedCache[ItemMeta] = FeedCache(MAPPING, ttl_seconds=6 * 3600)
+
+
+def item_meta(db: Session) -> ItemMeta:
+    """
+    item_id -> (name, buy limit) for every mapped item.
+    """
+
+    def load() -> ItemMeta:
+        rows = db.execute(select(ItemMapping.item_id, ItemMapping.name, ItemMapping.limit)).all()
+        return {int(r[0]): (str(r[1]), (int(r[2]) if r[2] is not None else None)) for r in rows}
+
+    return _item_meta_cache.get_or_load(load)
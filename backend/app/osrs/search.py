@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.change_feed import MAPPING, subscribe
+from app.core.metrics import stage
+from app.db.models import ItemBucket5m, ItemMapping
+from app.store.summary import get_summary_index
+
+_WORD = re.compile(r"[a-z0-9]+")
+# How often a search re-reads the mapping version when nothing announced a refresh (no change feed).
+_RECHECK_SECONDS = 60.0
+# Without a rolling summary in this process, 24h volumes come from one aggregate query, reused this long.
+_VOLUME_FALLBACK_SECONDS = 300.0
+# Minimum trigram similarity (|shared| / |union|, as pg_trgm) for a fuzzy match.
+_MIN_SIMILARITY = 0.3
+
+# Match kinds, best first; results are ranked by kind, then 24h volume.
+MATCHES = ("exact", "prefix", "word_prefix", "fuzzy")
+
+
+def normalize(text: str) -> str:
+    """
+    Lower-case alphanumeric words joined by single spaces: "Dragon scimitar (or)" -> "dragon scimitar or".
+    """
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def trigrams(text: str) -> set[str]:
+    # Per word, padded like pg_trgm ("  w" + "w "), so word starts weigh in and words don't run together.
+    out: set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        out.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    item_id: int
+    name: str
+    buy_limit: int | None
+    daily_volume_24h: int
+    match: str
+
+
+@dataclass(frozen=True)
+class _Built:
+    version: tuple[int, int]  # (latest mapping_fetched_at, row count)
+    item_ids: np.ndarray  # ascending; position = index of the item everywhere below
+    names: list[str]
+    limits: list[int | None]
+    norm: list[str]
+    tokens: list[str]  # every distinct word of every name, sorted (prefix lookups by bisect)
+    token_items: np.ndarray  # item position per entry of `tokens`
+    trigram_items: dict[str, np.ndarray]  # trigram -> positions of the names containing it
+    trigram_counts: np.ndarray  # trigrams per name
+
+
+def _build(db: Session, version: tuple[int, int]) -> _Built:
+    rows = sorted(db.execute(select(ItemMapping.item_id, ItemMapping.name, ItemMapping.limit)).all())
+    norm = [normalize(str(name)) for _, name, _ in rows]
+
+    pairs = sorted((word, pos) for pos, text in enumerate(norm) for word in set(text.split()))
+    grams: dict[str, list[int]] = {}
+    counts = np.zeros(len(rows), dtype="int64")
+    for pos, text in enumerate(norm):
+        g = trigrams(text)
+        counts[pos] = len(g)
+        for t in g:
+            grams.setdefault(t, []).append(pos)
+
+    return _Built(
+        version=version,
+        item_ids=np.array([int(r[0]) for r in rows], dtype="int64"),
+        names=[str(r[1]) for r in rows],
+        limits=[int(r[2]) if r[2] is not None else None for r in rows],
+        norm=norm,
+        tokens=[w for w, _ in pairs],
+        token_items=np.array([p for _, p in pairs], dtype="int64"),
+        trigram_items={t: np.array(p, dtype="int64") for t, p in grams.items()},
+        trigram_counts=counts,
+    )
+
+
+class ItemSearchIndex:
+    """
+    In-memory name index over `item_mapping`: word-prefix matches via a sorted token list, typo-tolerant matches
+    via trigrams. Rebuilt only when the mapping changes (ensure_mapping_cached or a `mapping` change event marks
+    it stale; otherwise its version is re-read at most every minute); ranking uses this process's rolling 24h
+    summary, so a search is pure in-memory work.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._built: _Built | None = None
+        self._stale = True
+        self._checked_at = 0.0
+        self._volume = np.zeros(0)
+        self._volume_key: tuple[object, ...] | None = None
+        subscribe(MAPPING, lambda _event: self.mark_stale())
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def _current(self, db: Session) -> _Built:
+        built = self._built
+        if built is not None and not self._stale and time.monotonic() - self._checked_at < _RECHECK_SECONDS:
+            return built
+        with self._lock:
+            self._stale = False
+            self._checked_at = time.monotonic()
+            latest, count = db.execute(select(func.max(ItemMapping.mapping_fetched_at), func.count())).one()
+            version = (int(latest or 0), int(count))
+            if self._built is None or self._built.version != version:
+                with stage("build_search_index") as st:
+                    self._built = _build(db, version)
+                    st.rows = len(self._built.names)
+            return self._built
+
+    def _volumes(self, db: Session, built: _Built) -> np.ndarray:
+        summary = get_summary_index()
+        if summary.as_of is not None:
+            key: tuple[object, ...] = ("summary", summary.as_of, built.version)
+            if key != self._volume_key:
+                _, ids, vol = summary.volumes_24h()
+                self._volume, self._volume_key = self._align(built, ids, vol), key
+            return self._volume
+        key = ("db", int(time.time() // _VOLUME_FALLBACK_SECONDS), built.version)
+        if key != self._volume_key:
+            now = int(time.time())
+            since = now - now % 300 - 287 * 300
+            rows = db.execute(
+                select(ItemBucket5m.item_id, func.sum(ItemBucket5m.low_vol + ItemBucket5m.high_vol))
+                .where(ItemBucket5m.bucket_ts >= since)
+                .group_by(ItemBucket5m.item_id)
+            ).all()
+            ids = np.array([int(r[0]) for r in rows], dtype="int64")
+            vol = np.array([float(r[1] or 0) for r in rows], dtype="float64")
+            self._volume, self._volume_key = self._align(built, ids, vol), key
+        return self._volume
+
+    @staticmethod
+    def _align(built: _Built, ids: np.ndarray, vol: np.ndarray) -> np.ndarray:
+        out = np.zeros(built.item_ids.size)
+        pos = np.searchsorted(built.item_ids, ids)
+        ok = pos < built.item_ids.size
+        ok[ok] = built.item_ids[pos[ok]] == ids[ok]
+        out[pos[ok]] = vol[ok]
+        return out
+
+    def _prefix_matches(self, built: _Built, words: list[str]) -> np.ndarray:
+        found: np.ndarray | None = None
+        for word in words:
+            lo = bisect.bisect_left(built.tokens, word)
+            hi = bisect.bisect_left(built.tokens, word + "\uffff")
+            hits = np.unique(built.token_items[lo:hi])
+            found = hits if found is None else np.intersect1d(found, hits, assume_unique=True)
+            if found.size == 0:
+                break
+        return found if found is not None else np.empty(0, dtype="int64")
+
+    def search(self, db: Session, query: str, *, limit: int = 10) -> list[SearchHit]:
+        """
+        Items matching `query`, best first: exact name, name prefix, every query word a prefix of some name word,
+        then (to fill up to `limit`) names with trigram similarity >= 0.3. Ties rank by 24h volume.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        built = self._current(db)
+        volume = self._volumes(db, built)
+
+        cand = self._prefix_matches(built, q.split())
+        kind = np.array(
+            [0 if built.norm[p] == q else 1 if built.norm[p].startswith(q) else 2 for p in cand.tolist()],
+            dtype="int64",
+        )
+        order = np.lexsort((-volume[cand], kind))[:limit]
+        picked, kinds = cand[order].tolist(), kind[order].tolist()
+
+        if len(picked) < limit:
+            q_grams = trigrams(q)
+            shared = np.zeros(built.item_ids.size)
+            for t in q_grams:
+                pos = built.trigram_items.get(t)
+                if pos is not None:
+                    shared[pos] += 1  # positions are unique per trigram
+            similarity = shared / np.maximum(len(q_grams) + built.trigram_counts - shared, 1)
+            similarity[cand] = 0.0  # already matched by prefix
+            fuzzy = np.flatnonzero(similarity >= _MIN_SIMILARITY)
+            fuzzy = fuzzy[np.lexsort((-volume[fuzzy], -similarity[fuzzy]))][: limit - len(picked)]
+            picked += fuzzy.tolist()
+            kinds += [3] * fuzzy.size
+
+        return [
+            SearchHit(
+                item_id=int(built.item_ids[p]),
+                name=built.names[p],
+                buy_limit=built.limits[p],
+                daily_volume_24h=int(volume[p]),
+                match=MATCHES[k],
+            )
+            for p, k in zip(picked, kinds)
+        ]
+
+
+_index = ItemSearchIndex()
+
+
+def get_search_index() -> ItemSearchIndex:
+    return _index
@@ -8,8 +8,12 @@ from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from app.core.change_feed import TIMESERIES_24H, notify
+from app.core.metrics import stage
 from app.db.models import ItemTimeseries24h, ItemTimeseries24hMeta
+from app.db.queries import ids_in
 from app.osrs.client import OsrsPricesClient
+from app.osrs.leader import may_ingest
 
 
 def now_ts() -> int:
@@ -35,10 +39,13 @@ async def ensure_timeseries_24h_cached(
     if not item_ids:
         return {"requested": 0, "fetched": 0, "skipped_fresh": 0}
 
-    meta_rows = db.execute(select(ItemTimeseries24hMeta.item_id, ItemTimeseries24hMeta.fetched_at).where(ItemTimeseries24hMeta.item_id.in_(item_ids))).all()
+    meta_rows = db.execute(select(ItemTimeseries24hMeta.item_id, ItemTimeseries24hMeta.fetched_at).where(ids_in(ItemTimeseries24hMeta.item_id, item_ids))).all()
     meta = {int(i): int(ts) for i, ts in meta_rows}
 
     to_fetch = [i for i in item_ids if not _is_fresh(meta.get(i), max_age_seconds=max_age_seconds)]
+    if not may_ingest():
+        # Follower: the ingest leader refreshes tracked and high-volume items (see app/osrs/leader.py).
+        return {"requested": len(item_ids), "fetched": 0, "skipped_fresh": len(item_ids) - len(to_fetch), "role": "follower"}
     sem = asyncio.Semaphore(max_concurrency)
     fetched = 0
 
@@ -66,24 +73,27 @@ async def ensure_timeseries_24h_cached(
                         "low_vol": int(p.get("lowPriceVolume") or 0),
                     }
                 )
-            if rows:
-                stmt = insert(ItemTimeseries24h).values(rows)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=[ItemTimeseries24h.item_id, ItemTimeseries24h.bucket_ts],
-                    set_={
-                        "avg_high": stmt.excluded.avg_high,
-                        "high_vol": stmt.excluded.high_vol,
-                        "avg_low": stmt.excluded.avg_low,
-                        "low_vol": stmt.excluded.low_vol,
-                    },
+            with stage("timeseries_upsert") as st:
+                st.rows = len(rows)
+                if rows:
+                    stmt = insert(ItemTimeseries24h).values(rows)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[ItemTimeseries24h.item_id, ItemTimeseries24h.bucket_ts],
+                        set_={
+                            "avg_high": stmt.excluded.avg_high,
+                            "high_vol": stmt.excluded.high_vol,
+                            "avg_low": stmt.excluded.avg_low,
+                            "low_vol": stmt.excluded.low_vol,
+                        },
+                    )
+                    db.execute(stmt)
+                db.execute(
+                    insert(ItemTimeseries24hMeta)
+                    .values(item_id=item_id, fetched_at=now_ts())
+                    .on_conflict_do_update(index_elements=[ItemTimeseries24hMeta.item_id], set_={"fetched_at": now_ts()})
                 )
-                db.execute(stmt)
-            db.execute(
-                insert(ItemTimeseries24hMeta)
-                .values(item_id=item_id, fetched_at=now_ts())
-                .on_conflict_do_update(index_elements=[ItemTimeseries24hMeta.item_id], set_={"fetched_at": now_ts()})
-            )
-            db.commit()
+                notify(db, TIMESERIES_24H, item_ids=[item_id])
+                db.commit()
             fetched += 1
 
     await asyncio.gather(*[_fetch_one(i) for i in to_fetch])
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import numpy as np
 
+from app.scan.ewma import scan_ewma
 from app.scan.schemas import BaselineStat, EventPriceMode, ScanRequest, ScanResult, VolumeMode
 
 
@@ -27,6 +28,44 @@ def _event_price(arr: np.ndarray, mode: EventPriceMode) -> float:
     return float(np.min(arr))
 
 
+def baseline_blocks(req: ScanRequest) -> int:
+    """
+    5m buckets of baseline the 5m window must hold before an event (none when the baseline is read from 1h buckets).
+    """
+    return req.baseline_hours * 12 if req.baseline_resolution == "5m" else 0
+
+
+def scan_window_blocks(req: ScanRequest) -> int:
+    """
+    Number of 5m buckets (ending now) a scan needs: baseline + event + still-low windows plus a small buffer,
+    and never less than a full 24h for the daily volume metrics.
+    """
+    return max(baseline_blocks(req) + req.event_window_blocks + req.still_low_blocks + 4, 288 + 8)
+
+
+def baseline_hour_ts(req: ScanRequest, now: int) -> list[int]:
+    """
+    1h bucket starts (newest first) a 1h-baseline scan ending at `now` reads: `baseline_hours` before the hour of
+    the earliest possible event, through the last completed hour. Empty for 5m baselines.
+    """
+    if req.baseline_resolution != "1h":
+        return []
+    first_event_ts = now - 300 * (scan_window_blocks(req) - 1)
+    lo = first_event_ts - first_event_ts % 3600 - req.baseline_hours * 3600
+    hi = now - now % 3600 - 3600
+    return list(range(hi, lo - 1, -3600))
+
+
+def _hourly_baseline(
+    hourly: tuple[np.ndarray, np.ndarray, np.ndarray], hours: int, event_ts: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # (avg_low, low_vol) of the 1h buckets in the `hours` before the hour containing `event_ts`.
+    hour_ts, avg_low, low_vol = hourly
+    end = event_ts - event_ts % 3600
+    i0, i1 = np.searchsorted(hour_ts, [end - hours * 3600, end], side="left")
+    return avg_low[i0:i1], low_vol[i0:i1]
+
+
 def scan_item_series(
     *,
     item_id: int,
@@ -35,14 +74,30 @@ def scan_item_series(
     avg_low: np.ndarray,
     low_vol: np.ndarray,
     req: ScanRequest,
+    baseline_1h: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None,
+    latest_low: tuple[float, int] | None = None,
 ) -> ScanResult | None:
     """
     Find the best dump event for this item within the provided window.
     Arrays must be aligned (same length), ordered by time ascending.
+
+    With `req.baseline_resolution == "1h"`, baselines come from `baseline_1h` = (hour bucket_ts, avg_low,
+    low_vol), time ascending, instead of the 5m rows before each candidate. `latest_low` = (price, trade time)
+    from /latest; when it is newer than the last bucket it is the latest price and must be still-low too.
+
+    `baseline_stat="ewma"` runs the all-items detector in app/scan/ewma.py on this one item; scanning many items,
+    call `scan_ewma` with all of them instead.
     """
+    if req.baseline_stat == BaselineStat.ewma:
+        return scan_ewma(
+            {item_id: (bucket_ts, avg_low, low_vol)},
+            req,
+            name_of=lambda _item_id: name,
+            latest_low=(lambda _item_id: latest_low) if latest_low is not None else None,
+        ).get(item_id)
 
     n = bucket_ts.size
-    L = req.baseline_hours * 12
+    L = baseline_blocks(req)
     M = req.event_window_blocks
     S = req.still_low_blocks
 
@@ -60,22 +115,36 @@ def scan_item_series(
 
     latest_valid = avg_low[np.isfinite(avg_low)]
     latest_price = float(latest_valid[-1]) if latest_valid.size else None
+    live_low = None
+    if latest_low is not None and latest_low[1] >= int(bucket_ts[-1]) + 300:
+        live_low = latest_low[0]
+        latest_price = live_low
+
+    hourly = None
+    min_baseline_points = req.min_valid_baseline_price_points
+    if req.baseline_resolution == "1h":
+        if baseline_1h is None:
+            return None
+        hourly = baseline_1h
+        min_baseline_points = -(-req.min_valid_baseline_price_points // 12)
 
     best: ScanResult | None = None
 
     # Candidate start index t:
     # baseline [t-L, t-1], dump [t, t+M-1], and we require at least one bucket after dump.
     for t in range(L, n - (M + 1)):
-        baseline_slice = slice(t - L, t)
         event_slice = slice(t, t + M)
 
-        base_prices = avg_low[baseline_slice]
-        base_vols = low_vol[baseline_slice]
+        if hourly is None:
+            base_prices = avg_low[t - L : t]
+            base_vols = low_vol[t - L : t]
+        else:
+            base_prices, base_vols = _hourly_baseline(hourly, req.baseline_hours, int(bucket_ts[t]))
         event_prices = avg_low[event_slice]
         event_vols = low_vol[event_slice]
 
         base_valid = base_prices[np.isfinite(base_prices)]
-        if base_valid.size < req.min_valid_baseline_price_points:
+        if base_valid.size < min_baseline_points:
             continue
         baseline_price = _baseline_stat(base_valid, req.baseline_stat)
         if not np.isfinite(baseline_price) or baseline_price <= 0:
@@ -94,6 +163,8 @@ def scan_item_series(
 
         event_volume = int(np.nansum(event_vols))
         baseline_mean_5m_vol = float(np.nanmean(base_vols)) if base_vols.size else float("nan")
+        if hourly is not None:
+            baseline_mean_5m_vol /= 12.0  # per-hour volume -> per 5m bucket
 
         event_daily_pct: float | None = None
         if daily_volume_24h > 0:
@@ -124,6 +195,8 @@ def scan_item_series(
             continue
         tail_prices = avg_low[tail_start:n]
         tail_valid = tail_prices[np.isfinite(tail_prices)]
+        if live_low is not None:
+            tail_valid = np.append(tail_valid, live_low)
         if tail_valid.size < req.min_valid_still_low_price_points:
             continue
         if not bool(np.all(tail_valid <= threshold)):
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import warnings
+from collections.abc import Callable, Mapping
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.scan.schemas import EventPriceMode, ScanRequest, ScanResult, VolumeMode
+
+# Residuals beyond this many (scaled) standard deviations are clipped before they update the state, so a dump
+# barely moves the baseline it is measured against (a Huber-style robust EWMA).
+CLIP_SIGMAS = 3.0
+# Standard deviation floor as a fraction of the mean: flat-priced items would otherwise give infinite z-scores
+# and never let the clipped mean move.
+MIN_REL_SD = 0.005
+
+Series = tuple[np.ndarray, np.ndarray, np.ndarray]
+# (price, vol, offset) of the right-aligned items × rows matrices -> EWMA mean, scale and volume before each cell.
+Baselines = Callable[[np.ndarray, np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+
+def ewma_alpha(req: ScanRequest) -> float:
+    # `baseline_hours` is the span: the weights of the last baseline_hours * 12 rows sum to ~86%. Rows are traded
+    # buckets, so in wall-clock time the span stretches for items that trade less often.
+    return 2.0 / (req.baseline_hours * 12 + 1)
+
+
+class EwmaState:
+    """
+    Exponentially weighted mean/variance of price and mean of volume for a vector of items: O(1) state per
+    item, updated one row (traded bucket) at a time. Missing prices leave the price state unchanged, and an
+    item with no row in a bucket does not decay at all.
+    """
+
+    def __init__(self, n: int, alpha: float) -> None:
+        self.alpha = alpha
+        self.mean = np.full(n, np.nan)
+        self.var = np.zeros(n)
+        self.vol = np.full(n, np.nan)
+        self.count = np.zeros(n, dtype="int64")
+
+    def grow(self, n: int) -> None:
+        """
+        Append fresh state for items `len(self.mean)` .. n - 1.
+        """
+        add = n - self.mean.size
+        self.mean = np.concatenate((self.mean, np.full(add, np.nan)))
+        self.var = np.concatenate((self.var, np.zeros(add)))
+        self.vol = np.concatenate((self.vol, np.full(add, np.nan)))
+        self.count = np.concatenate((self.count, np.zeros(add, dtype="int64")))
+
+    def scale(self) -> np.ndarray:
+        return np.maximum(np.sqrt(self.var), MIN_REL_SD * np.abs(self.mean))
+
+    def update(self, price: np.ndarray, vol: np.ndarray, rows: np.ndarray) -> None:
+        """
+        Fold in one row per item; `rows` masks the items that have a row at this step.
+        """
+        a = self.alpha
+        finite = rows & np.isfinite(price)
+        seen = finite & (self.count > 0)
+        limit = CLIP_SIGMAS * self.scale()
+        resid = np.clip(price - self.mean, -limit, limit)
+        self.mean = np.where(seen, self.mean + a * resid, np.where(finite, price, self.mean))
+        self.var = np.where(seen, (1 - a) * (self.var + a * resid * resid), self.var)
+        self.count += finite
+        self.vol = np.where(rows, np.where(np.isnan(self.vol), vol, self.vol + a * (vol - self.vol)), self.vol)
+
+
+def _right_aligned(per_item: Mapping[int, Series], width: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # items × width matrices with each item's rows ending in the last column; padding is NaN price, 0 volume.
+    n = len(per_item)
+    price = np.full((n, width), np.nan)
+    vol = np.zeros((n, width))
+    lengths = np.zeros(n, dtype="int64")
+    for i, (_, avg_low, low_vol) in enumerate(per_item.values()):
+        k = avg_low.size
+        price[i, width - k :] = avg_low
+        vol[i, width - k :] = low_vol
+        lengths[i] = k
+    return price, vol, lengths, width - lengths
+
+
+def scan_ewma(
+    per_item: Mapping[int, Series],
+    req: ScanRequest,
+    *,
+    name_of: Callable[[int], str],
+    latest_low: Callable[[int], tuple[float, int] | None] | None = None,
+) -> dict[int, ScanResult]:
+    """
+    The `baseline_stat="ewma"` detector for all items at once. Per item (rows ordered by time, as loaded from
+    `item_bucket_5m`), candidate row t is flagged when its event price over rows [t, t+M) is at least
+    `min_drop_pct` below the robust EWMA of the rows before t and at least `min_drop_z` scaled standard
+    deviations below it, with the usual volume-shock check (relative mode against the EWMA volume) and the
+    still-low check ending now. The recursion runs once over the window, one vectorized step per row.
+    `EwmaIndex.scan` (app/scan/ewma_index.py) runs the same detector against the state held across requests.
+    """
+
+    def recompute(price: np.ndarray, vol: np.ndarray, offset: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # State before each row: the baseline of a candidate starting there. Built row-major in time
+        # (contiguous per step), read back transposed.
+        n_items, T = price.shape
+        state = EwmaState(n_items, ewma_alpha(req))
+        price_t, vol_t = np.ascontiguousarray(price.T), np.ascontiguousarray(vol.T)
+        base_t, scale_t, base_vol_t = np.empty((T, n_items)), np.empty((T, n_items)), np.empty((T, n_items))
+        for j in range(T):
+            base_t[j], scale_t[j], base_vol_t[j] = state.mean, state.scale(), state.vol
+            state.update(price_t[j], vol_t[j], offset <= j)
+        return base_t.T, scale_t.T, base_vol_t.T
+
+    return _detect(per_item, req, recompute, name_of=name_of, latest_low=latest_low)
+
+
+def _detect(
+    per_item: Mapping[int, Series],
+    req: ScanRequest,
+    baselines: Baselines,
+    *,
+    name_of: Callable[[int], str],
+    latest_low: Callable[[int], tuple[float, int] | None] | None,
+) -> dict[int, ScanResult]:
+    # The detector of scan_ewma, with the baselines before each row supplied by `baselines`.
+    if not per_item:
+        return {}
+    L = req.baseline_hours * 12
+    M = req.event_window_blocks
+    T = max(s[1].size for s in per_item.values())
+    if T < max(L + M + 2, 288):
+        return {}
+    item_ids = np.fromiter(per_item.keys(), dtype="int64", count=len(per_item))
+    price, vol, lengths, offset = _right_aligned(per_item, T)
+    n_items = item_ids.size
+    cols = np.arange(T)
+    base, scale, base_vol = baselines(price, vol, offset)
+
+    finite = np.isfinite(price)
+    cum_valid = np.concatenate((np.zeros((n_items, 1), dtype="int64"), np.cumsum(finite, axis=1)), axis=1)
+    cum_vol = np.concatenate((np.zeros((n_items, 1)), np.cumsum(vol, axis=1)), axis=1)
+
+    # Candidates t in [L, n - M - 1) item-locally, i.e. columns [offset + L, T - M - 1).
+    t = cols[: T - M - 1]
+    ok = (lengths >= max(L + M + 2, 288))[:, None] & (t[None, :] >= (offset + L)[:, None])
+    ok &= (cum_valid[:, t] - cum_valid[:, np.maximum(t - L, 0)]) >= req.min_valid_baseline_price_points
+    ok &= (cum_valid[:, t + M] - cum_valid[:, t]) >= req.min_valid_event_price_points
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        windows = sliding_window_view(price, M, axis=1)[:, t]
+        event_price = np.nanmean(windows, axis=2) if req.event_price_mode == EventPriceMode.mean else np.nanmin(windows, axis=2)
+    b, s, bv = base[:, t], scale[:, t], base_vol[:, t]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        drop = (event_price - b) / b
+        z = (event_price - b) / s
+    ok &= np.isfinite(event_price) & (event_price > 0) & np.isfinite(b) & (b > 0)
+    ok &= (drop <= -req.min_drop_pct) & (z <= -req.min_drop_z)
+
+    event_volume = np.floor(cum_vol[:, t + M] - cum_vol[:, t])
+    daily_volume_24h = np.floor(vol[:, T - 288 :].sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        event_daily_pct = np.where(daily_volume_24h[:, None] > 0, event_volume / daily_volume_24h[:, None], np.nan)
+    if req.volume_mode == VolumeMode.absolute:
+        ok &= event_volume >= req.min_event_volume
+    elif req.volume_mode == VolumeMode.daily_pct:
+        ok &= np.isfinite(event_daily_pct) & (event_daily_pct >= req.min_event_daily_pct)
+    else:
+        with np.errstate(invalid="ignore"):
+            ok &= (bv > 0) & (event_volume >= bv * req.volume_multiplier)
+    if req.min_daily_volume_24h is not None:
+        ok &= (daily_volume_24h >= req.min_daily_volume_24h)[:, None]
+    if req.max_daily_volume_24h is not None:
+        ok &= (daily_volume_24h <= req.max_daily_volume_24h)[:, None]
+
+    # Still-low: finite prices in rows [max(t+M, n-S'), n), plus a newer /latest low, all <= threshold.
+    live = np.full(n_items, np.nan)
+    if latest_low is not None:
+        last_ts = np.array([int(s[0][-1]) for s in per_item.values()], dtype="int64")
+        for i, item_id in enumerate(item_ids.tolist()):
+            got = latest_low(item_id)
+            if got is not None and got[1] >= last_ts[i] + 300:
+                live[i] = got[0]
+    suffix_max = np.fmax.accumulate(price[:, ::-1], axis=1)[:, ::-1]
+    suffix_count = np.cumsum(finite[:, ::-1], axis=1)[:, ::-1]
+    tail = np.maximum(t + M, T - max(req.still_low_blocks, 1))
+    tail_max = np.fmax(suffix_max[:, tail], live[:, None])
+    tail_count = suffix_count[:, tail] + np.isfinite(live)[:, None]
+    with np.errstate(invalid="ignore"):
+        ok &= tail_count >= req.min_valid_still_low_price_points
+        ok &= ~(tail_max > b * (1 - req.still_low_pct))
+
+    # Best candidate per item; the earliest wins ties, as in scan_item_series.
+    if req.sort_by == "most_recent":
+        best = T - 2 - M - np.argmax(ok[:, ::-1], axis=1)
+    elif req.sort_by == "biggest_volume":
+        best = np.argmax(np.where(ok, event_volume, -np.inf), axis=1)
+    elif req.sort_by == "biggest_event_daily_pct":
+        best = np.argmax(np.where(ok, np.where(event_daily_pct > 0, event_daily_pct, -1.0), -np.inf), axis=1)
+    else:
+        best = np.argmin(np.where(ok, drop, np.inf), axis=1)
+
+    last_price = np.take_along_axis(price, (T - 1 - np.argmax(finite[:, ::-1], axis=1))[:, None], axis=1)[:, 0]
+    out: dict[int, ScanResult] = {}
+    for i in np.nonzero(ok.any(axis=1))[0].tolist():
+        j = int(best[i])
+        item_id = int(item_ids[i])
+        series_ts = per_item[item_id][0]
+        latest_price = float(live[i]) if np.isfinite(live[i]) else (float(last_price[i]) if finite[i].any() else None)
+        out[item_id] = ScanResult(
+            item_id=item_id,
+            name=name_of(item_id),
+            dump_bucket_ts=int(series_ts[j - offset[i]]),
+            baseline_price=float(b[i, j]),
+            event_price=float(event_price[i, j]),
+            price_drop_pct=float(drop[i, j]),
+            drop_z=float(z[i, j]),
+            event_volume=int(event_volume[i, j]),
+            baseline_mean_5m_volume=float(bv[i, j]) if np.isfinite(bv[i, j]) else None,
+            daily_volume_24h=int(daily_volume_24h[i]),
+            event_daily_pct=float(event_daily_pct[i, j]) if np.isfinite(event_daily_pct[i, j]) else None,
+            still_low=True,
+            latest_price=latest_price,
+        )
+    return out
+
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Mapping
+from typing import Any
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.metrics import stage
+from app.db.models import Bucket5m, ItemBucket5m
+from app.db.queries import ts_in
+from app.scan.ewma import Baselines, EwmaState, Series, _detect, ewma_alpha
+from app.scan.schemas import ScanRequest, ScanResult
+from app.store.hot_window import load_sparse_window
+
+# Buckets of held state per alpha: the longest 5m scan window (scan_window_blocks with a 30h baseline, 12 event
+# and 36 still-low blocks).
+HISTORY_BUCKETS = 30 * 12 + 12 + 36 + 4
+# Alphas held at once (least recently scanned dropped first); ~3 × 8 bytes × HISTORY_BUCKETS per item each.
+MAX_TRACKS = 4
+STEP_SECONDS = 300
+
+
+class _Track:
+    """
+    Held state for one alpha: the running `EwmaState` over every item, plus a HISTORY_BUCKETS-slot ring (slot =
+    bucket index % HISTORY_BUCKETS) of the mean, scale and volume state before each bucket, which is what a
+    candidate starting in that bucket is measured against.
+    """
+
+    def __init__(self, alpha: float) -> None:
+        self.state = EwmaState(0, alpha)
+        self.as_of: int | None = None
+        self.slot_ts = np.full(HISTORY_BUCKETS, -1, dtype="int64")
+        # Buckets folded in as empty because they were not ingested; if one shows up later the track is rebuilt.
+        self.holes: set[int] = set()
+        self._row_of: dict[int, int] = {}
+        self._mean = np.empty((0, HISTORY_BUCKETS))
+        self._scale = np.empty((0, HISTORY_BUCKETS))
+        self._vol = np.empty((0, HISTORY_BUCKETS))
+
+    def _rows_for(self, item_ids: list[int]) -> np.ndarray:
+        new = [i for i in dict.fromkeys(item_ids) if i not in self._row_of]
+        if new:
+            for item_id in new:
+                self._row_of[item_id] = len(self._row_of)
+            n = len(self._row_of)
+            self.state.grow(n)
+            pad = np.full((len(new), HISTORY_BUCKETS), np.nan)
+            self._mean, self._scale, self._vol = (np.vstack((a, pad)) for a in (self._mean, self._scale, self._vol))
+        return np.asarray([self._row_of[i] for i in item_ids], dtype="int64")
+
+    def fold(self, bucket_ts: int, item_ids: np.ndarray, avg_low: np.ndarray, low_vol: np.ndarray) -> None:
+        """
+        Advance by the bucket after `as_of` (rows as in `item_bucket_5m`; none for a hole).
+        """
+        ix = self._rows_for(item_ids.tolist())
+        slot = (bucket_ts // STEP_SECONDS) % HISTORY_BUCKETS
+        state = self.state
+        self._mean[:, slot], self._scale[:, slot], self._vol[:, slot] = state.mean, state.scale(), state.vol
+        n = state.mean.size
+        rows = np.zeros(n, dtype=bool)
+        rows[ix] = True
+        price, vol = np.full(n, np.nan), np.zeros(n)
+        price[ix], vol[ix] = avg_low, low_vol
+        state.update(price, vol, rows)
+        self.slot_ts[slot] = bucket_ts
+        self.as_of = bucket_ts
+        self.holes = {ts for ts in self.holes if ts > bucket_ts - HISTORY_BUCKETS * STEP_SECONDS}
+
+    def baselines(self, per_item: Mapping[int, Series]) -> Baselines:
+        """
+        `_detect` baselines read from the ring for the rows of `per_item`; NaN for rows outside the held range.
+        """
+
+        def read(price: np.ndarray, vol: np.ndarray, offset: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+            n, T = price.shape
+            lengths = T - offset
+            flat_ts = np.concatenate([s[0] for s in per_item.values()]).astype("int64")
+            flat_i = np.repeat(np.arange(n), lengths)
+            flat_col = np.arange(flat_ts.size) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(offset, lengths)
+            rows = np.asarray([self._row_of.get(item_id, -1) for item_id in per_item], dtype="int64")[flat_i]
+            slot = (flat_ts // STEP_SECONDS) % HISTORY_BUCKETS
+            ok = (rows >= 0) & (self.slot_ts[slot] == flat_ts)
+            out = []
+            for ring in (self._mean, self._scale, self._vol):
+                a = np.full((n, T), np.nan)
+                a[flat_i[ok], flat_col[ok]] = ring[rows[ok], slot[ok]]
+                out.append(a)
+            return out[0], out[1], out[2]
+
+        return read
+
+
+class EwmaIndex:
+    """
+    EWMA state per alpha kept in process memory, so an EWMA scan reads its baselines instead of running the
+    recursion over the whole window. Ingest advances every held track by each new bucket (`apply_bucket`, like
+    `SummaryIndex`); a scan first catches up on buckets other processes ingested, and a track is rebuilt from
+    the last HISTORY_BUCKETS buckets on first use, when too far behind, or when a bucket it took as a hole turns
+    up. The held state has seen more history than a scan window, so baselines near the start of the window
+    differ slightly from `scan_ewma` over that window alone.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tracks: OrderedDict[float, _Track] = OrderedDict()
+
+    @staticmethod
+    def _load(db: Session, bucket_ts_list: list[int]) -> dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        # {bucket_ts: (item ids, avg_low, low_vol)} for the ingested buckets among `bucket_ts_list`, from the hot
+        # window / columnar store when it covers them, else Postgres.
+        ingested = db.execute(
+            select(Bucket5m.bucket_ts).where(ts_in(Bucket5m.bucket_ts, bucket_ts_list, step=STEP_SECONDS))
+        ).scalars().all()
+        if not ingested:
+            return {}
+        out = {int(ts): (np.empty(0, dtype="int64"), np.empty(0), np.empty(0)) for ts in ingested}
+        per_item = load_sparse_window(bucket_ts_list, ("avg_low", "low_vol"), None)
+        if per_item is not None:
+            lengths = [s[0].size for s in per_item.values()]
+            bucket_ts = np.concatenate([s[0] for s in per_item.values()]).astype("int64")
+            item_ids = np.repeat(np.fromiter(per_item.keys(), dtype="int64", count=len(per_item)), lengths)
+            avg_low = np.concatenate([s[1] for s in per_item.values()]).astype("float64")
+            low_vol = np.concatenate([s[2] for s in per_item.values()]).astype("float64")
+            order = np.argsort(bucket_ts, kind="stable")
+            bucket_ts, item_ids, avg_low, low_vol = bucket_ts[order], item_ids[order], avg_low[order], low_vol[order]
+            for ts in out:
+                lo, hi = np.searchsorted(bucket_ts, [ts, ts + 1])
+                out[ts] = (item_ids[lo:hi], avg_low[lo:hi], low_vol[lo:hi])
+            return out
+        # One row per bucket: arrays convert far faster than a row object per item bucket.
+        rows = db.connection().execute(
+            select(
+                ItemBucket5m.bucket_ts,
+                func.array_agg(ItemBucket5m.item_id),
+                func.array_agg(ItemBucket5m.avg_low),
+                func.array_agg(ItemBucket5m.low_vol),
+            )
+            .where(ts_in(ItemBucket5m.bucket_ts, ingested, step=STEP_SECONDS))
+            .group_by(ItemBucket5m.bucket_ts)
+        ).all()
+        for ts, item_ids, avg_low, low_vol in rows:
+            # None -> NaN
+            out[int(ts)] = (np.array(item_ids, dtype="int64"), np.array(avg_low, dtype="float64"), np.array(low_vol, dtype="float64"))
+        return out
+
+    def _advance(self, db: Session, track: _Track, now: int) -> _Track:
+        newest = db.execute(select(func.max(Bucket5m.bucket_ts)).where(Bucket5m.bucket_ts <= now)).scalar_one_or_none()
+        if newest is None:
+            return track
+        rebuild = track.as_of is None or not 0 <= newest - track.as_of < HISTORY_BUCKETS * STEP_SECONDS
+        if not rebuild and track.holes:
+            rebuild = bool(
+                db.execute(
+                    select(func.count()).select_from(Bucket5m).where(ts_in(Bucket5m.bucket_ts, track.holes, step=STEP_SECONDS))
+                ).scalar_one()
+            )
+        if rebuild:
+            track = _Track(track.state.alpha)
+            start = newest - (HISTORY_BUCKETS - 1) * STEP_SECONDS
+        else:
+            start = track.as_of + STEP_SECONDS
+        if start > newest:
+            return track
+        pending = list(range(start, newest + 1, STEP_SECONDS))
+        with stage("ewma_catch_up") as st:
+            loaded = self._load(db, pending)
+            # Every item first, so the ring grows once rather than bucket by bucket.
+            if loaded:
+                track._rows_for(np.unique(np.concatenate([ids for ids, _, _ in loaded.values()])).tolist())
+            empty = np.empty(0, dtype="int64"), np.empty(0), np.empty(0)
+            for ts in pending:
+                got = loaded.get(ts)
+                if got is None:
+                    track.holes.add(ts)
+                track.fold(ts, *(got or empty))
+            st.rows = len(pending)
+        return track
+
+    def scan(
+        self,
+        db: Session,
+        now: int,
+        per_item: Mapping[int, Series],
+        req: ScanRequest,
+        *,
+        name_of: Callable[[int], str],
+        latest_low: Callable[[int], tuple[float, int] | None] | None = None,
+    ) -> dict[int, ScanResult]:
+        """
+        `scan_ewma` over `per_item` (any subset of items, window ending at bucket `now`) with baselines from the
+        held state for `req`'s alpha.
+        """
+        alpha = ewma_alpha(req)
+        with self._lock:
+            track = self._advance(db, self._tracks.pop(alpha, None) or _Track(alpha), now)
+            self._tracks[alpha] = track
+            while len(self._tracks) > MAX_TRACKS:
+                self._tracks.popitem(last=False)
+            return _detect(per_item, req, track.baselines(per_item), name_of=name_of, latest_low=latest_low)
+
+    def apply_bucket(self, bucket_ts: int, rows: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Fold one ingested bucket (rows shaped like `item_bucket_5m` inserts) into every track it directly
+        follows; a track it does not follow catches up from Postgres on its next scan.
+        """
+        with self._lock:
+            due = [t for t in self._tracks.values() if t.as_of is not None and bucket_ts == t.as_of + STEP_SECONDS]
+            if not due:
+                return
+            rows = list(rows)
+            item_ids = np.array([r["item_id"] for r in rows], dtype="int64")
+            avg_low = np.array([r.get("avg_low") for r in rows], dtype="float64")
+            low_vol = np.array([r.get("low_vol") for r in rows], dtype="float64")
+            for track in due:
+                track.fold(int(bucket_ts), item_ids, avg_low, low_vol)
+
+
+_index = EwmaIndex()
+
+
+def get_ewma_index() -> EwmaIndex:
+    return _index
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.scan.schemas import BaselineStat, EventPriceMode, ScanRequest, VolumeMode
+
+
+@dataclass(frozen=True)
+class Detection:
+    """
+    Best dump candidate for one item at one "now". `t` indexes the series passed to `SeriesKernels`.
+    """
+
+    t: int
+    baseline_price: float
+    event_price: float
+    price_drop_pct: float
+    event_volume: int
+    baseline_mean_5m_volume: float | None
+    daily_volume_24h: int
+    event_daily_pct: float | None
+    latest_price: float | None
+
+
+def _nanmedian_rows(windows: np.ndarray) -> np.ndarray:
+    # np.nanmedian goes through masked arrays and is slow for many short rows. NaNs sort last, so the median
+    # of the c finite values in a row sits at sorted positions (c-1)//2 and c//2 (same result as np.median).
+    count = np.isfinite(windows).sum(axis=1)
+    s = np.sort(windows, axis=1)
+    rows = np.arange(windows.shape[0])
+    out = (s[rows, np.maximum(count - 1, 0) // 2] + s[rows, count // 2 - (count == 0)]) / 2
+    out[count == 0] = np.nan
+    return out
+
+
+def _window_reduce(values: np.ndarray, starts: np.ndarray, width: int, fn: str) -> np.ndarray:
+    """
+    Apply nanmedian/nanmin to `values[s:s+width]` for every s in `starts` (NaN for all-NaN windows).
+    """
+    if starts.size == 0:
+        return np.empty(0, dtype="float64")
+    windows = sliding_window_view(values, width)[starts]
+    if fn == "nanmedian":
+        return _nanmedian_rows(windows)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return getattr(np, fn)(windows, axis=1)
+
+
+class SeriesKernels:
+    """
+    Vectorized form of the `scan_item_series` detector for one item.
+
+    The series is the item's rows ordered by time (as loaded from `item_bucket_5m`); candidate index `t` means
+    baseline rows [t-L, t) and event rows [t, t+M). Per-candidate quantities do not depend on where "now" is,
+    so they are computed once (lazily, only where still needed) and reused across evaluations at different
+    "now"s (backtests) and across `ScanRequest` variants that share window parameters (sweeps).
+    `evaluate(start=0, end=n, req=req)` returns exactly what `scan_item_series` would pick.
+    """
+
+    def __init__(self, avg_low: np.ndarray, low_vol: np.ndarray) -> None:
+        self.avg_low = avg_low
+        self.low_vol = low_vol
+        self.n = int(avg_low.size)
+
+        finite = np.isfinite(avg_low)
+        self._cum_valid = np.concatenate(([0], np.cumsum(finite, dtype="int64")))
+        self._cum_price = np.concatenate(([0.0], np.cumsum(np.where(finite, avg_low, 0.0))))
+        self._cum_vol = np.concatenate(([0.0], np.cumsum(low_vol)))
+        self._last_valid = np.maximum.accumulate(np.where(finite, np.arange(self.n), -1)) if self.n else np.empty(0, "int64")
+
+        self._baseline: dict[tuple[int, BaselineStat], tuple[np.ndarray, np.ndarray]] = {}
+        self._static: dict[tuple[object, ...], np.ndarray] = {}
+
+    # ---- per-candidate quantities ------------------------------------------
+
+    def _count(self, lo: np.ndarray | int, hi: np.ndarray | int) -> np.ndarray:
+        return self._cum_valid[hi] - self._cum_valid[lo]
+
+    def _vol_sum(self, lo: np.ndarray | int, hi: np.ndarray | int) -> np.ndarray:
+        return self._cum_vol[hi] - self._cum_vol[lo]
+
+    def baseline_price(self, t: np.ndarray, L: int, stat: BaselineStat) -> np.ndarray:
+        """
+        Median/mean of the finite prices in rows [t-L, t); memoized per (L, stat).
+        """
+        key = (L, stat)
+        if key not in self._baseline:
+            self._baseline[key] = (np.full(self.n, np.nan), np.zeros(self.n, dtype=bool))
+        price, done = self._baseline[key]
+        todo = t[~done[t]]
+        if todo.size:
+            if stat == BaselineStat.mean:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    price[todo] = (self._cum_price[todo] - self._cum_price[todo - L]) / self._count(todo - L, todo)
+            else:
+                price[todo] = _window_reduce(self.avg_low, todo - L, L, "nanmedian")
+            done[todo] = True
+        return price[t]
+
+    def event_price(self, t: np.ndarray, M: int, mode: EventPriceMode) -> np.ndarray:
+        if mode == EventPriceMode.mean:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return (self._cum_price[t + M] - self._cum_price[t]) / self._count(t, t + M)
+        return _window_reduce(self.avg_low, t, M, "nanmin")
+
+    def static_candidates(self, req: ScanRequest) -> np.ndarray:
+        """
+        Ascending candidate indices passing every check that does not depend on "now": valid point counts,
+        positive prices, the drop threshold and (absolute / relative) volume shock.
+        """
+        L, M = req.baseline_hours * 12, req.event_window_blocks
+        key = (
+            L,
+            M,
+            req.baseline_stat,
+            req.event_price_mode,
+            req.min_drop_pct,
+            req.min_valid_baseline_price_points,
+            req.min_valid_event_price_points,
+            req.volume_mode,
+            req.min_event_volume if req.volume_mode == VolumeMode.absolute else None,
+            req.volume_multiplier if req.volume_mode == VolumeMode.relative_to_baseline else None,
+        )
+        cached = self._static.get(key)
+        if cached is not None:
+            return cached
+
+        t = np.arange(L, max(L, self.n - M + 1))
+        keep = (self._count(t - L, t) >= req.min_valid_baseline_price_points) & (
+            self._count(t, t + M) >= req.min_valid_event_price_points
+        )
+        event_volume = np.floor(self._vol_sum(t, t + M))
+        if req.volume_mode == VolumeMode.absolute:
+            keep &= event_volume >= req.min_event_volume
+        elif req.volume_mode == VolumeMode.relative_to_baseline:
+            base_mean_vol = self._vol_sum(t - L, t) / L
+            keep &= (base_mean_vol > 0) & (event_volume >= base_mean_vol * req.volume_multiplier)
+        t = t[keep]
+
+        ev = self.event_price(t, M, req.event_price_mode)
+        ok = np.isfinite(ev) & (ev > 0)
+        t, ev = t[ok], ev[ok]
+
+        base = self.baseline_price(t, L, req.baseline_stat)
+        with np.errstate(invalid="ignore"):
+            ok = np.isfinite(base) & (base > 0) & ((ev - base) / base <= -req.min_drop_pct)
+        out = t[ok]
+        self._static[key] = out
+        return out
+
+    # ---- evaluation at a "now" ----------------------------------------------
+
+    def latest_price(self, start: int, end: int) -> float | None:
+        if end <= start:
+            return None
+        i = int(self._last_valid[end - 1])
+        return float(self.avg_low[i]) if i >= start else None
+
+    def evaluate(self, *, start: int, end: int, req: ScanRequest) -> Detection | None:
+        """
+        Run the detector as if the series were rows [start, end), i.e. "now" is row end-1.
+        """
+        L, M, S = req.baseline_hours * 12, req.event_window_blocks, req.still_low_blocks
+        n = end - start
+        if n < max(L + M + 2, 288):
+            return None
+
+        daily_volume_24h = int(self._vol_sum(end - 288, end))
+        if req.min_daily_volume_24h is not None and daily_volume_24h < req.min_daily_volume_24h:
+            return None
+        if req.max_daily_volume_24h is not None and daily_volume_24h > req.max_daily_volume_24h:
+            return None
+
+        static = self.static_candidates(req)
+        lo, hi = np.searchsorted(static, [start + L, end - M - 1])
+        cand = static[lo:hi]
+        if cand.size == 0:
+            return None
+
+        event_volume = np.floor(self._vol_sum(cand, cand + M))
+        event_daily_pct = event_volume / daily_volume_24h if daily_volume_24h > 0 else None
+        if req.volume_mode == VolumeMode.daily_pct:
+            if event_daily_pct is None:
+                return None
+            keep = event_daily_pct >= req.min_event_daily_pct
+            cand, event_volume, event_daily_pct = cand[keep], event_volume[keep], event_daily_pct[keep]
+            if cand.size == 0:
+                return None
+
+        # Still-low: the tail [max(t+M, end-S'), end) must hold enough finite prices, all <= threshold.
+        base = self.baseline_price(cand, L, req.baseline_stat)
+        threshold = base * (1 - req.still_low_pct)
+        s_eff = max(S, 1)
+        tail_start = np.maximum(cand + M, end - s_eff)
+        tail_count = self._count(tail_start, end)
+        keep = tail_count >= req.min_valid_still_low_price_points
+        common = tail_start == end - s_eff
+        if np.any(common):
+            tail = self.avg_low[end - s_eff : end]
+            tail = tail[np.isfinite(tail)]
+            if tail.size:
+                keep[common] &= threshold[common] >= tail.max()
+        for j in np.nonzero(~common & keep)[0]:
+            tail = self.avg_low[tail_start[j] : end]
+            tail = tail[np.isfinite(tail)]
+            if tail.size and not tail.max() <= threshold[j]:
+                keep[j] = False
+        if not np.any(keep):
+            return None
+        cand, base, event_volume = cand[keep], base[keep], event_volume[keep]
+        if event_daily_pct is not None:
+            event_daily_pct = event_daily_pct[keep]
+
+        # Same tie-breaking as scan_item_series: the earliest candidate wins unless strictly beaten.
+        if req.sort_by == "most_recent":
+            j = cand.size - 1
+        elif req.sort_by == "biggest_volume":
+            j = int(np.argmax(event_volume))
+        elif req.sort_by == "biggest_event_daily_pct":
+            j = 0 if event_daily_pct is None else int(np.argmax(np.where(event_daily_pct > 0, event_daily_pct, -1.0)))
+        else:
+            ev = self.event_price(cand, M, req.event_price_mode)
+            j = int(np.argmin((ev - base) / base))
+
+        t = int(cand[j])
+        baseline_price = float(base[j])
+        event_price = float(self.event_price(cand[j : j + 1], M, req.event_price_mode)[0])
+        base_mean_vol = float(self._vol_sum(t - L, t)) / L
+        return Detection(
+            t=t,
+            baseline_price=baseline_price,
+            event_price=event_price,
+            price_drop_pct=(event_price - baseline_price) / baseline_price,
+            event_volume=int(event_volume[j]),
+            baseline_mean_5m_volume=base_mean_vol if np.isfinite(base_mean_vol) else None,
+            daily_volume_24h=daily_volume_24h,
+            event_daily_pct=None if event_daily_pct is None else float(event_daily_pct[j]),
+            latest_price=self.latest_price(start, end),
+        )
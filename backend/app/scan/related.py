@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.change_feed import BUCKET_5M, subscribe
+from app.core.metrics import stage
+from app.core.settings import settings
+from app.osrs.ingest import floor_to_5m
+from app.store.summary import get_summary_index
+
+log = logging.getLogger(__name__)
+
+# Neighbours kept per item; requests slice the first k.
+MAX_K = 50
+# Pairs need at least this many 5m returns in common (2 hours) to get a correlation at all.
+MIN_OVERLAP = 24
+# Side of the square tiles the correlation matrix is computed in: bounds memory at ~10 × BLOCK_ROWS² float32s.
+_BLOCK_ROWS = 512
+
+
+def log_returns(mids: np.ndarray) -> np.ndarray:
+    """
+    items × (buckets - 1) log returns of 5m mid prices; NaN unless both neighbouring buckets have a mid, so no
+    return spans a gap in trading.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_mid = np.log(mids)
+    return log_mid[:, 1:] - log_mid[:, :-1]
+
+
+def _correlate_tile(
+    m: np.ndarray, x: np.ndarray, x2: np.ndarray, rows: slice, cols: slice, min_overlap: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (overlap, correlation) of `rows` against `cols`; pairs under `min_overlap` or without a finite correlation
+    get -inf.
+    """
+    mi, mj = m[rows], m[cols]
+    overlap = mi @ mj.T
+    # Two products give the four one-sided sums: [x | x²] of each side against the other side's mask.
+    sx, sxx = np.split(np.concatenate((x[rows], x2[rows])) @ mj.T, 2)
+    sy, syy = np.split(mi @ np.concatenate((x[cols], x2[cols])).T, 2, axis=1)
+    corr = x[rows] @ x[cols].T
+    # In place from here: cov = sxy - sx·sy/n, var = (sxx - sx²/n)(syy - sy²/n), corr = cov / sqrt(var).
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_n = np.divide(1.0, overlap, dtype="float32")
+        corr -= sx * sy * inv_n
+        sx *= sx
+        sx *= inv_n
+        sxx -= sx
+        sy *= sy
+        sy *= inv_n
+        syy -= sy
+        sxx *= syy
+        np.sqrt(sxx, out=sxx)
+        corr /= sxx
+    corr[(overlap < min_overlap) | ~np.isfinite(corr)] = -np.inf
+    return overlap, corr
+
+
+def _merge_top_k(
+    top: tuple[np.ndarray, np.ndarray, np.ndarray], rows: slice, col0: int, corr: np.ndarray, overlap: np.ndarray
+) -> None:
+    """
+    Fold a tile's candidates (columns `col0`...) into the running top-k of `rows`, unordered.
+    """
+    top_rows, top_corr, top_overlap = top
+    k = top_rows.shape[1]
+    cand_rows = np.concatenate((top_rows[rows], np.broadcast_to(np.arange(col0, col0 + corr.shape[1]), corr.shape)), axis=1)
+    cand_corr = np.concatenate((top_corr[rows], corr), axis=1)
+    cand_overlap = np.concatenate((top_overlap[rows], overlap), axis=1)
+    part = np.argpartition(-cand_corr, k - 1, axis=1)[:, :k]
+    top_rows[rows] = np.take_along_axis(cand_rows, part, axis=1)
+    top_corr[rows] = np.take_along_axis(cand_corr, part, axis=1)
+    top_overlap[rows] = np.take_along_axis(cand_overlap, part, axis=1)
+
+
+def correlate_top_k(returns: np.ndarray, *, k: int, min_overlap: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairwise-complete Pearson correlation of every row with every other, over the columns where both are finite,
+    as matrix products over the zero-filled returns and their validity mask. The matrix is symmetric, so only
+    tiles on or above the diagonal are computed and each also feeds the top-k of its mirror rows. Returns (rows,
+    correlation, overlap), each items × k, best first; unused slots have row -1 and correlation NaN.
+    """
+    n = returns.shape[0]
+    k = min(k, max(n - 1, 0))
+    valid = np.isfinite(returns)
+    m = valid.astype("float32")
+    x = np.where(valid, returns, 0.0).astype("float32")
+    x2 = x * x
+
+    top_rows = np.full((n, k), -1, dtype="int64")
+    top_corr = np.full((n, k), -np.inf, dtype="float32")
+    top_overlap = np.zeros((n, k), dtype="float32")
+    if k == 0:
+        return top_rows, top_corr, top_overlap.astype("int32")
+    top = (top_rows, top_corr, top_overlap)
+    blocks = [slice(lo, min(lo + _BLOCK_ROWS, n)) for lo in range(0, n, _BLOCK_ROWS)]
+    for i, rows in enumerate(blocks):
+        for cols in blocks[i:]:
+            overlap, corr = _correlate_tile(m, x, x2, rows, cols, min_overlap)
+            if cols == rows:
+                np.fill_diagonal(corr, -np.inf)  # self
+            _merge_top_k(top, rows, cols.start, corr, overlap)
+            if cols != rows:
+                _merge_top_k(top, cols, rows.start, corr.T, overlap.T)
+
+    order = np.argsort(-top_corr, axis=1, kind="stable")
+    top_rows = np.take_along_axis(top_rows, order, axis=1)
+    top_corr = np.take_along_axis(top_corr, order, axis=1)
+    top_overlap = np.take_along_axis(top_overlap, order, axis=1)
+    ok = np.isfinite(top_corr)
+    return (
+        np.where(ok, top_rows, -1),
+        np.where(ok, top_corr, np.nan).astype("float32"),
+        np.where(ok, top_overlap, 0).astype("int32"),
+    )
+
+
+@dataclass(frozen=True)
+class RelatedTable:
+    """
+    Top-`MAX_K` neighbours of every item over the `hours` ending at `as_of`: row r is `item_ids[r]`, and
+    `rows[r]` indexes `item_ids` (-1 for no neighbour).
+    """
+
+    as_of: int
+    hours: int
+    item_ids: np.ndarray
+    rows: np.ndarray
+    correlation: np.ndarray
+    overlap: np.ndarray
+
+    def neighbours(self, item_id: int, k: int) -> list[tuple[int, float, int]] | None:
+        """
+        [(item id, correlation, overlap)] for `item_id`, best first; None if it did not trade in the window.
+        """
+        r = int(np.searchsorted(self.item_ids, item_id))
+        if r >= self.item_ids.size or self.item_ids[r] != item_id:
+            return None
+        return [
+            (int(self.item_ids[j]), round(float(c), 4), int(o))
+            for j, c, o in zip(self.rows[r, :k].tolist(), self.correlation[r, :k].tolist(), self.overlap[r, :k].tolist())
+            if j >= 0
+        ]
+
+
+def build_table(mids: np.ndarray, item_ids: np.ndarray, *, as_of: int, hours: int) -> RelatedTable:
+    """
+    Correlate the 5m mid-price returns of the last `hours` of `mids` (items × buckets, oldest first) across all
+    items with enough of them.
+    """
+    returns = log_returns(mids[:, -(hours * 12) :])
+    keep = np.isfinite(returns).sum(axis=1) >= MIN_OVERLAP
+    ids, returns = item_ids[keep], returns[keep]
+    order = np.argsort(ids)
+    ids, returns = ids[order], returns[order]
+    rows, corr, overlap = correlate_top_k(returns, k=MAX_K, min_overlap=MIN_OVERLAP)
+    return RelatedTable(as_of=as_of, hours=hours, item_ids=ids, rows=rows, correlation=corr, overlap=overlap)
+
+
+class RelatedIndex:
+    """
+    Related-item tables per window length, computed for all items at once from the rolling 24h summary's mid
+    prices and kept until the next bucket. Window lengths served once are recomputed by `run_precompute` as
+    each bucket lands, so requests find them ready.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tables: dict[int, RelatedTable] = {}
+        self._served: set[int] = set()
+
+    def table(self, db: Session, now: int, *, hours: int) -> RelatedTable | None:
+        """
+        Table for the `hours` ending at bucket `now`; None while that bucket is not held by the summary.
+        """
+        with self._lock:
+            self._served.add(hours)
+            cached = self._tables.get(hours)
+            if cached is not None and cached.as_of == now:
+                return cached
+            got = get_summary_index().mids(db, now)
+            if got is None:
+                return None
+            as_of, item_ids, mids = got
+            with stage("correlate") as st:
+                table = build_table(mids, item_ids, as_of=as_of, hours=hours)
+                st.rows = int(table.item_ids.size)
+            self._tables = {h: t for h, t in self._tables.items() if t.as_of == as_of}
+            self._tables[hours] = table
+            return table
+
+    def precompute(self, db: Session, now: int) -> int:
+        """
+        Compute the tables of every window length served so far for bucket `now`; returns how many were
+        computed (0 while the bucket is not ingested or all are current).
+        """
+        with self._lock:
+            due = sorted(h for h in self._served if (t := self._tables.get(h)) is None or t.as_of != now)
+        return sum(self.table(db, now, hours=h) is not None for h in due)
+
+
+_index = RelatedIndex()
+
+
+def get_related_index() -> RelatedIndex:
+    return _index
+
+
+async def run_precompute(stop: asyncio.Event) -> None:
+    """
+    Background task run by every worker: when a 5m bucket lands (woken by the change feed, or every
+    `related_poll_seconds`), compute this process's related tables for it off the event loop.
+    """
+    from app.db.session import SessionLocal
+
+    wake = asyncio.Event()
+    subscribe(BUCKET_5M, lambda _event: wake.set())
+    while not stop.is_set():
+        try:
+            with SessionLocal() as db:
+                now = floor_to_5m(int(time.time()))
+                t0 = time.perf_counter()
+                if computed := await asyncio.to_thread(_index.precompute, db, now):
+                    log.info("related: %s tables for %s (%.0f ms)", computed, now, (time.perf_counter() - t0) * 1000)
+        except Exception:
+            log.exception("related precompute failed")
+        waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(wake.wait())]
+        _, pending = await asyncio.wait(waiters, timeout=settings.related_poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+        for w in pending:
+            w.cancel()
+        wake.clear()
+
+
+def main() -> None:
+    """
+    Batch job: neighbours of every item over the window ending at `--now` (default: the current bucket), as JSON.
+    """
+    from app.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Correlate 5m mid-price returns across all items.")
+    parser.add_argument("--hours", type=int, default=24, choices=range(1, 25), metavar="1..24")
+    parser.add_argument("--k", type=int, default=10, choices=range(1, MAX_K + 1), metavar=f"1..{MAX_K}")
+    parser.add_argument("--now", type=int, default=None, help="Bucket ts to end at (default: the current 5m bucket).")
+    parser.add_argument("--out", default="related.json")
+    args = parser.parse_args()
+
+    now = floor_to_5m(args.now if args.now is not None else int(time.time()))
+    with SessionLocal() as db:
+        t0 = time.perf_counter()
+        table = _index.table(db, now, hours=args.hours)
+    if table is None:
+        raise SystemExit(f"bucket {now} has not been ingested")
+    out = {
+        "as_of": table.as_of,
+        "hours": table.hours,
+        "items": {
+            str(item_id): [{"item_id": j, "correlation": c, "overlap": o} for j, c, o in table.neighbours(item_id, args.k) or []]
+            for item_id in table.item_ids.tolist()
+        },
+    }
+    with open(args.out, "w") as f:
+        json.dump(out, f)
+    print(f"{table.item_ids.size} items correlated in {time.perf_counter() - t0:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
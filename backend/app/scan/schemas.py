@@ -3,12 +3,14 @@ from __future__ import annotations
 from enum import Enum
 from typing import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class BaselineStat(str, Enum):
     mean = "mean"
     median = "median"
+    # Robust exponentially weighted mean/variance over the rows before the event (see app/scan/ewma.py).
+    ewma = "ewma"
 
 
 class EventPriceMode(str, Enum):
@@ -23,14 +25,22 @@ class VolumeMode(str, Enum):
 
 
 class ScanRequest(BaseModel):
-    baseline_hours: int = Field(6, ge=1, le=30)
+    baseline_hours: int = Field(6, ge=1, le=14 * 24)
     event_window_blocks: int = Field(1, ge=1, le=12)
     still_low_blocks: int = Field(3, ge=0, le=36)
 
+    # "5m": the baseline is the `baseline_hours * 12` 5m buckets before the event (at most 30 hours).
+    # "1h": the baseline is the `baseline_hours` ingested 1h buckets before the event's hour (up to 14 days);
+    # event and still-low windows stay on 5m buckets.
+    baseline_resolution: Literal["5m", "1h"] = "5m"
+
     baseline_stat: BaselineStat = BaselineStat.median
     event_price_mode: EventPriceMode = EventPriceMode.min
 
     min_drop_pct: float = Field(0.07, ge=0.0, le=0.95)
+    # baseline_stat="ewma" only: the event price must also sit this many EWMA standard deviations below the
+    # baseline (z-score <= -min_drop_z).
+    min_drop_z: float = Field(3.0, ge=0.0)
 
     volume_mode: VolumeMode = VolumeMode.relative_to_baseline
     min_event_volume: int = Field(0, ge=0)
@@ -40,11 +50,16 @@ class ScanRequest(BaseModel):
     still_low_pct: float = Field(0.05, ge=0.0, le=0.95)
 
     # Robustness against sparse trading (avgLowPrice can be null for many buckets).
-    # These thresholds are counts of buckets WITH a finite avgLowPrice.
+    # These thresholds are counts of buckets WITH a finite avgLowPrice. With a 1h baseline the baseline
+    # threshold counts 5m-equivalents: ceil(points / 12) hourly buckets.
     min_valid_baseline_price_points: int = Field(12, ge=0)
     min_valid_event_price_points: int = Field(1, ge=0)
     min_valid_still_low_price_points: int = Field(1, ge=0)
 
+    # Also check the polled /latest low price (when newer than the last 5m bucket) for still-low and report it as
+    # latest_price, so "now" is at most a poll interval old instead of up to a bucket.
+    use_latest_price: bool = False
+
     # Optional item filters
     min_buy_limit: int | None = Field(default=None, ge=0)
     max_buy_limit: int | None = Field(default=None, ge=0)
@@ -57,6 +72,14 @@ class ScanRequest(BaseModel):
     sort_by: Literal["biggest_drop", "most_recent", "biggest_volume", "biggest_event_daily_pct"] = "biggest_drop"
     limit: int = Field(100, ge=1, le=500)
 
+    @model_validator(mode="after")
+    def _check_baseline_window(self) -> ScanRequest:
+        if self.baseline_resolution == "5m" and self.baseline_hours > 30:
+            raise ValueError("baseline_hours above 30 needs baseline_resolution='1h'")
+        if self.baseline_stat == BaselineStat.ewma and self.baseline_resolution != "5m":
+            raise ValueError("baseline_stat='ewma' needs baseline_resolution='5m'")
+        return self
+
 
 class ScanResult(BaseModel):
     item_id: int
@@ -66,6 +89,8 @@ class ScanResult(BaseModel):
     baseline_price: float
     event_price: float
     price_drop_pct: float
+    # baseline_stat="ewma" only: (event - baseline) / EWMA standard deviation.
+    drop_z: float | None = None
 
     event_volume: int
     baseline_mean_5m_volume: float | None = None
@@ -81,3 +106,39 @@ class ScanResponse(BaseModel):
     meta: dict[str, object] = {}
 
 
+class ScanSweepRequest(BaseModel):
+    # Variants are evaluated over one shared window; results come back in the same order.
+    variants: list[ScanRequest] = Field(..., min_length=1, max_length=32)
+
+
+class ScanSweepResponse(BaseModel):
+    variants: list[ScanResponse]
+    meta: dict[str, object] = {}
+
+
+class SubscriptionCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    request: ScanRequest
+
+
+class Subscription(BaseModel):
+    id: int
+    name: str
+    request: ScanRequest
+    created_at: int
+    # Bucket ("now") the subscription was last evaluated at; None until its first evaluation.
+    last_evaluated_ts: int | None = None
+
+
+class SubscriptionResult(BaseModel):
+    # Evaluation (bucket) that first reported this dump, and the latest one that still did.
+    first_seen_ts: int
+    last_seen_ts: int
+    result: ScanResult
+
+
+class SubscriptionResultsResponse(BaseModel):
+    subscription_id: int
+    # Last evaluated bucket: pass it back as `since` to get only dumps reported after this response.
+    as_of: int | None
+    results: list[SubscriptionResult]
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.change_feed import BUCKET_5M, subscribe
+from app.core.metrics import StageTimer, stage
+from app.core.settings import settings
+from app.db.models import Bucket5m, ScanSubscription, ScanSubscriptionResult
+from app.osrs.client import OsrsPricesClient
+from app.osrs.ingest import ensure_buckets_1h_cached, ensure_buckets_cached, ensure_mapping_cached, floor_to_5m
+from app.osrs.latest import latest_prices
+from app.osrs.leader import may_ingest
+from app.scan.compute import baseline_hour_ts, scan_item_series, scan_window_blocks
+from app.scan.ewma_index import get_ewma_index
+from app.scan.kernels import Detection, SeriesKernels
+from app.scan.schemas import BaselineStat, ScanRequest, ScanResult
+from app.scan.window import buy_limit_ok, load_hourly, load_window, price_ok, sort_and_trim
+
+log = logging.getLogger(__name__)
+
+WindowKey = tuple[str, int, int, int, bool]
+
+
+def _window_key(req: ScanRequest) -> WindowKey:
+    # Subscriptions with the same key read the same rows of each item's series (and the same 1h baseline rows),
+    # so the window slice, hourly arrays and every array SeriesKernels caches for it are shared.
+    return (req.baseline_resolution, req.baseline_hours, req.event_window_blocks, req.still_low_blocks, req.use_latest_price)
+
+
+def _uses_kernels(key: WindowKey) -> bool:
+    # SeriesKernels covers 5m baselines without /latest, like sweeps; the rest run scan_item_series.
+    return key[0] == "5m" and not key[4]
+
+
+def _from_detection(item_id: int, name: str, bucket_ts: np.ndarray, d: Detection) -> ScanResult:
+    return ScanResult(
+        item_id=item_id,
+        name=name,
+        dump_bucket_ts=int(bucket_ts[d.t]),
+        baseline_price=d.baseline_price,
+        event_price=d.event_price,
+        price_drop_pct=d.price_drop_pct,
+        event_volume=d.event_volume,
+        baseline_mean_5m_volume=d.baseline_mean_5m_volume,
+        daily_volume_24h=d.daily_volume_24h,
+        event_daily_pct=d.event_daily_pct,
+        still_low=True,
+        latest_price=d.latest_price,
+    )
+
+
+def evaluate(db: Session, reqs: Mapping[int, ScanRequest], now: int) -> dict[int, list[ScanResult]]:
+    """
+    Run every request as POST /scan would at bucket `now`, over one loaded window (the largest any request
+    needs). Requests are grouped by window parameters: each group slices an item's series once, and 5m groups
+    share one SeriesKernels per item, so baselines/event prices common to several subscriptions are computed once.
+    """
+    groups: dict[WindowKey, list[int]] = defaultdict(list)
+    for sid, req in reqs.items():
+        groups[_window_key(req)].append(sid)
+    first_reqs = {key: reqs[sids[0]] for key, sids in groups.items()}
+
+    blocks = max(scan_window_blocks(r) for r in reqs.values())
+    id_to_meta, per_item = load_window(db, [now - 300 * i for i in range(blocks)])
+    window_start = {key: now - 300 * (scan_window_blocks(r) - 1) for key, r in first_reqs.items()}
+    hourly = {
+        key: load_hourly(db, baseline_hour_ts(r, now), per_item.keys())
+        for key, r in first_reqs.items()
+        if r.baseline_resolution == "1h"
+    }
+    latest = latest_prices(db) if any(r.use_latest_price for r in first_reqs.values()) else None
+
+    # EWMA subscriptions evaluate all items at once over their window slice, against the held EWMA state.
+    ewma: dict[int, dict[int, ScanResult]] = {}
+    for sid, req in reqs.items():
+        if req.baseline_stat == BaselineStat.ewma:
+            start_ts = now - 300 * (scan_window_blocks(req) - 1)
+            sliced = {}
+            for item_id, series in per_item.items():
+                start = int(np.searchsorted(series[0], start_ts, side="left"))
+                if start < series[0].size:
+                    sliced[item_id] = tuple(a[start:] for a in series)
+            with stage("evaluate_ewma"):
+                ewma[sid] = get_ewma_index().scan(
+                    db,
+                    now,
+                    sliced,
+                    req,
+                    name_of=lambda item_id: id_to_meta.get(item_id, (f"item_{item_id}", None))[0],
+                    latest_low=latest.low_at if latest is not None and req.use_latest_price else None,
+                )
+
+    results: dict[int, list[ScanResult]] = {sid: [] for sid in reqs}
+    with stage("evaluate") as st:
+        for item_id, (bucket_ts_arr, avg_low_arr, low_vol_arr) in per_item.items():
+            name, buy_limit = id_to_meta.get(item_id, (f"item_{item_id}", None))
+            n = bucket_ts_arr.size
+            kernels: SeriesKernels | None = None
+            for key, sids in groups.items():
+                start = int(np.searchsorted(bucket_ts_arr, window_start[key], side="left"))
+                if start >= n:
+                    continue
+                for sid in sids:
+                    req = reqs[sid]
+                    if not buy_limit_ok(req, buy_limit):
+                        continue
+                    if sid in ewma:
+                        r = ewma[sid].get(item_id)
+                    elif _uses_kernels(key):
+                        if kernels is None:
+                            kernels = SeriesKernels(avg_low_arr, low_vol_arr)
+                        d = kernels.evaluate(start=start, end=n, req=req)
+                        r = _from_detection(item_id, name, bucket_ts_arr, d) if d is not None else None
+                    else:
+                        r = scan_item_series(
+                            item_id=item_id,
+                            name=name,
+                            bucket_ts=bucket_ts_arr[start:],
+                            avg_low=avg_low_arr[start:],
+                            low_vol=low_vol_arr[start:],
+                            req=req,
+                            baseline_1h=hourly[key].get(item_id) if key in hourly else None,
+                            latest_low=latest.low_at(item_id) if latest is not None and req.use_latest_price else None,
+                        )
+                    if r is not None and price_ok(req, r):
+                        results[sid].append(r)
+        st.rows = len(per_item) * len(reqs)
+    return {sid: sort_and_trim(res, reqs[sid]) for sid, res in results.items()}
+
+
+def _store(db: Session, now: int, results: Mapping[int, list[ScanResult]]) -> int:
+    rows = [
+        {
+            "subscription_id": sid,
+            "item_id": r.item_id,
+            "dump_bucket_ts": r.dump_bucket_ts,
+            "first_seen_ts": now,
+            "last_seen_ts": now,
+            "result": r.model_dump(mode="json"),
+        }
+        for sid, res in results.items()
+        for r in res
+    ]
+    if rows:
+        stmt = insert(ScanSubscriptionResult).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                ScanSubscriptionResult.subscription_id,
+                ScanSubscriptionResult.item_id,
+                ScanSubscriptionResult.dump_bucket_ts,
+            ],
+            set_={"last_seen_ts": stmt.excluded.last_seen_ts, "result": stmt.excluded.result},
+        )
+        db.execute(stmt)
+    db.execute(update(ScanSubscription).where(ScanSubscription.id.in_(list(results))).values(last_evaluated_ts=now))
+    db.execute(
+        delete(ScanSubscriptionResult).where(
+            ScanSubscriptionResult.last_seen_ts < now - settings.subscriptions_retention_hours * 3600
+        )
+    )
+    db.commit()
+    return len(rows)
+
+
+async def evaluate_due(db: Session, client: OsrsPricesClient) -> dict[str, Any]:
+    """
+    Evaluate the subscriptions not yet evaluated at the latest ingested bucket and store their results.
+    """
+    latest_ts = db.execute(select(func.max(Bucket5m.bucket_ts))).scalar()
+    if latest_ts is None:
+        return {"evaluated": 0}
+    now = min(int(latest_ts), floor_to_5m(int(time.time())))
+    subs = db.execute(
+        select(ScanSubscription.id, ScanSubscription.request).where(
+            or_(ScanSubscription.last_evaluated_ts.is_(None), ScanSubscription.last_evaluated_ts < now)
+        )
+    ).all()
+    if not subs:
+        return {"evaluated": 0, "as_of": now}
+    reqs = {int(sid): ScanRequest.model_validate(request) for sid, request in subs}
+
+    # Same ingest a scan at `now` would trigger; usually nothing is missing once the bucket has landed.
+    blocks = max(scan_window_blocks(r) for r in reqs.values())
+    hour_ts = sorted({ts for r in reqs.values() for ts in baseline_hour_ts(r, now)}, reverse=True)
+    await ensure_mapping_cached(db, client)
+    await ensure_buckets_cached(db, client, [now - 300 * i for i in range(blocks)])
+    if hour_ts:
+        await ensure_buckets_1h_cached(db, client, hour_ts)
+
+    results = await asyncio.to_thread(evaluate, db, reqs, now)
+    with stage("store_results") as st:
+        st.rows = await asyncio.to_thread(_store, db, now, results)
+    return {"evaluated": len(reqs), "groups": len({_window_key(r) for r in reqs.values()}), "as_of": now}
+
+
+async def run_subscription_evaluator(stop: asyncio.Event) -> None:
+    """
+    Background task: evaluate subscriptions whenever a new 5m bucket is announced on the change feed (or every
+    `subscriptions_poll_seconds`) while this process may ingest.
+    """
+    from app.db.session import SessionLocal
+
+    wake = asyncio.Event()
+    subscribe(BUCKET_5M, lambda _event: wake.set())
+    while not stop.is_set():
+        if may_ingest():
+            client = OsrsPricesClient()
+            try:
+                with StageTimer("subscriptions") as timer, SessionLocal() as db:
+                    out = await evaluate_due(db, client)
+                if out.get("evaluated"):
+                    log.info("subscriptions: %s (%.0f ms)", out, timer.as_meta()["total_ms"])
+            except Exception:
+                log.exception("subscription evaluation failed")
+            finally:
+                await client.aclose()
+        waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(wake.wait())]
+        _, pending = await asyncio.wait(waiters, timeout=settings.subscriptions_poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+        for w in pending:
+            w.cancel()
+        wake.clear()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import heapq
+from typing import Literal
+
+from app.scan.schemas import ScanResult
+
+SortBy = Literal["biggest_drop", "most_recent", "biggest_volume", "biggest_event_daily_pct"]
+
+
+def sort_score(r: ScanResult, sort_by: SortBy) -> float:
+    """
+    Larger is better; ranks results exactly like the list sorts in routes_scan.
+    """
+    if sort_by == "most_recent":
+        return float(r.dump_bucket_ts)
+    if sort_by == "biggest_volume":
+        return float(r.event_volume)
+    if sort_by == "biggest_event_daily_pct":
+        return r.event_daily_pct or -1.0
+    return -r.price_drop_pct  # more negative first
+
+
+class TopK:
+    """
+    Bounded selection of the best `k` results seen so far (O(k) memory, O(log k) per push).
+
+    Ties keep arrival order, as the stable sorts in routes_scan do: among equal scores the earlier result wins.
+    """
+
+    def __init__(self, k: int, sort_by: SortBy) -> None:
+        self.k = k
+        self.sort_by = sort_by
+        self._heap: list[tuple[float, int, ScanResult]] = []  # min-heap on (score, -seq): worst kept result on top
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, r: ScanResult) -> None:
+        entry = (sort_score(r, self.sort_by), -self._seq, r)
+        self._seq += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def results(self) -> list[ScanResult]:
+        return [r for _, _, r in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
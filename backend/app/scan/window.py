@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.metrics import stage
+from app.db.models import ItemBucket1h, ItemBucket5m
+from app.db.queries import ids_in, ts_in
+from app.osrs.mapping import ItemMeta, item_meta
+from app.scan.schemas import ScanRequest, ScanResult
+from app.store.hot_window import load_sparse_window
+
+
+def load_window(
+    db: Session,
+    bucket_ts_list: list[int],
+    candidates: Callable[[ItemMeta], set[int] | None] | None = None,
+) -> tuple[ItemMeta, dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+    """
+    Load mapping metadata and, per item, time-ascending (bucket_ts, avg_low, low_vol) arrays for the window.
+    `candidates(id_to_meta)` may narrow the items whose series are loaded (None: all of them).
+    """
+    with stage("load_mapping") as st:
+        id_to_meta = item_meta(db)
+        st.rows = len(id_to_meta)
+
+    item_ids = None
+    if candidates is not None:
+        with stage("prune") as st:
+            item_ids = candidates(id_to_meta)
+            st.rows = len(item_ids) if item_ids is not None else 0
+
+    arrays = load_sparse_window(bucket_ts_list, ("avg_low", "low_vol"), item_ids)
+    if arrays is not None:
+        # Hot window / columnar store covers the whole window: slice it instead of pulling rows through Postgres.
+        return id_to_meta, arrays
+
+    with stage("load_rows") as st:
+        stmt = select(
+            ItemBucket5m.item_id,
+            ItemBucket5m.bucket_ts,
+            ItemBucket5m.avg_low,
+            ItemBucket5m.low_vol,
+        ).where(ts_in(ItemBucket5m.bucket_ts, bucket_ts_list, step=300))
+        if item_ids is not None:
+            stmt = stmt.where(ids_in(ItemBucket5m.item_id, item_ids))
+        rows = db.execute(stmt).all()
+        st.rows = len(rows)
+
+    with stage("to_numpy") as st:
+        per_item: dict[int, list[tuple[int, int | None, int]]] = defaultdict(list)
+        for item_id, bucket_ts, avg_low, low_vol in rows:
+            per_item[int(item_id)].append((int(bucket_ts), int(avg_low) if avg_low is not None else None, int(low_vol)))
+
+        arrays: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for item_id, series in per_item.items():
+            series.sort(key=lambda x: x[0])  # ascending time
+            arrays[item_id] = (
+                np.array([s[0] for s in series], dtype="int64"),
+                np.array([np.nan if s[1] is None else float(s[1]) for s in series], dtype="float64"),
+                np.array([float(s[2]) for s in series], dtype="float64"),
+            )
+        st.rows = len(arrays)
+    return id_to_meta, arrays
+
+
+def load_hourly(db: Session, hour_ts: list[int], item_ids: Iterable[int]) -> dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Per item, time-ascending (bucket_ts, avg_low, low_vol) arrays of the given 1h buckets.
+    """
+    ids = sorted(item_ids)
+    if not hour_ts or not ids:
+        return {}
+    with stage("load_rows_1h") as st:
+        rows = db.connection().execute(
+            select(ItemBucket1h.item_id, ItemBucket1h.bucket_ts, ItemBucket1h.avg_low, ItemBucket1h.low_vol)
+            .where(ts_in(ItemBucket1h.bucket_ts, hour_ts, step=3600))
+            .where(ids_in(ItemBucket1h.item_id, ids))
+        ).all()
+        st.rows = len(rows)
+    if not rows:
+        return {}
+
+    with stage("to_numpy_1h") as st:
+        item_col, ts_col, low_col, vol_col = zip(*rows)
+        item = np.array(item_col, dtype="int64")
+        ts = np.array(ts_col, dtype="int64")
+        avg_low = np.array(low_col, dtype="float64")  # None -> NaN
+        low_vol = np.array(vol_col, dtype="float64")
+        order = np.lexsort((ts, item))
+        item, ts, avg_low, low_vol = item[order], ts[order], avg_low[order], low_vol[order]
+        starts = np.flatnonzero(np.r_[True, item[1:] != item[:-1]])
+        bounds = np.r_[starts, item.size]
+        out = {
+            int(item[a]): (ts[a:b], avg_low[a:b], low_vol[a:b])
+            for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        }
+        st.rows = len(out)
+    return out
+
+
+def buy_limit_ok(req: ScanRequest, buy_limit: int | None) -> bool:
+    if req.min_buy_limit is not None:
+        if buy_limit is None or buy_limit < req.min_buy_limit:
+            return False
+    if req.max_buy_limit is not None:
+        if buy_limit is None or buy_limit > req.max_buy_limit:
+            return False
+    return True
+
+
+def price_ok(req: ScanRequest, r: ScanResult) -> bool:
+    if req.min_price is not None and r.baseline_price < req.min_price:
+        return False
+    if req.max_price is not None and r.baseline_price > req.max_price:
+        return False
+    return True
+
+
+def sort_and_trim(results: list[ScanResult], req: ScanRequest) -> list[ScanResult]:
+    if req.sort_by == "most_recent":
+        results.sort(key=lambda r: r.dump_bucket_ts, reverse=True)
+    elif req.sort_by == "biggest_volume":
+        results.sort(key=lambda r: r.event_volume, reverse=True)
+    elif req.sort_by == "biggest_event_daily_pct":
+        results.sort(key=lambda r: (r.event_daily_pct or -1.0), reverse=True)
+    else:
+        results.sort(key=lambda r: r.price_drop_pct)  # more negative first
+
+    return results[: req.limit]
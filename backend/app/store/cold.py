@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import time
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.settings import settings
+from app.db.models import ItemBucket5m, ItemTimeseries24h
+from app.db.queries import ids_in
+
+
+@functools.cache
+def _duckdb() -> Any:
+    # DuckDB is optional: without it there is no cold tier and history queries read Postgres only. Imported on
+    # first use, so processes that never touch the cold tier don't pay for it at start-up.
+    try:
+        import duckdb
+    except ImportError:  # pragma: no cover - depends on environment
+        return None
+    return duckdb
+
+
+DAY_SECONDS = 86400
+COLUMNS = ("item_id", "bucket_ts", "avg_high", "high_vol", "avg_low", "low_vol")
+TABLES = {"item_bucket_5m": ItemBucket5m, "item_timeseries_24h": ItemTimeseries24h}
+# Only 5m rows are pruned from Postgres after export: the 24h series is refreshed in place by
+# ensure_timeseries_24h_cached and read by the spreads scan, so it stays hot and is exported as a research copy.
+PRUNABLE_TABLES = ("item_bucket_5m",)
+# Scans, /series (up to 48h), spreads, the 24h summary and the hot window read recent 5m rows from Postgres only,
+# and `bucket_5m` keeps pruned buckets marked as ingested, so nothing would re-fetch them: pruning is refused for
+# days this recent (or within the ingest / hot windows, if those are longer).
+MIN_PRUNE_AGE_DAYS = 3
+
+
+def min_prune_age_days() -> int:
+    longest_hours = max(settings.ingest_window_hours, settings.hot_window_hours)
+    return max(MIN_PRUNE_AGE_DAYS, -(-longest_hours // 24) + 1)
+
+
+_DTYPES = {"item_id": "int64", "bucket_ts": "int64", "avg_high": "float64", "high_vol": "float64", "avg_low": "float64", "low_vol": "float64"}
+_SQL_TYPES = {"item_id": "INTEGER", "bucket_ts": "BIGINT", "avg_high": "INTEGER", "high_vol": "INTEGER", "avg_low": "INTEGER", "low_vol": "INTEGER"}
+
+
+def floor_to_day(ts: int) -> int:
+    return ts - (ts % DAY_SECONDS)
+
+
+def _day_label(day_ts: int) -> str:
+    return datetime.fromtimestamp(day_ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _empty(columns: Sequence[str]) -> dict[str, np.ndarray]:
+    return {c: np.empty(0, dtype=_DTYPES[c]) for c in columns}
+
+
+def _row_keys(item_id: np.ndarray, bucket_ts: np.ndarray) -> np.ndarray:
+    # bucket_ts < 2**33 and item ids < 2**30, so one int64 identifies a row.
+    return (item_id.astype("int64") << 33) | bucket_ts.astype("int64")
+
+
+class ColdStore:
+    """
+    Day-partitioned Parquet copies of `item_bucket_5m` / `item_timeseries_24h`, queried through DuckDB.
+
+    Layout: `<root>/<table>/day=YYYY-MM-DD/part.parquet`, one file per UTC day of `bucket_ts`, holding the
+    table's columns sorted by (item_id, bucket_ts). Files are written once a day is complete and replaced
+    atomically, so readers never see a partial day.
+    """
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        if _duckdb() is None:
+            raise RuntimeError("duckdb is not installed; it is required for the Parquet cold store")
+        self.root = Path(root)
+
+    @classmethod
+    def from_settings(cls) -> ColdStore | None:
+        if not settings.cold_storage_dir:
+            return None
+        return cls(settings.cold_storage_dir)
+
+    def day_path(self, table: str, day_ts: int) -> Path:
+        return self.root / table / f"day={_day_label(day_ts)}" / "part.parquet"
+
+    def day_files(self, table: str, start_ts: int, end_ts: int) -> list[Path]:
+        days = range(floor_to_day(start_ts), floor_to_day(end_ts) + 1, DAY_SECONDS)
+        return [p for p in (self.day_path(table, d) for d in days) if p.is_file()]
+
+    def write_day(self, table: str, day_ts: int, data: dict[str, np.ndarray]) -> Path:
+        path = self.day_path(table, day_ts)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".tmp-{os.getpid()}-{path.name}")
+        order = np.lexsort((data["bucket_ts"], data["item_id"]))
+        con = _duckdb().connect()
+        try:
+            # NaN prices arrive as NULL, so the file keeps the Postgres column types and nullability.
+            con.register("day_rows", {c: data[c][order] for c in COLUMNS})
+            cols = ", ".join(f"CAST({c} AS {_SQL_TYPES[c]}) AS {c}" for c in COLUMNS)
+            con.execute(f"COPY (SELECT {cols} FROM day_rows) TO '{tmp}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+        finally:
+            con.close()
+        os.replace(tmp, path)
+        return path
+
+    def scan(
+        self,
+        table: str,
+        start_ts: int,
+        end_ts: int,
+        *,
+        item_ids: Sequence[int] | None = None,
+        columns: Sequence[str] = COLUMNS,
+    ) -> dict[str, np.ndarray]:
+        """
+        Rows with bucket_ts in [start_ts, end_ts] (optionally only `item_ids`); NULL prices come back as NaN.
+        """
+        files = self.day_files(table, start_ts, end_ts)
+        if not files or (item_ids is not None and len(item_ids) == 0):
+            return _empty(columns)
+        where = "bucket_ts BETWEEN ? AND ?"
+        params: list[object] = [int(start_ts), int(end_ts)]
+        if item_ids is not None:
+            where += " AND item_id IN (SELECT UNNEST(?))"
+            params.append([int(i) for i in item_ids])
+        con = _duckdb().connect()
+        try:
+            out = con.execute(
+                f"SELECT {', '.join(columns)} FROM read_parquet(?) WHERE {where}",
+                [[str(f) for f in files], *params],
+            ).fetchnumpy()
+        finally:
+            con.close()
+        return {c: np.ma.filled(np.ma.asarray(out[c]).astype(_DTYPES[c]), np.nan) for c in columns}
+
+
+def _pg_rows(
+    db: Session,
+    table: str,
+    start_ts: int,
+    end_ts: int,
+    *,
+    item_ids: Sequence[int] | None = None,
+    columns: Sequence[str] = COLUMNS,
+) -> dict[str, np.ndarray]:
+    model = TABLES[table]
+    stmt = select(*(getattr(model, c) for c in columns)).where(model.bucket_ts >= start_ts).where(model.bucket_ts <= end_ts)
+    if item_ids is not None:
+        stmt = stmt.where(ids_in(model.item_id, item_ids))
+    rows = db.connection().execute(stmt).all()
+    if not rows:
+        return _empty(columns)
+    return {c: np.array(col, dtype=_DTYPES[c]) for c, col in zip(columns, zip(*rows))}
+
+
+def union_cold(
+    hot: dict[str, np.ndarray],
+    table: str,
+    start_ts: int,
+    end_ts: int,
+    *,
+    item_ids: Sequence[int] | None = None,
+    cold: ColdStore | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Append cold rows for the range to `hot` (which must include item_id and bucket_ts). Postgres wins where a
+    row exists in both, e.g. a day exported but not pruned yet. Output order is unspecified.
+    """
+    cold = cold if cold is not None else ColdStore.from_settings()
+    if cold is None:
+        return hot
+    columns = list(hot.keys())
+    extra = cold.scan(table, start_ts, end_ts, item_ids=item_ids, columns=columns)
+    if extra["bucket_ts"].size == 0:
+        return hot
+    if hot["bucket_ts"].size:
+        keep = ~np.isin(_row_keys(extra["item_id"], extra["bucket_ts"]), _row_keys(hot["item_id"], hot["bucket_ts"]))
+        extra = {c: v[keep] for c, v in extra.items()}
+    return {c: np.concatenate((hot[c], extra[c])) for c in columns}
+
+
+def query_history(
+    db: Session,
+    table: str,
+    start_ts: int,
+    end_ts: int,
+    *,
+    item_ids: Sequence[int] | None = None,
+    columns: Sequence[str] = COLUMNS,
+) -> dict[str, np.ndarray]:
+    """
+    `table` rows in [start_ts, end_ts] from Postgres and the Parquet cold store combined, sorted by
+    (item_id, bucket_ts). Prices are float64 with NaN for NULL.
+    """
+    columns = list(dict.fromkeys(["item_id", "bucket_ts", *columns]))
+    data = _pg_rows(db, table, start_ts, end_ts, item_ids=item_ids, columns=columns)
+    data = union_cold(data, table, start_ts, end_ts, item_ids=item_ids)
+    order = np.lexsort((data["bucket_ts"], data["item_id"]))
+    return {c: v[order] for c, v in data.items()}
+
+
+def export_completed_days(
+    db: Session,
+    cold: ColdStore,
+    table: str,
+    *,
+    older_than_days: int = 1,
+    prune: bool = False,
+    overwrite: bool = False,
+) -> list[dict[str, object]]:
+    """
+    Export every complete UTC day older than `older_than_days` that still has rows in Postgres.
+
+    With `prune` (5m table only), a day's Postgres rows are deleted once its Parquet file has been written
+    and its row count checked. `bucket_5m` keeps its rows, so pruned buckets are not re-fetched from upstream;
+    `older_than_days` must therefore be at least `min_prune_age_days()`.
+    """
+    if prune and table not in PRUNABLE_TABLES:
+        raise ValueError(f"{table} is not prunable")
+    if prune and older_than_days < min_prune_age_days():
+        raise ValueError(
+            f"pruning needs older_than_days >= {min_prune_age_days()}: newer rows are still read from Postgres only"
+        )
+    model = TABLES[table]
+    cutoff = floor_to_day(int(time.time())) - (older_than_days - 1) * DAY_SECONDS
+    first = db.execute(select(func.min(model.bucket_ts)).where(model.bucket_ts < cutoff)).scalar_one_or_none()
+    if first is None:
+        return []
+
+    report: list[dict[str, object]] = []
+    for day in range(floor_to_day(int(first)), cutoff, DAY_SECONDS):
+        path = cold.day_path(table, day)
+        if path.is_file() and not overwrite and not prune:
+            continue
+        data = _pg_rows(db, table, day, day + DAY_SECONDS - 1)
+        rows = int(data["bucket_ts"].size)
+        if rows == 0:
+            continue
+        if overwrite or not path.is_file():
+            cold.write_day(table, day, data)
+        exported = int(cold.scan(table, day, day + DAY_SECONDS - 1, columns=("bucket_ts",))["bucket_ts"].size)
+        entry: dict[str, object] = {"table": table, "day": _day_label(day), "rows": rows, "file": str(path)}
+        if prune:
+            if exported < rows:
+                raise RuntimeError(f"{path} holds {exported} rows, Postgres {rows}; not pruning {_day_label(day)}")
+            db.execute(delete(model).where(model.bucket_ts >= day).where(model.bucket_ts < day + DAY_SECONDS))
+            db.commit()
+            entry["pruned"] = rows
+        report.append(entry)
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Export completed days of 5m / 24h history to day-partitioned Parquet.")
+    p.add_argument("--tables", default=",".join(TABLES), help="Comma-separated tables to export.")
+    p.add_argument("--older-than-days", type=int, default=1, help="Only export days at least this many days old.")
+    p.add_argument(
+        "--prune",
+        action="store_true",
+        help=f"Delete exported item_bucket_5m rows from Postgres (needs --older-than-days >= {min_prune_age_days()}).",
+    )
+    p.add_argument("--overwrite", action="store_true", help="Rewrite days that already have a Parquet file.")
+    p.add_argument("--dir", default=None, help="Cold store directory (defaults to COLD_STORAGE_DIR).")
+    args = p.parse_args(argv)
+    if args.prune and args.older_than_days < min_prune_age_days():
+        p.error(f"--prune needs --older-than-days >= {min_prune_age_days()}; newer 5m rows are still read from Postgres")
+
+    from app.db.session import SessionLocal
+
+    root = args.dir or settings.cold_storage_dir
+    if not root:
+        p.error("set COLD_STORAGE_DIR or pass --dir")
+    cold = ColdStore(root)
+    report: list[dict[str, object]] = []
+    with SessionLocal() as db:
+        for table in [t.strip() for t in args.tables.split(",") if t.strip()]:
+            if table not in TABLES:
+                p.error(f"unknown table {table!r}")
+            report += export_completed_days(
+                db,
+                cold,
+                table,
+                older_than_days=args.older_than_days,
+                prune=args.prune and table in PRUNABLE_TABLES,
+                overwrite=args.overwrite,
+            )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
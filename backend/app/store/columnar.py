@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.settings import settings
+
+STEP_SECONDS = 300
+PRICE_COLUMNS = ("avg_high", "avg_low")
+VOLUME_COLUMNS = ("high_vol", "low_vol")
+COLUMNS = (*PRICE_COLUMNS, *VOLUME_COLUMNS)
+_FORMAT_VERSION = 1
+# Bucket capacity grows a day at a time; only the price columns need an explicit NaN fill, the rest stay sparse.
+_GROW_BUCKETS = 288
+
+
+@dataclass(frozen=True)
+class WindowView:
+    """
+    Zero-copy item × bucket view of buckets [start_ts, end_ts] (inclusive, 5m-aligned).
+
+    Row r is `item_ids[r]`; the 2D arrays are views into the memory-mapped column files. `traded[r, j]` says
+    whether the item had a row in `item_bucket_5m` for that bucket (prices are NaN and volumes 0 where it did
+    not); `present[j]` says whether the bucket was ingested at all.
+    """
+
+    bucket_ts: np.ndarray
+    item_ids: np.ndarray
+    present: np.ndarray
+    traded: np.ndarray
+    avg_high: np.ndarray
+    high_vol: np.ndarray
+    avg_low: np.ndarray
+    low_vol: np.ndarray
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.present.size) and bool(self.present.all())
+
+    def item_rows(self) -> np.ndarray:
+        """
+        Row indices of items that traded at least once in the window.
+        """
+        return np.nonzero(self.traded.any(axis=1))[0]
+
+    def sparse_series(self, row: int, columns: Iterable[str] = ("avg_low", "low_vol")) -> tuple[np.ndarray, ...]:
+        """
+        (bucket_ts, *columns) restricted to the buckets the item traded in: the row layout `item_bucket_5m`
+        queries produce and the detectors index by.
+        """
+        mask = self.traded[row].view(bool)
+        return (self.bucket_ts[mask], *(getattr(self, c)[row][mask] for c in columns))
+
+
+class ColumnarStore:
+    """
+    Append-only, memory-mapped columnar copy of `item_bucket_5m`.
+
+    Layout under `root`:
+      meta.json          base_ts, capacities and the format version
+      items.i4           int32[item_capacity]: item_id held by each row (-1 = free)
+      present.u1         uint8[bucket_capacity]: bucket j (= base_ts + 300*j) has been written
+      traded.u1          uint8[bucket_capacity, item_capacity]
+      <column>.f8        float64[bucket_capacity, item_capacity] for avg_high, high_vol, avg_low, low_vol
+
+    Files are bucket-major so appending a bucket writes one contiguous stripe and a time window is one
+    contiguous range; readers get the item × bucket layout as transposed views, so slicing a window is pointer
+    arithmetic. Postgres stays the source of truth: buckets older than `base_ts` (the first bucket written) are
+    not stored (rebuild with `--reset` and an earlier `--from` to cover them) and items beyond `item_capacity`
+    are skipped.
+    """
+
+    def __init__(self, root: str | os.PathLike[str], *, item_capacity: int = 8192) -> None:
+        self.root = Path(root)
+        self._default_item_capacity = item_capacity
+        self._lock = threading.Lock()
+        self._meta: dict[str, Any] | None = None
+        self._meta_mtime: float | None = None
+        self._maps: dict[str, np.memmap] = {}
+        self._row_of: dict[int, int] = {}
+
+    @classmethod
+    def from_settings(cls) -> ColumnarStore | None:
+        if not settings.columnar_store_dir:
+            return None
+        return cls(settings.columnar_store_dir, item_capacity=settings.columnar_item_capacity)
+
+    # ---- files -------------------------------------------------------------------
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.root / "meta.json"
+
+    def _write_meta(self, meta: dict[str, Any]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".meta-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        # One writer at a time across processes (e.g. several uvicorn workers ingesting).
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.root / ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._refresh(force=True)
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self, *, force: bool = False) -> bool:
+        """
+        (Re)map the files if another process changed meta.json. Returns False if the store does not exist yet.
+        """
+        try:
+            mtime = self._meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._meta, self._maps, self._row_of = None, {}, {}
+            return False
+        if not force and self._meta is not None and mtime == self._meta_mtime:
+            return True
+        meta = json.loads(self._meta_path.read_text())
+        if meta.get("version") != _FORMAT_VERSION:
+            raise RuntimeError(f"unsupported columnar store version {meta.get('version')!r} in {self.root}")
+        if self._meta is None or meta["bucket_capacity"] != self._meta["bucket_capacity"] or not self._maps:
+            self._maps = self._open_maps(meta)
+        self._meta, self._meta_mtime = meta, mtime
+        items = self._maps["items"]
+        self._row_of = {int(item_id): r for r, item_id in enumerate(items.tolist()) if item_id >= 0}
+        return True
+
+    def _open_maps(self, meta: dict[str, Any]) -> dict[str, np.memmap]:
+        shape = (meta["bucket_capacity"], meta["item_capacity"])
+        maps = {
+            "items": np.memmap(self.root / "items.i4", dtype="int32", mode="r+", shape=(meta["item_capacity"],)),
+            "present": np.memmap(self.root / "present.u1", dtype="uint8", mode="r+", shape=(meta["bucket_capacity"],)),
+            "traded": np.memmap(self.root / "traded.u1", dtype="uint8", mode="r+", shape=shape),
+        }
+        for c in COLUMNS:
+            maps[c] = np.memmap(self.root / f"{c}.f8", dtype="float64", mode="r+", shape=shape)
+        return maps
+
+    def _create(self, base_ts: int) -> None:
+        meta = {
+            "version": _FORMAT_VERSION,
+            "base_ts": int(base_ts),
+            "step_seconds": STEP_SECONDS,
+            "item_capacity": int(self._default_item_capacity),
+            "bucket_capacity": 0,
+        }
+        np.full(meta["item_capacity"], -1, dtype="int32").tofile(self.root / "items.i4")
+        for name in ("present.u1", "traded.u1", *(f"{c}.f8" for c in COLUMNS)):
+            (self.root / name).touch()
+        self._grow(meta, _GROW_BUCKETS)
+        self._write_meta(meta)
+        self._refresh(force=True)
+
+    def _grow(self, meta: dict[str, Any], bucket_capacity: int) -> None:
+        old, items = meta["bucket_capacity"], meta["item_capacity"]
+        self._maps = {}  # drop mappings before resizing the files under them
+        os.truncate(self.root / "present.u1", bucket_capacity)
+        os.truncate(self.root / "traded.u1", bucket_capacity * items)
+        for c in COLUMNS:
+            path = self.root / f"{c}.f8"
+            os.truncate(path, bucket_capacity * items * 8)
+            if c in PRICE_COLUMNS:
+                mm = np.memmap(path, dtype="float64", mode="r+", shape=(bucket_capacity, items))
+                mm[old:] = np.nan
+                mm.flush()
+                del mm
+        meta["bucket_capacity"] = bucket_capacity
+
+    # ---- writes ------------------------------------------------------------------
+
+    def write_bucket(self, bucket_ts: int, rows: Iterable[Mapping[str, Any]]) -> dict[str, int]:
+        """
+        Store one ingested 5m bucket (rows shaped like `item_bucket_5m` inserts). Rewriting a bucket replaces it.
+        """
+        with self._write_lock():
+            if self._meta is None:
+                self._create(bucket_ts)
+            meta = self._meta
+            assert meta is not None
+            j, rem = divmod(int(bucket_ts) - meta["base_ts"], STEP_SECONDS)
+            if rem or j < 0:
+                return {"written": 0, "skipped": 0, "before_base": 1}
+            if j >= meta["bucket_capacity"]:
+                self._grow(meta, (j // _GROW_BUCKETS + 1) * _GROW_BUCKETS)
+                self._write_meta(meta)
+                self._refresh(force=True)
+                meta = self._meta
+                assert meta is not None
+
+            m = self._maps
+            rows = list(rows)
+            new_items = sorted({int(r["item_id"]) for r in rows} - self._row_of.keys())
+            free = np.nonzero(m["items"] < 0)[0][: len(new_items)]
+            for item_id, r in zip(new_items, free.tolist()):
+                m["items"][r] = item_id
+                self._row_of[item_id] = r
+
+            idx, vals, skipped = [], {c: [] for c in COLUMNS}, 0
+            for r in rows:
+                row = self._row_of.get(int(r["item_id"]))
+                if row is None:
+                    skipped += 1
+                    continue
+                idx.append(row)
+                for c in COLUMNS:
+                    v = r.get(c)
+                    vals[c].append(np.nan if v is None else float(v))
+
+            m["traded"][j] = 0
+            for c in COLUMNS:
+                m[c][j] = np.nan if c in PRICE_COLUMNS else 0.0
+            if idx:
+                ix = np.asarray(idx, dtype="int64")
+                m["traded"][j, ix] = 1
+                for c in COLUMNS:
+                    m[c][j, ix] = np.asarray(vals[c], dtype="float64")
+            for mm in m.values():
+                mm.flush()
+            # Mark the bucket readable last so readers never see a half-written stripe as present.
+            m["present"][j] = 1
+            m["present"].flush()
+            self._write_meta(meta)  # bump mtime so other processes pick up new items
+            return {"written": len(idx), "skipped": skipped, "before_base": 0}
+
+    def reset(self) -> None:
+        with self._write_lock():
+            self._maps = {}
+            for name in ("meta.json", "items.i4", "present.u1", "traded.u1", *(f"{c}.f8" for c in COLUMNS)):
+                (self.root / name).unlink(missing_ok=True)
+            self._refresh(force=True)
+
+    # ---- reads -------------------------------------------------------------------
+
+    def row(self, item_id: int) -> int | None:
+        self._refresh()
+        return self._row_of.get(int(item_id))
+
+    def window(self, start_ts: int, end_ts: int) -> WindowView | None:
+        """
+        Item × bucket views over [start_ts, end_ts]; None if the store does not span that range yet.
+        """
+        if not self._refresh():
+            return None
+        meta, m = self._meta, self._maps
+        assert meta is not None
+        j0 = (int(start_ts) - meta["base_ts"]) // STEP_SECONDS
+        j1 = (int(end_ts) - meta["base_ts"]) // STEP_SECONDS + 1
+        if j0 < 0 or j1 <= j0 or j1 > meta["bucket_capacity"]:
+            return None
+        return WindowView(
+            bucket_ts=meta["base_ts"] + STEP_SECONDS * np.arange(j0, j1, dtype="int64"),
+            item_ids=np.asarray(m["items"]),
+            present=np.asarray(m["present"][j0:j1]).view(bool),
+            traded=np.asarray(m["traded"][j0:j1]).T,
+            **{c: np.asarray(m[c][j0:j1]).T for c in COLUMNS},
+        )
+
+    def complete_window(self, bucket_ts_list: list[int]) -> WindowView | None:
+        """
+        View over the contiguous 5m range covering `bucket_ts_list`, only if every bucket in it is stored.
+        """
+        if not bucket_ts_list:
+            return None
+        view = self.window(min(bucket_ts_list), max(bucket_ts_list))
+        if view is None or not view.complete or view.bucket_ts.size != len(bucket_ts_list):
+            return None
+        return view
+
+
+_store: ColumnarStore | None = None
+_store_loaded = False
+
+
+def get_store() -> ColumnarStore | None:
+    """
+    Process-wide store configured by COLUMNAR_STORE_DIR (None when disabled).
+    """
+    global _store, _store_loaded
+    if not _store_loaded:
+        _store, _store_loaded = ColumnarStore.from_settings(), True
+    return _store
+
+
+def rebuild_from_db(store: ColumnarStore, *, from_ts: int, to_ts: int, reset: bool = False) -> dict[str, int]:
+    """
+    Populate the store from `item_bucket_5m` for every ingested bucket in [from_ts, to_ts], oldest first.
+    With `reset`, existing store files are removed first so `from_ts` becomes the new base.
+    """
+    if reset:
+        store.reset()
+    from sqlalchemy import select
+
+    from app.db.models import Bucket5m, ItemBucket5m
+    from app.db.session import SessionLocal
+
+    buckets = written = 0
+    with SessionLocal() as db:
+        bucket_ts_list = db.execute(
+            select(Bucket5m.bucket_ts).where(Bucket5m.bucket_ts.between(from_ts, to_ts)).order_by(Bucket5m.bucket_ts)
+        ).scalars().all()
+        for ts in bucket_ts_list:
+            rows = db.execute(
+                select(
+                    ItemBucket5m.item_id,
+                    ItemBucket5m.avg_high,
+                    ItemBucket5m.high_vol,
+                    ItemBucket5m.avg_low,
+                    ItemBucket5m.low_vol,
+                ).where(ItemBucket5m.bucket_ts == ts)
+            ).mappings().all()
+            written += store.write_bucket(int(ts), rows)["written"]
+            buckets += 1
+    return {"buckets": buckets, "rows": written}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Rebuild the memory-mapped 5m columnar store from Postgres.")
+    p.add_argument("--from", dest="from_ts", type=int, required=True, help="First bucket_ts (unix seconds).")
+    p.add_argument("--to", dest="to_ts", type=int, required=True, help="Last bucket_ts (unix seconds).")
+    p.add_argument("--reset", action="store_true", help="Drop the existing store first (needed to move its base earlier).")
+    p.add_argument("--dir", default=None, help="Store directory (defaults to COLUMNAR_STORE_DIR).")
+    args = p.parse_args()
+
+    root = args.dir or settings.columnar_store_dir
+    if not root:
+        p.error("set COLUMNAR_STORE_DIR or pass --dir")
+    store = ColumnarStore(root, item_capacity=settings.columnar_item_capacity)
+    print(json.dumps(rebuild_from_db(store, from_ts=args.from_ts, to_ts=args.to_ts, reset=args.reset)))
+
+
+if __name__ == "__main__":
+    main()
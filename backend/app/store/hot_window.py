@@ -0,0 +1,485 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.change_feed import BUCKET_5M, subscribe
+from app.core.metrics import stage
+from app.core.settings import settings
+from app.store.columnar import COLUMNS, PRICE_COLUMNS, STEP_SECONDS, WindowView, get_store
+
+log = logging.getLogger(__name__)
+
+_MAGIC = 0x52534857  # "RSHW"
+_FORMAT_VERSION = 1
+# Header slots (int64). `generation` is a seqlock counter: odd while the writer is mid-update.
+_H_MAGIC, _H_VERSION, _H_GENERATION, _H_CAP_BUCKETS, _H_ITEM_CAPACITY, _H_N_ITEMS, _H_END_INDEX = range(7)
+_HEADER_SLOTS = 16
+# Buckets kept beyond `hot_window_hours`, so a window being read is not overwritten by the next few appends.
+_SLACK_BUCKETS = 24
+
+
+def _layout(cap_buckets: int, item_capacity: int) -> tuple[dict[str, tuple[int, tuple[int, ...], str]], int]:
+    """
+    Byte offsets of every array in the segment. Bucket-indexed arrays have 2*cap_buckets rows: bucket j lives
+    at rows j % cap and j % cap + cap, so any window of up to `cap` buckets is one contiguous slice.
+    """
+    rows = 2 * cap_buckets
+    arrays = [
+        ("header", (_HEADER_SLOTS,), "int64"),
+        ("items", (item_capacity,), "int32"),
+        ("row_bucket", (rows,), "int64"),
+        *((c, (rows, item_capacity), "float64") for c in COLUMNS),
+        ("traded", (rows, item_capacity), "uint8"),
+    ]
+    out: dict[str, tuple[int, tuple[int, ...], str]] = {}
+    offset = 0
+    for name, shape, dtype in arrays:
+        offset = (offset + 63) // 64 * 64
+        out[name] = (offset, shape, dtype)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return out, offset
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    # The segment outlives any one worker; don't let the resource tracker unlink it when this process exits.
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+
+
+class HotWindow:
+    """
+    The latest `cap_buckets` 5m buckets for every item, in one named shared-memory segment.
+
+    One process at a time (the holder of the updater lock, see `run_updater`) writes; every other worker
+    attaches read-only and slices zero-copy `WindowView`s out of it. Readers pair each view with the
+    header generation and re-check it after copying what they need (`unchanged_since`).
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, *, writable: bool) -> None:
+        self._shm = shm
+        self.writable = writable
+        header = np.ndarray((_HEADER_SLOTS,), dtype="int64", buffer=shm.buf)
+        if header[_H_MAGIC] != _MAGIC or header[_H_VERSION] != _FORMAT_VERSION:
+            raise RuntimeError(f"shared memory segment {shm.name} is not a version {_FORMAT_VERSION} hot window")
+        self.cap_buckets = int(header[_H_CAP_BUCKETS])
+        self.item_capacity = int(header[_H_ITEM_CAPACITY])
+        layout, _ = _layout(self.cap_buckets, self.item_capacity)
+        self._a: dict[str, np.ndarray] = {}
+        for name, (offset, shape, dtype) in layout.items():
+            arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            if not writable and name != "header":
+                arr.flags.writeable = False
+            self._a[name] = arr
+        self._header = self._a["header"]
+        self._n_items_seen = -1
+        self._row_of: dict[int, int] = {}
+        self._write_lock = threading.Lock()  # ingest (event loop) and the DB poll (thread) both write
+
+    @classmethod
+    def attach(cls, name: str) -> HotWindow | None:
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return None
+        _untrack(shm)
+        return cls(shm, writable=False)
+
+    @classmethod
+    def open_for_writing(cls, name: str, *, cap_buckets: int, item_capacity: int) -> HotWindow:
+        """
+        Attach to the segment for writing, (re)creating it if it is missing or has a different shape.
+        """
+        _, size = _layout(cap_buckets, item_capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+            _untrack(shm)
+            header = np.ndarray((_HEADER_SLOTS,), dtype="int64", buffer=shm.buf)
+            same = (
+                header[_H_MAGIC] == _MAGIC
+                and header[_H_VERSION] == _FORMAT_VERSION
+                and header[_H_CAP_BUCKETS] == cap_buckets
+                and header[_H_ITEM_CAPACITY] == item_capacity
+            )
+            del header
+            if same:
+                return cls(shm, writable=True)
+            # Readers still mapping the old segment keep a valid (but frozen) copy until they re-attach.
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _untrack(shm)
+        layout, _ = _layout(cap_buckets, item_capacity)
+        header = np.ndarray((_HEADER_SLOTS,), dtype="int64", buffer=shm.buf)
+        header[:] = 0
+        header[_H_CAP_BUCKETS], header[_H_ITEM_CAPACITY], header[_H_END_INDEX] = cap_buckets, item_capacity, -1
+        np.ndarray(layout["items"][1], dtype="int32", buffer=shm.buf, offset=layout["items"][0])[:] = -1
+        np.ndarray(layout["row_bucket"][1], dtype="int64", buffer=shm.buf, offset=layout["row_bucket"][0])[:] = -1
+        header[_H_VERSION] = _FORMAT_VERSION
+        header[_H_MAGIC] = _MAGIC  # last: marks the segment initialised
+        del header
+        return cls(shm, writable=True)
+
+    def close(self) -> None:
+        self._a = {}
+        self._header = None  # type: ignore[assignment]
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # a caller still holds a view; the mapping goes away with it
+
+    # ---- header ------------------------------------------------------------------
+
+    @property
+    def generation(self) -> int:
+        return int(self._header[_H_GENERATION])
+
+    @property
+    def end_ts(self) -> int | None:
+        end = int(self._header[_H_END_INDEX])
+        return end * STEP_SECONDS if end >= 0 else None
+
+    def unchanged_since(self, generation: int) -> bool:
+        return self.generation == generation
+
+    def _items(self) -> dict[int, int]:
+        n = int(self._header[_H_N_ITEMS])
+        if n != self._n_items_seen:
+            self._row_of = {int(item_id): r for r, item_id in enumerate(self._a["items"][:n].tolist())}
+            self._n_items_seen = n
+        return self._row_of
+
+    def has_bucket(self, bucket_ts: int) -> bool:
+        j = int(bucket_ts) // STEP_SECONDS
+        return int(self._a["row_bucket"][j % self.cap_buckets]) == j
+
+    # ---- reads -------------------------------------------------------------------
+
+    def window(self, bucket_ts_list: Sequence[int]) -> tuple[WindowView, int] | None:
+        """
+        (view, generation) over the contiguous 5m range covering `bucket_ts_list`, or None if any bucket in it is
+        not held (or an update is in progress).
+        """
+        if not bucket_ts_list:
+            return None
+        generation = self.generation
+        if generation % 2:
+            return None
+        j0, j1 = min(bucket_ts_list) // STEP_SECONDS, max(bucket_ts_list) // STEP_SECONDS
+        n = j1 - j0 + 1
+        if n != len(bucket_ts_list) or n > self.cap_buckets - _SLACK_BUCKETS:
+            return None
+        r0 = j0 % self.cap_buckets
+        rows = slice(r0, r0 + n)
+        expected = np.arange(j0, j1 + 1, dtype="int64")
+        present = self._a["row_bucket"][rows] == expected
+        if not present.all():
+            return None
+        a = self._a
+        view = WindowView(
+            bucket_ts=expected * STEP_SECONDS,
+            item_ids=a["items"],
+            present=present,
+            traded=a["traded"][rows].T,
+            **{c: a[c][rows].T for c in COLUMNS},
+        )
+        return view, generation
+
+    # ---- writes ------------------------------------------------------------------
+
+    def write_bucket(self, bucket_ts: int, rows: Iterable[Mapping[str, Any]]) -> int:
+        if not self.writable:
+            raise RuntimeError("hot window is attached read-only")
+        with self._write_lock:
+            return self._write_bucket(bucket_ts, rows)
+
+    def _write_bucket(self, bucket_ts: int, rows: Iterable[Mapping[str, Any]]) -> int:
+        j = int(bucket_ts) // STEP_SECONDS
+        end = int(self._header[_H_END_INDEX])
+        if end >= 0 and j <= end - self.cap_buckets:
+            return 0  # older than anything the window holds
+
+        a = self._a
+        row_of = self._items()
+        rows = list(rows)
+        idx: list[int] = []
+        vals: dict[str, list[float]] = {c: [] for c in COLUMNS}
+        n_items = int(self._header[_H_N_ITEMS])
+        for r in rows:
+            item_id = int(r["item_id"])
+            row = row_of.get(item_id)
+            if row is None:
+                if n_items >= self.item_capacity:
+                    continue
+                row = n_items
+                a["items"][row] = item_id
+                row_of[item_id] = row
+                n_items += 1
+            idx.append(row)
+            for c in COLUMNS:
+                v = r.get(c)
+                vals[c].append(np.nan if v is None else float(v))
+        self._header[_H_N_ITEMS] = n_items
+        self._n_items_seen = n_items
+
+        self._header[_H_GENERATION] += 1  # odd: update in progress
+        try:
+            ix = np.asarray(idx, dtype="int64")
+            for stripe in (j % self.cap_buckets, j % self.cap_buckets + self.cap_buckets):
+                a["row_bucket"][stripe] = -1
+                a["traded"][stripe] = 0
+                for c in COLUMNS:
+                    a[c][stripe] = np.nan if c in PRICE_COLUMNS else 0.0
+                if idx:
+                    a["traded"][stripe, ix] = 1
+                    for c in COLUMNS:
+                        a[c][stripe, ix] = vals[c]
+                a["row_bucket"][stripe] = j
+            if j > end:
+                self._header[_H_END_INDEX] = j
+        finally:
+            self._header[_H_GENERATION] += 1
+        return len(idx)
+
+    # ---- snapshots ---------------------------------------------------------------
+
+    def save_snapshot(self, path: str) -> int:
+        """
+        Write the held buckets to `path` (.npz, replaced atomically) so a restarted deployment can restore the
+        window instead of re-reading it from Postgres. Returns the number of buckets written.
+        """
+        with self._write_lock:
+            n = int(self._header[_H_N_ITEMS])
+            rows = np.nonzero(self._a["row_bucket"][: self.cap_buckets] >= 0)[0]
+            data = {
+                "items": self._a["items"][:n].copy(),
+                "bucket_index": self._a["row_bucket"][rows],
+                "traded": self._a["traded"][rows, :n],
+                **{c: self._a[c][rows, :n] for c in COLUMNS},
+            }
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.savez(f, **data)
+        os.replace(tmp, path)
+        return int(rows.size)
+
+    def restore_snapshot(self, path: str) -> int:
+        """
+        Fill an empty window from a snapshot, keeping the buckets that still fall inside it; the updater's next
+        sync then only reads the gap since the snapshot. Returns the number of buckets restored.
+        """
+        if not self.writable:
+            raise RuntimeError("hot window is attached read-only")
+        try:
+            with np.load(path) as snap:
+                data = {k: snap[k] for k in snap.files}
+        except FileNotFoundError:
+            return 0
+        with self._write_lock:
+            if int(self._header[_H_N_ITEMS]) or int(self._header[_H_END_INDEX]) >= 0:
+                return 0  # the segment outlived the previous writer and already holds data
+            n = min(int(data["items"].size), self.item_capacity)
+            now_j = int(time.time()) // STEP_SECONDS
+            keep = data["bucket_index"] > now_j - (self.cap_buckets - _SLACK_BUCKETS)
+            bucket_index = data["bucket_index"][keep]
+            if bucket_index.size == 0:
+                return 0
+            a = self._a
+            self._header[_H_GENERATION] += 1
+            try:
+                a["items"][:n] = data["items"][:n]
+                for stripes in (bucket_index % self.cap_buckets, bucket_index % self.cap_buckets + self.cap_buckets):
+                    a["traded"][stripes] = 0
+                    a["traded"][stripes, :n] = data["traded"][keep, :n]
+                    for c in COLUMNS:
+                        a[c][stripes] = np.nan if c in PRICE_COLUMNS else 0.0
+                        a[c][stripes, :n] = data[c][keep, :n]
+                    a["row_bucket"][stripes] = bucket_index
+                self._header[_H_N_ITEMS] = n
+                self._header[_H_END_INDEX] = int(bucket_index.max())
+                self._n_items_seen = -1
+            finally:
+                self._header[_H_GENERATION] += 1
+        return int(bucket_index.size)
+
+
+# ---- process-wide handles ---------------------------------------------------------
+
+_reader: HotWindow | None = None
+_reader_checked_at = 0.0
+_writer: HotWindow | None = None
+
+
+def cap_buckets_from_settings() -> int:
+    return settings.hot_window_hours * 12 + _SLACK_BUCKETS
+
+
+def get_hot_window() -> HotWindow | None:
+    """
+    This process's view of the shared hot window (the writer's own handle in the updater process), or None
+    when disabled or not published yet. Attaching is retried at most every few seconds.
+    """
+    global _reader, _reader_checked_at
+    if not settings.hot_window_name:
+        return None
+    if _writer is not None:
+        return _writer
+    if _reader is None and time.monotonic() - _reader_checked_at > 5.0:
+        _reader_checked_at = time.monotonic()
+        _reader = HotWindow.attach(settings.hot_window_name)
+    return _reader
+
+
+def publish_bucket(bucket_ts: int, rows: Iterable[Mapping[str, Any]]) -> None:
+    """
+    Called by ingest after a bucket commits. Only the updater process writes; the others' buckets are picked up
+    by its next poll of `bucket_5m`.
+    """
+    if _writer is not None:
+        _writer.write_bucket(bucket_ts, rows)
+
+
+def _wanted_rows(view: WindowView, item_ids: Collection[int] | None) -> list[int]:
+    rows = view.item_rows()
+    if item_ids is None:
+        return rows
+    return [r for r in rows if int(view.item_ids[r]) in item_ids]
+
+
+def load_sparse_window(
+    bucket_ts_list: Sequence[int],
+    columns: Sequence[str],
+    item_ids: Collection[int] | None = None,
+) -> dict[int, tuple[np.ndarray, ...]] | None:
+    """
+    Per item, (bucket_ts, *columns) over the window restricted to the buckets the item traded in, read from the
+    shared hot window or else the columnar store. None if neither holds the whole window (read Postgres).
+    With `item_ids`, only those items are sliced out.
+    """
+    hot = get_hot_window()
+    if hot is not None:
+        for _ in range(3):
+            got = hot.window(bucket_ts_list)
+            if got is None:
+                break
+            view, generation = got
+            with stage("load_hot_window") as st:
+                out = {int(view.item_ids[r]): view.sparse_series(r, columns) for r in _wanted_rows(view, item_ids)}
+                st.rows = len(out)
+            if hot.unchanged_since(generation):
+                return out
+
+    store = get_store()
+    view = store.complete_window(list(bucket_ts_list)) if store is not None else None
+    if view is not None:
+        with stage("load_columnar") as st:
+            out = {int(view.item_ids[r]): view.sparse_series(r, columns) for r in _wanted_rows(view, item_ids)}
+            st.rows = len(out)
+        return out
+    return None
+
+
+# ---- updater ----------------------------------------------------------------------
+
+
+def _sync_from_db(hot: HotWindow) -> int:
+    """
+    Copy every ingested bucket in the window's time range that the segment does not hold yet.
+    """
+    from app.db.models import Bucket5m, ItemBucket5m
+    from app.db.session import SessionLocal
+
+    now = int(time.time())
+    lo = now - now % STEP_SECONDS - (hot.cap_buckets - _SLACK_BUCKETS) * STEP_SECONDS
+    written = 0
+    with SessionLocal() as db:
+        known = db.execute(select(Bucket5m.bucket_ts).where(Bucket5m.bucket_ts > lo).order_by(Bucket5m.bucket_ts)).scalars().all()
+        for ts in known:
+            if hot.has_bucket(int(ts)):
+                continue
+            rows = db.execute(
+                select(
+                    ItemBucket5m.item_id,
+                    ItemBucket5m.avg_high,
+                    ItemBucket5m.high_vol,
+                    ItemBucket5m.avg_low,
+                    ItemBucket5m.low_vol,
+                ).where(ItemBucket5m.bucket_ts == ts)
+            ).mappings().all()
+            hot.write_bucket(int(ts), rows)
+            written += 1
+    return written
+
+
+async def run_updater(stop: asyncio.Event) -> None:
+    """
+    Background task run by every worker: whichever one takes the (non-blocking) updater lock becomes the single
+    writer, fills the segment (from the snapshot file if configured, then Postgres) and keeps polling
+    `bucket_5m` (immediately when the change feed announces a new bucket), saving a snapshot every
+    `hot_window_snapshot_seconds` and on shutdown. If it dies the lock is released and another worker takes
+    over on its next poll.
+    """
+    global _writer
+    name = settings.hot_window_name
+    assert name
+    # A bucket committed by any process (see app/core/change_feed.py) wakes the poll immediately.
+    wake = asyncio.Event()
+    subscribe(BUCKET_5M, lambda _event: wake.set())
+    lock_path = os.path.join(tempfile.gettempdir(), f"{name}.updater.lock")
+    snapshot_path = settings.hot_window_snapshot_path
+    saved_at = time.monotonic()
+    with open(lock_path, "w") as lock:
+        try:
+            while not stop.is_set():
+                try:
+                    if _writer is None:
+                        try:
+                            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            pass
+                        else:
+                            _writer = HotWindow.open_for_writing(
+                                name, cap_buckets=cap_buckets_from_settings(), item_capacity=settings.hot_window_items
+                            )
+                            log.info("hot window updater: pid %s owns %s", os.getpid(), name)
+                            if snapshot_path:
+                                restored = await asyncio.to_thread(_writer.restore_snapshot, snapshot_path)
+                                log.info("hot window updater: restored %s buckets from %s", restored, snapshot_path)
+                                saved_at = time.monotonic()
+                    if _writer is not None:
+                        await asyncio.to_thread(_sync_from_db, _writer)
+                        if snapshot_path and time.monotonic() - saved_at >= settings.hot_window_snapshot_seconds:
+                            await asyncio.to_thread(_writer.save_snapshot, snapshot_path)
+                            saved_at = time.monotonic()
+                except Exception:
+                    log.exception("hot window updater iteration failed")
+                waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(wake.wait())]
+                _, pending = await asyncio.wait(waiters, timeout=settings.hot_window_poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+                for w in pending:
+                    w.cancel()
+                wake.clear()
+        finally:
+            if _writer is not None:
+                if snapshot_path:
+                    try:
+                        _writer.save_snapshot(snapshot_path)
+                    except Exception:
+                        log.exception("hot window updater: snapshot on shutdown failed")
+                _writer.close()
+                _writer = None
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.metrics import stage
+from app.db.models import Bucket5m, ItemBucket5m
+from app.db.queries import ts_in
+from app.scan.kernels import _nanmedian_rows
+from app.store.columnar import WindowView, get_store
+from app.store.hot_window import get_hot_window
+
+STEP_SECONDS = 300
+WINDOW_BUCKETS = 288
+_COLUMNS = ("item_id", "avg_high", "high_vol", "avg_low", "low_vol")
+_DTYPES = {"item_id": "int64", "avg_high": "float64", "high_vol": "float64", "avg_low": "float64", "low_vol": "float64"}
+# Catch up bucket by bucket when at most this far behind; otherwise rebuild the whole day in one query.
+_MAX_CATCH_UP = 12
+
+
+@dataclass(frozen=True)
+class Summary:
+    """
+    Per-item figures over the 288 buckets ending at `as_of` (inclusive), for every item that traded in them.
+
+    `daily_volume_24h` is low + high volume and `median_mid` the median of (avg_low + avg_high) / 2 over buckets
+    with both prices, None-equivalent (NaN) below 3 such buckets: exactly what the spreads scan computes.
+    """
+
+    as_of: int
+    item_ids: np.ndarray
+    low_vol_24h: np.ndarray
+    daily_volume_24h: np.ndarray
+    trade_buckets_24h: np.ndarray
+    last_price: np.ndarray
+    median_mid: np.ndarray
+
+
+class SummaryIndex:
+    """
+    Rolling 24h per-item summary kept in process memory and updated one bucket at a time.
+
+    Each item row keeps a 288-slot ring (slot = bucket index % 288) of the inputs the summary needs, plus running
+    volume and trade-count sums that are adjusted as a bucket enters or overwrites a slot. Ingest feeds buckets
+    in (`apply_bucket`); `snapshot` catches up on buckets other processes ingested before answering.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.as_of: int | None = None
+        self._slot_ts = np.full(WINDOW_BUCKETS, -1, dtype="int64")
+        self._row_of: dict[int, int] = {}
+        self._item_ids = np.empty(0, dtype="int64")
+        self._low_vol = np.zeros((0, WINDOW_BUCKETS))
+        self._high_vol = np.zeros((0, WINDOW_BUCKETS))
+        self._avg_low = np.full((0, WINDOW_BUCKETS), np.nan)
+        self._mid = np.full((0, WINDOW_BUCKETS), np.nan)
+        self._traded = np.zeros((0, WINDOW_BUCKETS), dtype=bool)
+        self._sum_low = np.zeros(0)
+        self._sum_high = np.zeros(0)
+        self._count = np.zeros(0, dtype="int64")
+        self._cached: Summary | None = None
+
+    def _rows_for(self, item_ids: Iterable[int]) -> np.ndarray:
+        new = [i for i in dict.fromkeys(item_ids) if i not in self._row_of]
+        if new:
+            n_old = self._item_ids.size
+            for k, item_id in enumerate(new):
+                self._row_of[item_id] = n_old + k
+            add = len(new)
+            self._item_ids = np.concatenate((self._item_ids, np.asarray(new, dtype="int64")))
+            self._low_vol = np.vstack((self._low_vol, np.zeros((add, WINDOW_BUCKETS))))
+            self._high_vol = np.vstack((self._high_vol, np.zeros((add, WINDOW_BUCKETS))))
+            self._avg_low = np.vstack((self._avg_low, np.full((add, WINDOW_BUCKETS), np.nan)))
+            self._mid = np.vstack((self._mid, np.full((add, WINDOW_BUCKETS), np.nan)))
+            self._traded = np.vstack((self._traded, np.zeros((add, WINDOW_BUCKETS), dtype=bool)))
+            self._sum_low = np.concatenate((self._sum_low, np.zeros(add)))
+            self._sum_high = np.concatenate((self._sum_high, np.zeros(add)))
+            self._count = np.concatenate((self._count, np.zeros(add, dtype="int64")))
+        return np.asarray([self._row_of[i] for i in item_ids], dtype="int64")
+
+    def _clear_slot(self, slot: int) -> None:
+        self._sum_low -= self._low_vol[:, slot]
+        self._sum_high -= self._high_vol[:, slot]
+        self._count -= self._traded[:, slot]
+        self._low_vol[:, slot] = 0.0
+        self._high_vol[:, slot] = 0.0
+        self._avg_low[:, slot] = np.nan
+        self._mid[:, slot] = np.nan
+        self._traded[:, slot] = False
+        self._slot_ts[slot] = -1
+
+    def _apply(self, bucket_ts: int, cols: dict[str, np.ndarray]) -> None:
+        if self.as_of is not None:
+            if bucket_ts <= self.as_of - WINDOW_BUCKETS * STEP_SECONDS:
+                return  # already out of the window
+            if bucket_ts > self.as_of:
+                # Slots between the old end and the new bucket now belong to buckets not (yet) seen.
+                for ts in range(max(self.as_of + STEP_SECONDS, bucket_ts - (WINDOW_BUCKETS - 1) * STEP_SECONDS), bucket_ts, STEP_SECONDS):
+                    self._clear_slot((ts // STEP_SECONDS) % WINDOW_BUCKETS)
+        slot = (bucket_ts // STEP_SECONDS) % WINDOW_BUCKETS
+        self._clear_slot(slot)
+        if cols["item_id"].size:
+            ix = self._rows_for(cols["item_id"].tolist())
+            self._low_vol[ix, slot] = cols["low_vol"]
+            self._high_vol[ix, slot] = cols["high_vol"]
+            self._avg_low[ix, slot] = cols["avg_low"]
+            self._mid[ix, slot] = (cols["avg_low"] + cols["avg_high"]) / 2.0  # NaN unless both sides traded
+            self._traded[ix, slot] = True
+            self._sum_low[ix] += cols["low_vol"]
+            self._sum_high[ix] += cols["high_vol"]
+            self._count[ix] += 1
+        self._slot_ts[slot] = bucket_ts
+        if self.as_of is None or bucket_ts > self.as_of:
+            self.as_of = bucket_ts
+        self._cached = None
+
+    def apply_bucket(self, bucket_ts: int, rows: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Fold one ingested bucket (rows shaped like `item_bucket_5m` inserts) into the index.
+        """
+        with self._lock:
+            if self.as_of is None:
+                return  # not built yet; the first snapshot() loads the whole day
+            rows = list(rows)
+            cols = {c: np.array([r.get(c) for r in rows], dtype=_DTYPES[c]) for c in _COLUMNS}
+            self._apply(int(bucket_ts), cols)
+
+    # ---- reads -------------------------------------------------------------------
+
+    def _expected(self, now: int) -> np.ndarray:
+        return now - STEP_SECONDS * np.arange(WINDOW_BUCKETS - 1, -1, -1, dtype="int64")
+
+    def _missing(self, now: int) -> list[int]:
+        expected = self._expected(now)
+        held = self._slot_ts[(expected // STEP_SECONDS) % WINDOW_BUCKETS]
+        return expected[held != expected].tolist()
+
+    def _load(self, db: Session, bucket_ts_list: list[int]) -> None:
+        ingested = db.execute(select(Bucket5m.bucket_ts).where(ts_in(Bucket5m.bucket_ts, bucket_ts_list, step=STEP_SECONDS))).scalars().all()
+        if not ingested:
+            return
+        rows = db.connection().execute(
+            select(ItemBucket5m.bucket_ts, *(getattr(ItemBucket5m, c) for c in _COLUMNS)).where(
+                ts_in(ItemBucket5m.bucket_ts, ingested, step=STEP_SECONDS)
+            )
+        ).all()
+        if rows:
+            # Column-wise conversion (None -> NaN); Row objects straight into numpy are much slower.
+            cols = dict(zip(("bucket_ts", *_COLUMNS), zip(*rows)))
+            data = {c: np.array(cols[c], dtype=_DTYPES[c]) for c in _COLUMNS}
+            bucket_ts = np.array(cols["bucket_ts"], dtype="int64")
+        else:
+            data, bucket_ts = {c: np.empty(0, dtype=_DTYPES[c]) for c in _COLUMNS}, np.empty(0, dtype="int64")
+        order = np.argsort(bucket_ts, kind="stable")
+        bucket_ts = bucket_ts[order]
+        data = {c: v[order] for c, v in data.items()}
+        for ts in sorted(int(t) for t in ingested):
+            lo, hi = np.searchsorted(bucket_ts, [ts, ts + 1])
+            self._apply(ts, {c: v[lo:hi] for c, v in data.items()})
+
+    def _apply_view(self, view: WindowView) -> None:
+        for k, ts in enumerate(view.bucket_ts.tolist()):
+            if not view.present[k]:
+                continue
+            rows = np.nonzero(view.traded[:, k])[0]
+            cols = {c: getattr(view, c)[rows, k] for c in _COLUMNS if c != "item_id"}
+            self._apply(int(ts), {"item_id": view.item_ids[rows].astype("int64"), **cols})
+
+    def _load_from_store(self, bucket_ts_list: list[int]) -> bool:
+        """
+        Rebuild from the shared hot window or the columnar store when either holds the whole day: a slice of
+        arrays already in memory instead of a day of rows through Postgres.
+        """
+        hot = get_hot_window()
+        got = hot.window(bucket_ts_list) if hot is not None else None
+        if got is not None:
+            view, generation = got
+            self._apply_view(view)
+            if hot.unchanged_since(generation):
+                return True
+            self._reset()  # the writer changed the window while we copied it
+        store = get_store()
+        view = store.complete_window(bucket_ts_list) if store is not None else None
+        if view is None:
+            return False
+        self._apply_view(view)
+        return True
+
+    def snapshot(self, db: Session, now: int) -> Summary | None:
+        """
+        Summary for the day ending at bucket `now`, or None if some bucket of that day has not been ingested.
+        """
+        with self._lock:
+            if self.as_of is None or now - self.as_of > _MAX_CATCH_UP * STEP_SECONDS or now < self.as_of:
+                with stage("summary_rebuild") as st:
+                    self._reset()
+                    expected = self._expected(now).tolist()
+                    if not self._load_from_store(expected):
+                        self._load(db, expected)
+                    st.rows = int(self._item_ids.size)
+            else:
+                missing = self._missing(now)
+                if missing:
+                    with stage("summary_catch_up") as st:
+                        self._load(db, missing)
+                        st.rows = len(missing)
+            if self.as_of != now or self._missing(now):
+                return None
+            if self._cached is None:
+                self._cached = self._summarize()
+            return self._cached
+
+    def volumes_24h(self) -> tuple[int | None, np.ndarray, np.ndarray]:
+        """
+        (as_of, item ids, low + high volume over the held day) as currently held, without catching up: a cheap
+        read for callers that only rank by volume.
+        """
+        with self._lock:
+            return self.as_of, self._item_ids.copy(), self._sum_low + self._sum_high
+
+    def mids(self, db: Session, now: int) -> tuple[int, np.ndarray, np.ndarray] | None:
+        """
+        (as_of, item ids, items × 288 mid prices oldest first) for the day ending at bucket `now`, after catching
+        up like `snapshot`. Buckets not ingested (or where an item did not trade both sides) are NaN; None until
+        bucket `now` itself is held.
+        """
+        self.snapshot(db, now)
+        with self._lock:
+            if self.as_of != now:
+                return None
+            expected = self._expected(now)
+            slots = (expected // STEP_SECONDS) % WINDOW_BUCKETS
+            active = np.nonzero(self._count > 0)[0]
+            mids = self._mid[np.ix_(active, slots)]
+            mids[:, self._slot_ts[slots] != expected] = np.nan
+            return now, self._item_ids[active], mids
+
+    def _summarize(self) -> Summary:
+        assert self.as_of is not None
+        active = np.nonzero(self._count > 0)[0]
+        # Slots in time order, oldest first, for "last price".
+        order = np.argsort(self._slot_ts)
+        avg_low = self._avg_low[active][:, order]
+        finite = np.isfinite(avg_low)
+        last_idx = WINDOW_BUCKETS - 1 - np.argmax(finite[:, ::-1], axis=1)
+        last_price = np.where(finite.any(axis=1), avg_low[np.arange(active.size), last_idx], np.nan)
+
+        mids = self._mid[active]
+        median_mid = _nanmedian_rows(mids) if active.size else np.empty(0)
+        median_mid[np.isfinite(mids).sum(axis=1) < 3] = np.nan
+        return Summary(
+            as_of=self.as_of,
+            item_ids=self._item_ids[active],
+            low_vol_24h=self._sum_low[active],
+            daily_volume_24h=self._sum_low[active] + self._sum_high[active],
+            trade_buckets_24h=self._count[active],
+            last_price=last_price,
+            median_mid=median_mid,
+        )
+
+
+_index = SummaryIndex()
+
+
+def get_summary_index() -> SummaryIndex:
+    return _index
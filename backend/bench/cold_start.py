@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any
+
+import httpx
+
+
+def _wait_for(fn: Any, *, timeout: float, interval: float = 0.05) -> float:
+    t0 = time.perf_counter()
+    while True:
+        try:
+            if fn():
+                return time.perf_counter() - t0
+        except httpx.HTTPError:
+            pass
+        if time.perf_counter() - t0 > timeout:
+            raise TimeoutError("server did not become ready")
+        time.sleep(interval)
+
+
+def _stage_ms(payload: dict[str, Any]) -> dict[str, float]:
+    stages = payload.get("meta", {}).get("timings", {}).get("stages", {})
+    return {name: s["ms"] for name, s in stages.items()}
+
+
+def _drop_hot_window(name: str) -> None:
+    # A new container starts without the shared segment; don't let a previous run's segment mask the cold start.
+    from multiprocessing import shared_memory
+
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def measure_once(*, port: int, env: dict[str, str], body: dict[str, Any], timeout: float) -> dict[str, Any]:
+    """
+    Start `uvicorn app.main:app` in a fresh process and time: process start -> /api/health answers, and process
+    start -> first successful POST /api/scan, plus the latency of that scan and of the one after it.
+    """
+    base = f"http://127.0.0.1:{port}"
+    if env.get("HOT_WINDOW_NAME"):
+        _drop_hot_window(env["HOT_WINDOW_NAME"])
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+    try:
+        with httpx.Client(base_url=base, timeout=timeout) as client:
+            _wait_for(lambda: client.get("/api/health").status_code == 200, timeout=timeout)
+            ready_s = time.perf_counter() - t0
+
+            t1 = time.perf_counter()
+            first = client.post("/api/scan", params={"timings": "true"}, json=body)
+            first.raise_for_status()
+            first_scan_s = time.perf_counter() - t1
+            first_ok_s = time.perf_counter() - t0
+
+            t2 = time.perf_counter()
+            second = client.post("/api/scan", params={"timings": "true"}, json=body)
+            second.raise_for_status()
+            second_scan_s = time.perf_counter() - t2
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        "ready_s": round(ready_s, 3),
+        "first_scan_s": round(first_scan_s, 3),
+        "time_to_first_scan_s": round(first_ok_s, 3),
+        "second_scan_s": round(second_scan_s, 3),
+        "first_scan_stages_ms": _stage_ms(first.json()),
+        "second_scan_stages_ms": _stage_ms(second.json()),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Measure time from process start to the first successful /api/scan.")
+    p.add_argument("--port", type=int, default=8790)
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--timeout", type=float, default=300.0)
+    p.add_argument("--env", action="append", default=[], help="KEY=VALUE set for the server (repeatable).")
+    p.add_argument("--body", default="{}", help="JSON ScanRequest body.")
+    args = p.parse_args(argv)
+
+    env = dict(kv.split("=", 1) for kv in args.env)
+    runs = [measure_once(port=args.port, env=env, body=json.loads(args.body), timeout=args.timeout) for _ in range(args.runs)]
+    print(json.dumps({"env": env, "runs": runs}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+from bench.synthetic import SyntheticMarket
+
+
+def create_fake_app(market: SyntheticMarket) -> FastAPI:
+    """
+    Local stand-in for the OSRS Wiki prices API, serving `market`. Point `OSRS_BASE_URL` at it.
+    """
+    app = FastAPI(title="Fake OSRS prices API")
+
+    @app.get("/mapping")
+    def mapping() -> JSONResponse:
+        return JSONResponse(market.mapping_payload())
+
+    @app.get("/5m")
+    def five_minute(timestamp: int | None = None) -> JSONResponse:
+        ts = timestamp if timestamp is not None else int(time.time()) - 300
+        return JSONResponse(market.five_minute_payload(ts))
+
+    @app.get("/latest")
+    def latest() -> JSONResponse:
+        return JSONResponse(market.latest_payload(int(time.time())))
+
+    @app.get("/1h")
+    def one_hour(timestamp: int | None = None) -> JSONResponse:
+        ts = timestamp if timestamp is not None else int(time.time()) - 3600
+        return JSONResponse(market.hour_payload(ts))
+
+    @app.get("/timeseries")
+    def timeseries(id: int = Query(...), timestep: str = Query(...)) -> JSONResponse:
+        return JSONResponse(market.timeseries_payload(id, timestep))
+
+    return app
+
+
+class FakeOsrsServer:
+    """
+    Runs the fake API with uvicorn on a background thread (for harnesses that also import `app`).
+    """
+
+    def __init__(self, market: SyntheticMarket, *, host: str = "127.0.0.1", port: int = 8765) -> None:
+        import uvicorn
+
+        self.base_url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(create_fake_app(market), host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + 10.0
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"fake OSRS API failed to start on {self.base_url}")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a synthetic OSRS prices API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--items", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    market = SyntheticMarket(n_items=args.items, seed=args.seed)
+    uvicorn.run(create_fake_app(market), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
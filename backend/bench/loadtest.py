@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import numpy as np
+
+from bench.synthetic import SyntheticMarket
+
+ENDPOINTS = ("scan", "spreads", "series")
+
+# Scan bodies cycled through by the generator: a few distinct requests, like several users with their own filters.
+_SCAN_BODIES: tuple[dict[str, Any], ...] = (
+    {},
+    {"min_drop_pct": 0.12, "sort_by": "biggest_volume"},
+    {"baseline_hours": 12, "still_low_blocks": 6},
+    {"baseline_resolution": "1h", "baseline_hours": 48},
+)
+
+
+@dataclass(frozen=True)
+class Sample:
+    endpoint: str
+    stage: int
+    scheduled_s: float  # offset from the start of the run
+    latency_s: float  # from the scheduled send time (open loop: includes any client-side queueing)
+    status: int  # HTTP status; 0 for transport errors and timeouts, -1 when max_in_flight was reached
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """
+    "scan=6,spreads=1,series=3" -> normalized weights per endpoint.
+    """
+    weights: dict[str, float] = {}
+    for part in text.split(","):
+        name, _, w = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r} (expected one of {', '.join(ENDPOINTS)})")
+        weights[name] = float(w or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("mix weights must sum to more than 0")
+    return {k: v / total for k, v in weights.items() if v > 0}
+
+
+def arrivals(rates: list[float], stage_seconds: float, rng: np.random.Generator) -> Iterator[tuple[int, float]]:
+    """
+    (stage, offset) of each request: a Poisson process at rates[stage] req/s for `stage_seconds` per stage.
+    """
+    for stage, rate in enumerate(rates):
+        start, t = stage * stage_seconds, 0.0
+        while rate > 0:
+            t += float(rng.exponential(1.0 / rate))
+            if t >= stage_seconds:
+                break
+            yield stage, start + t
+
+
+class RequestFactory:
+    def __init__(self, market: SyntheticMarket, rng: np.random.Generator, *, conditional: bool) -> None:
+        # Series requests favour active items, like a user looking at what a scan returned.
+        p = market.activity / market.activity.sum()
+        self._series_items = rng.choice(market.item_ids, size=256, p=p).tolist()
+        self._rng = rng
+        self._conditional = conditional
+        self._etags: dict[tuple[str, str], str] = {}
+
+    def build(self, endpoint: str) -> tuple[str, str, dict[str, Any] | None]:
+        if endpoint == "scan":
+            return "POST", "/api/scan", _SCAN_BODIES[int(self._rng.integers(len(_SCAN_BODIES)))]
+        if endpoint == "spreads":
+            return "POST", "/api/spreads/scan", {}
+        item_id = self._series_items[int(self._rng.integers(len(self._series_items)))]
+        return "GET", f"/api/items/{item_id}/series", None
+
+    def headers(self, method: str, url: str, body: dict[str, Any] | None) -> dict[str, str]:
+        # With --conditional, behave like a polling browser: revalidate with the ETag of the last response.
+        etag = self._etags.get((url, json.dumps(body, sort_keys=True))) if self._conditional else None
+        return {"If-None-Match": etag} if etag else {}
+
+    def remember(self, url: str, body: dict[str, Any] | None, resp: httpx.Response) -> None:
+        if self._conditional and resp.headers.get("etag"):
+            self._etags[(url, json.dumps(body, sort_keys=True))] = resp.headers["etag"]
+
+
+async def run_load(
+    http: httpx.AsyncClient,
+    factory: RequestFactory,
+    *,
+    mix: dict[str, float],
+    rates: list[float],
+    stage_seconds: float,
+    max_in_flight: int,
+    rng: np.random.Generator,
+) -> list[Sample]:
+    """
+    Open-loop load: requests are sent on the arrival schedule whether or not earlier ones have finished, so a
+    saturated server shows up as growing latency rather than as a lower request rate.
+    """
+    names = list(mix)
+    weights = np.array([mix[n] for n in names])
+    samples: list[Sample] = []
+    in_flight = 0
+    tasks: set[asyncio.Task[None]] = set()
+    t0 = time.perf_counter()
+
+    async def one(endpoint: str, stage: int, offset: float) -> None:
+        nonlocal in_flight
+        method, url, body = factory.build(endpoint)
+        status = 0
+        try:
+            resp = await http.request(method, url, json=body, headers=factory.headers(method, url, body))
+            status = resp.status_code
+            factory.remember(url, body, resp)
+        except httpx.HTTPError:
+            pass
+        finally:
+            in_flight -= 1
+            samples.append(Sample(endpoint, stage, offset, time.perf_counter() - t0 - offset, status))
+
+    for stage, offset in arrivals(rates, stage_seconds, rng):
+        delay = offset - (time.perf_counter() - t0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        endpoint = names[int(rng.choice(len(names), p=weights))]
+        if in_flight >= max_in_flight:
+            samples.append(Sample(endpoint, stage, offset, 0.0, -1))
+            continue
+        in_flight += 1
+        task = asyncio.create_task(one(endpoint, stage, offset))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+    return samples
+
+
+def summarize(samples: list[Sample], seconds: float) -> dict[str, Any]:
+    """
+    Latency percentiles of successful (2xx/304) requests, error rate and completed throughput over `seconds`.
+    """
+    ok = [s.latency_s for s in samples if 200 <= s.status < 300 or s.status == 304]
+    lat = np.asarray(ok, dtype="float64") * 1000
+    statuses = Counter("client_saturated" if s.status == -1 else "transport_error" if s.status == 0 else str(s.status) for s in samples)
+    out: dict[str, Any] = {
+        "requests": len(samples),
+        "ok": len(ok),
+        "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+        "throughput_rps": len(ok) / seconds if seconds > 0 else 0.0,
+        "status": dict(sorted(statuses.items())),
+    }
+    if lat.size:
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        out.update(p50_ms=float(p50), p90_ms=float(p90), p99_ms=float(p99), max_ms=float(lat.max()), mean_ms=float(lat.mean()))
+    return out
+
+
+def report(samples: list[Sample], *, rates: list[float], stage_seconds: float, interval: float) -> dict[str, Any]:
+    """
+    Per-stage results (overall and per endpoint) plus a timeline of `interval`-second windows, keyed by when
+    requests were scheduled.
+    """
+
+    def by_endpoint(group: list[Sample], seconds: float) -> dict[str, Any]:
+        return {
+            "all": summarize(group, seconds),
+            **{e: summarize([s for s in group if s.endpoint == e], seconds) for e in ENDPOINTS if any(s.endpoint == e for s in group)},
+        }
+
+    stages = []
+    for i, rate in enumerate(rates):
+        group = [s for s in samples if s.stage == i]
+        stages.append({"stage": i, "offered_rps": rate, "seconds": stage_seconds, **by_endpoint(group, stage_seconds)})
+    timeline = []
+    end = len(rates) * stage_seconds
+    for w in range(int(np.ceil(end / interval))):
+        lo, hi = w * interval, min((w + 1) * interval, end)
+        group = [s for s in samples if lo <= s.scheduled_s < hi]
+        timeline.append({"t_s": lo, **by_endpoint(group, hi - lo)})
+    return {"stages": stages, "timeline": timeline}
+
+
+def _print_stages(stages: list[dict[str, Any]]) -> None:
+    print(f"{'stage':>5}{'offered':>9}{'endpoint':>10}{'ok':>7}{'err %':>8}{'rps':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for st in stages:
+        for name in ("all", *ENDPOINTS):
+            r = st.get(name)
+            if r is None:
+                continue
+            print(
+                f"{st['stage']:>5}{st['offered_rps']:>9.2f}{name:>10}{r['ok']:>7}{r['error_rate'] * 100:>8.1f}"
+                f"{r['throughput_rps']:>8.2f}{r.get('p50_ms', float('nan')):>10.1f}{r.get('p90_ms', float('nan')):>10.1f}"
+                f"{r.get('p99_ms', float('nan')):>10.1f}"
+            )
+
+
+@contextmanager
+def local_instance(market: SyntheticMarket, *, port: int, upstream_port: int, workers: int, env: dict[str, str], timeout: float) -> Iterator[str]:
+    """
+    The fake upstream (in this process) and `uvicorn app.main:app` (a subprocess) in front of DATABASE_URL.
+    """
+    from bench.fake_osrs import FakeOsrsServer
+
+    upstream = FakeOsrsServer(market, port=upstream_port)
+    upstream.start()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, "OSRS_BASE_URL": upstream.base_url, "OSRS_USER_AGENT": "runestreet-loadtest", **env},
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if httpx.get(f"{base}/api/health", timeout=5).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("backend did not become ready")
+            time.sleep(0.1)
+        yield base
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            # Still working through requests the generator gave up on.
+            proc.kill()
+            proc.wait()
+        upstream.stop()
+
+
+async def _drive(base_url: str, market: SyntheticMarket, args: argparse.Namespace, rates: list[float]) -> dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    factory = RequestFactory(market, rng, conditional=args.conditional)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as http:
+        if args.warmup:
+            # One of each request, not measured: ingests the scan windows so the run measures steady state.
+            for method, url, body in [*(("POST", "/api/scan", b) for b in _SCAN_BODIES), factory.build("spreads"), factory.build("series")]:
+                (await http.request(method, url, json=body)).raise_for_status()
+        samples = await run_load(
+            http,
+            factory,
+            mix=parse_mix(args.mix),
+            rates=rates,
+            stage_seconds=args.stage_seconds,
+            max_in_flight=args.max_in_flight,
+            rng=rng,
+        )
+    return report(samples, rates=rates, stage_seconds=args.stage_seconds, interval=args.interval)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Open-loop load test of /api/scan, /api/spreads/scan and /series.")
+    p.add_argument("--base-url", default=None, help="Target a running instance instead of starting one.")
+    p.add_argument("--mix", default="scan=6,spreads=1,series=3", help="Relative request weights per endpoint.")
+    p.add_argument("--rates", default="1,2,4,8", help="Comma-separated arrival rates (req/s), one stage each.")
+    p.add_argument("--stage-seconds", type=float, default=60.0)
+    p.add_argument("--interval", type=float, default=10.0, help="Timeline window (seconds).")
+    p.add_argument("--max-in-flight", type=int, default=256, help="Arrivals beyond this many open requests are dropped.")
+    p.add_argument("--request-timeout", type=float, default=120.0)
+    p.add_argument("--conditional", action="store_true", help="Send If-None-Match with the last ETag (polling clients).")
+    p.add_argument("--no-warmup", dest="warmup", action="store_false")
+    p.add_argument("--items", type=int, default=4000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--port", type=int, default=8791, help="Port for the local instance.")
+    p.add_argument("--upstream-port", type=int, default=8765, help="Port for the fake upstream.")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn workers of the local instance.")
+    p.add_argument("--env", action="append", default=[], help="KEY=VALUE set for the local instance (repeatable).")
+    p.add_argument("--startup-timeout", type=float, default=120.0)
+    p.add_argument("--json", dest="json_path", default=None, help="Write the full report as JSON.")
+    args = p.parse_args(argv)
+
+    rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    market = SyntheticMarket(n_items=args.items, seed=args.seed)
+    env = dict(kv.split("=", 1) for kv in args.env)
+    if args.base_url:
+        result = asyncio.run(_drive(args.base_url, market, args, rates))
+    else:
+        if not os.getenv("DATABASE_URL"):
+            print("DATABASE_URL is not set; point it at a local (disposable) Postgres or pass --base-url.", file=sys.stderr)
+            return 2
+        with local_instance(
+            market, port=args.port, upstream_port=args.upstream_port, workers=args.workers, env=env, timeout=args.startup_timeout
+        ) as base_url:
+            result = asyncio.run(_drive(base_url, market, args, rates))
+
+    _print_stages(result["stages"])
+    if args.json_path:
+        config = {k: v for k, v in vars(args).items() if k != "json_path"}
+        with open(args.json_path, "w") as f:
+            json.dump({"config": {**config, "env": env}, **result}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import numpy as np
+
+from bench.synthetic import SyntheticMarket
+
+
+def summarize(samples: list[float], *, units_per_op: int = 1) -> dict[str, float]:
+    """
+    Latency percentiles (ms) and throughput for a list of per-operation durations in seconds.
+    """
+    arr = np.asarray(samples, dtype="float64")
+    total = float(arr.sum())
+    return {
+        "n": int(arr.size),
+        "p50_ms": float(np.percentile(arr, 50) * 1000),
+        "p95_ms": float(np.percentile(arr, 95) * 1000),
+        "mean_ms": float(arr.mean() * 1000),
+        "ops_per_s": (arr.size / total) if total > 0 else float("inf"),
+        "units_per_s": (arr.size * units_per_op / total) if total > 0 else float("inf"),
+    }
+
+
+def _time_sync(fn: Callable[[], Any], iterations: int, *, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+async def _time_async(fn: Callable[[], Awaitable[Any]], iterations: int, *, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        await fn()
+    out = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+# ---- compute-only benchmarks (no DB, no network) -----------------------------
+
+
+def _window_matrix(market: SyntheticMarket, blocks: int) -> dict[str, np.ndarray]:
+    """
+    items x buckets arrays for the `blocks` buckets ending at the market anchor (time ascending).
+    """
+    ts = market.anchor_ts - 300 * np.arange(blocks - 1, -1, -1, dtype="int64")
+    cols: dict[str, list[np.ndarray]] = {"avg_low": [], "avg_high": [], "low_vol": [], "high_vol": []}
+    for t in ts.tolist():
+        b = market.bucket_arrays(int(t))
+        for k in cols:
+            cols[k].append(b[k])
+    out = {k: np.stack(v, axis=1) for k, v in cols.items()}
+    out["bucket_ts"] = ts
+    return out
+
+
+def bench_compute(market: SyntheticMarket, iterations: int) -> dict[str, dict[str, float]]:
+    from app.scan.compute import scan_item_series, scan_window_blocks
+    from app.scan.schemas import ScanRequest
+    from app.spreads.compute import compute_daily_metrics_from_5m
+
+    req = ScanRequest()
+    w = _window_matrix(market, scan_window_blocks(req))
+    n = market.n_items
+
+    # Like the API, an item's series only holds the buckets in which it traded (upstream omits the rest).
+    present = (w["low_vol"] > 0) | (w["high_vol"] > 0)
+    per_item = [(w["bucket_ts"][present[i]], w["avg_low"][i, present[i]], w["low_vol"][i, present[i]]) for i in range(n)]
+
+    def scan_all() -> None:
+        for i, (ts, avg_low, low_vol) in enumerate(per_item):
+            scan_item_series(item_id=int(market.item_ids[i]), name="x", bucket_ts=ts, avg_low=avg_low, low_vol=low_vol, req=req)
+
+    def daily_all() -> None:
+        for i in range(n):
+            compute_daily_metrics_from_5m(w["avg_low"][i, -288:], w["avg_high"][i, -288:], w["low_vol"][i, -288:], w["high_vol"][i, -288:])
+
+    return {
+        "scan_item_series[all items]": summarize(_time_sync(scan_all, iterations), units_per_op=n),
+        "compute_daily_metrics_from_5m[all items]": summarize(_time_sync(daily_all, iterations), units_per_op=n),
+    }
+
+
+# ---- DB + HTTP benchmarks (local Postgres, fake upstream) ----------------------
+
+
+async def bench_db(market: SyntheticMarket, iterations: int, *, port: int) -> dict[str, dict[str, float]]:
+    import httpx
+
+    from bench.fake_osrs import FakeOsrsServer
+
+    server = FakeOsrsServer(market, port=port)
+    server.start()
+    # Settings are read at import time, so point the app at the fake upstream before importing it.
+    os.environ["OSRS_BASE_URL"] = server.base_url
+    os.environ.setdefault("OSRS_USER_AGENT", "runestreet-bench")
+
+    from app.db.session import session_scope
+    from app.main import create_app
+    from app.osrs.client import OsrsPricesClient
+    from app.osrs.ingest import ensure_buckets_cached, ensure_mapping_cached, floor_to_5m, ingest_5m_bucket
+    from app.osrs.timeseries_24h import ensure_timeseries_24h_cached
+
+    results: dict[str, dict[str, float]] = {}
+    db = session_scope()
+    client = OsrsPricesClient()
+    try:
+        results["ensure_mapping_cached[forced]"] = summarize(
+            await _time_async(lambda: ensure_mapping_cached(db, client, max_age_seconds=0), max(1, iterations // 4)),
+            units_per_op=market.n_items,
+        )
+
+        now = floor_to_5m(int(time.time()))
+        ingest_ts = iter(now - 300 * (400 + i) for i in range(10_000))
+        results["ingest_5m_bucket"] = summarize(await _time_async(lambda: ingest_5m_bucket(db, client, next(ingest_ts)), iterations))
+
+        # Pre-fill the scan window so endpoint timings measure steady state, not first-run ingestion.
+        await ensure_buckets_cached(db, client, [now - 300 * i for i in range(300)])
+
+        ts_items = [int(i) for i in market.item_ids[:50]]
+        results["ensure_timeseries_24h_cached[50 items, forced]"] = summarize(
+            await _time_async(lambda: ensure_timeseries_24h_cached(db, client, ts_items, max_age_seconds=0), max(1, iterations // 4)),
+            units_per_op=len(ts_items),
+        )
+    finally:
+        await client.aclose()
+        db.close()
+
+    series_item = int(market.item_ids[int(np.argmax(market.activity))])
+    app = create_app()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=600.0) as http:
+
+            async def call(method: str, url: str, body: dict[str, Any] | None = None) -> None:
+                resp = await http.request(method, url, json=body)
+                resp.raise_for_status()
+
+            results["POST /api/scan"] = summarize(await _time_async(lambda: call("POST", "/api/scan", {}), iterations))
+            results["POST /api/spreads/scan"] = summarize(await _time_async(lambda: call("POST", "/api/spreads/scan", {}), iterations))
+            results["GET /api/items/{id}/series"] = summarize(
+                await _time_async(lambda: call("GET", f"/api/items/{series_item}/series"), iterations)
+            )
+    finally:
+        server.stop()
+    return results
+
+
+def _print_table(results: dict[str, dict[str, float]]) -> None:
+    width = max(len(k) for k in results) + 2
+    print(f"{'benchmark':<{width}}{'n':>5}{'p50 ms':>12}{'p95 ms':>12}{'ops/s':>10}{'items/s':>14}")
+    for name, r in results.items():
+        print(f"{name:<{width}}{r['n']:>5}{r['p50_ms']:>12.2f}{r['p95_ms']:>12.2f}{r['ops_per_s']:>10.2f}{r['units_per_s']:>14.0f}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a synthetic OSRS market.")
+    parser.add_argument("--items", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--compute-only", action="store_true", help="skip Postgres/HTTP benchmarks")
+    parser.add_argument("--port", type=int, default=8765, help="port for the fake upstream")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    market = SyntheticMarket(n_items=args.items, seed=args.seed)
+    results = bench_compute(market, args.iterations)
+    if not args.compute_only:
+        if not os.getenv("DATABASE_URL"):
+            print("DATABASE_URL is not set; use --compute-only or point it at a local (disposable) Postgres.", file=sys.stderr)
+            return 2
+        results.update(asyncio.run(bench_db(market, args.iterations, port=args.port)))
+
+    _print_table(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"items": args.items, "seed": args.seed, "iterations": args.iterations, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import numpy as np
+
+
+_BUY_LIMITS = np.array([8, 40, 70, 100, 125, 1000, 5000, 10000, 13000, 25000])
+_TIMESTEP_SECONDS = {"5m": 300, "1h": 3600, "6h": 6 * 3600, "24h": 24 * 3600}
+
+
+class SyntheticMarket:
+    """
+    Deterministic fake OSRS market.
+
+    Every item has a base price, a spread, a trading activity level and a volume scale. Roughly 40% of items
+    are liquid; the rest trade sparsely. A small fraction of items dump periodically: price drops by `depth`
+    with a volume shock, then recovers exponentially. The first dump of every dumping item falls within the 24h before `anchor_ts`,
+    so a default `/api/scan` against this market always has something to find.
+
+    Buckets are generated on demand from `(seed, bucket_ts)`, so any timestamp can be served without
+    storing history.
+    """
+
+    def __init__(self, *, n_items: int = 4000, seed: int = 7, anchor_ts: int | None = None, dump_fraction: float = 0.03) -> None:
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.n_items = n_items
+        anchor = int(time.time()) if anchor_ts is None else anchor_ts
+        self.anchor_ts = anchor - (anchor % 300)
+
+        self.item_ids = np.sort(rng.choice(np.arange(2, 30000), size=n_items, replace=False)).astype("int64")
+        self.base_price = np.exp(rng.uniform(np.log(5.0), np.log(5e7), size=n_items))
+        self.spread_pct = rng.uniform(0.005, 0.05, size=n_items)
+        # Liquid items trade in every bucket; the long tail trades sparsely.
+        self.activity = np.where(rng.random(n_items) < 0.4, 1.0, rng.beta(0.5, 1.5, size=n_items))
+        self.vol_scale = np.clip(2e6 / self.base_price, 1.0, 20000.0)
+        self.phase = rng.uniform(0.0, 2 * np.pi, size=n_items)
+        limits = rng.choice(_BUY_LIMITS, size=n_items)
+        self.buy_limit = np.where(rng.random(n_items) < 0.05, -1, limits)
+
+        self.dumping = rng.random(n_items) < dump_fraction
+        self.dump_period = (rng.uniform(12, 72, size=n_items) * 12).astype("int64") * 300
+        dump_anchor = self.anchor_ts - (rng.uniform(1, 20, size=n_items) * 12).astype("int64") * 300
+        self.dump_anchor = dump_anchor
+        self.dump_depth = rng.uniform(0.10, 0.40, size=n_items)
+        self.dump_tau = rng.uniform(3600, 6 * 3600, size=n_items)
+
+    # ---- generators -------------------------------------------------------
+
+    def _dump_state(self, ts: int) -> tuple[np.ndarray, np.ndarray]:
+        elapsed = (ts - self.dump_anchor) % self.dump_period
+        factor = np.where(self.dumping, 1.0 - self.dump_depth * np.exp(-elapsed / self.dump_tau), 1.0)
+        in_event = self.dumping & (elapsed < 2 * 300)
+        return factor, in_event
+
+    def bucket_arrays(self, ts: int) -> dict[str, np.ndarray]:
+        """
+        All-items arrays for one 5m bucket. Prices are NaN where that side did not trade.
+        """
+        rng = np.random.default_rng([self.seed, ts])
+        n = self.n_items
+        factor, in_event = self._dump_state(ts)
+        drift = 1.0 + 0.03 * np.sin(2 * np.pi * ts / 86400 + self.phase)
+        mid = self.base_price * drift * (1.0 + 0.01 * rng.standard_normal(n)) * factor
+
+        traded = (rng.random(n) < self.activity) | in_event
+        shock = np.where(in_event, 15.0, 1.0)
+        has_low = traded & ((rng.random(n) < 0.85) | in_event)
+        has_high = traded & (rng.random(n) < 0.85)
+
+        low_vol = np.where(has_low, rng.poisson(self.vol_scale * shock) + 1, 0)
+        high_vol = np.where(has_high, rng.poisson(self.vol_scale) + 1, 0)
+        avg_low = np.where(has_low, np.maximum(np.round(mid * (1 - self.spread_pct / 2)), 1.0), np.nan)
+        avg_high = np.where(has_high, np.maximum(np.round(mid * (1 + self.spread_pct / 2)), 1.0), np.nan)
+        return {"avg_low": avg_low, "avg_high": avg_high, "low_vol": low_vol.astype("float64"), "high_vol": high_vol.astype("float64")}
+
+    # ---- upstream-shaped payloads ----------------------------------------
+
+    def mapping_payload(self) -> list[dict[str, Any]]:
+        out = []
+        for i, item_id in enumerate(self.item_ids.tolist()):
+            value = int(max(1, round(self.base_price[i])))
+            limit = int(self.buy_limit[i])
+            out.append(
+                {
+                    "id": item_id,
+                    "name": f"Synthetic item {item_id}",
+                    "limit": None if limit < 0 else limit,
+                    "members": bool(item_id % 3),
+                    "value": value,
+                    "lowalch": int(value * 0.4),
+                    "highalch": int(value * 0.6),
+                    "icon": f"Synthetic_item_{item_id}.png",
+                    "examine": "Generated for benchmarks.",
+                }
+            )
+        return out
+
+    def hour_arrays(self, ts: int) -> dict[str, np.ndarray]:
+        """
+        All-items arrays for the 1h bucket starting at `ts`: volumes summed over its twelve 5m buckets and prices
+        volume-weighted, like the upstream /1h endpoint.
+        """
+        parts = [self.bucket_arrays(ts + 300 * k) for k in range(12)]
+        out: dict[str, np.ndarray] = {}
+        for price, vol in (("avg_low", "low_vol"), ("avg_high", "high_vol")):
+            v = np.sum([p[vol] for p in parts], axis=0)
+            pv = np.sum([np.where(p[vol] > 0, np.nan_to_num(p[price]) * p[vol], 0.0) for p in parts], axis=0)
+            out[vol] = v
+            out[price] = np.where(v > 0, np.round(pv / np.maximum(v, 1.0)), np.nan)
+        return out
+
+    def five_minute_payload(self, ts: int) -> dict[str, Any]:
+        ts = ts - (ts % 300)
+        return self._bucket_payload(ts, self.bucket_arrays(ts))
+
+    def hour_payload(self, ts: int) -> dict[str, Any]:
+        ts = ts - (ts % 3600)
+        return self._bucket_payload(ts, self.hour_arrays(ts))
+
+    def latest_payload(self, ts: int) -> dict[str, Any]:
+        """
+        `/latest`-shaped payload at `ts`: each side's price from the 5m bucket in progress, or the one before it.
+        """
+        cur = ts - (ts % 300)
+        data: dict[str, Any] = {}
+        for start in (cur - 300, cur):
+            b = self.bucket_arrays(start)
+            for side, key in (("low", "avg_low"), ("high", "avg_high")):
+                for i in np.nonzero(np.isfinite(b[key]))[0].tolist():
+                    row = data.setdefault(str(int(self.item_ids[i])), {})
+                    row[side] = int(b[key][i])
+                    row[f"{side}Time"] = min(ts, start + 150)
+        return {"data": data}
+
+    def _bucket_payload(self, ts: int, b: dict[str, np.ndarray]) -> dict[str, Any]:
+        data: dict[str, Any] = {}
+        traded = np.nonzero((b["low_vol"] > 0) | (b["high_vol"] > 0))[0]
+        for i in traded.tolist():
+            lo = b["avg_low"][i]
+            hi = b["avg_high"][i]
+            data[str(int(self.item_ids[i]))] = {
+                "avgHighPrice": None if np.isnan(hi) else int(hi),
+                "highPriceVolume": int(b["high_vol"][i]),
+                "avgLowPrice": None if np.isnan(lo) else int(lo),
+                "lowPriceVolume": int(b["low_vol"][i]),
+            }
+        return {"data": data, "timestamp": ts}
+
+    def timeseries_payload(self, item_id: int, timestep: str) -> dict[str, Any]:
+        step = _TIMESTEP_SECONDS.get(timestep)
+        pos = np.searchsorted(self.item_ids, item_id)
+        if step is None or pos >= self.n_items or self.item_ids[pos] != item_id:
+            return {"data": [], "itemId": item_id}
+
+        # Upstream returns up to 365 points ending at the latest completed step.
+        end = self.anchor_ts - (self.anchor_ts % step)
+        ts = end - step * np.arange(364, -1, -1, dtype="int64")
+        rng = np.random.default_rng([self.seed, item_id, step])
+        noise = 1.0 + 0.02 * rng.standard_normal(ts.size) * np.sqrt(step / 300)
+        mid = self.base_price[pos] * (1.0 + 0.03 * np.sin(2 * np.pi * ts / 86400 + self.phase[pos])) * np.maximum(noise, 0.2)
+        vol = rng.poisson(self.vol_scale[pos] * self.activity[pos] * step / 300, size=(2, ts.size))
+        half = self.spread_pct[pos] / 2
+        return {
+            "data": [
+                {
+                    "timestamp": int(t),
+                    "avgHighPrice": int(max(1, round(m * (1 + half)))),
+                    "highPriceVolume": int(hv),
+                    "avgLowPrice": int(max(1, round(m * (1 - half)))),
+                    "lowPriceVolume": int(lv),
+                }
+                for t, m, hv, lv in zip(ts.tolist(), mid.tolist(), vol[0].tolist(), vol[1].tolist())
+            ],
+            "itemId": item_id,
+        }
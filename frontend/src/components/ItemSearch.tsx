@@ -0,0 +1,102 @@
+import React, { useEffect, useState } from "react";
+import { Sparkline } from "./Sparkline";
+
+type ItemSearchResult = {
+  item_id: number;
+  name: string;
+  buy_limit?: number | null;
+  daily_volume_24h: number;
+  match: "exact" | "prefix" | "word_prefix" | "fuzzy";
+};
+
+type ItemSearchResponse = {
+  query: string;
+  results: ItemSearchResult[];
+};
+
+export function ItemSearch({ apiBaseUrl }: { apiBaseUrl: string }) {
+  const [query, setQuery] = useState("");
+  const [results, setResults] = useState<ItemSearchResult[]>([]);
+  const [selected, setSelected] = useState<ItemSearchResult | null>(null);
+  const [err, setErr] = useState<string | null>(null);
+
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) {
+      setResults([]);
+      return;
+    }
+    // Debounced; the index answers in microseconds, so this only saves requests while typing.
+    const ac = new AbortController();
+    const t = window.setTimeout(() => {
+      fetch(`${apiBaseUrl}/api/items/search?q=${encodeURIComponent(q)}&limit=8`, { signal: ac.signal })
+        .then((r) => {
+          if (!r.ok) throw new Error(`HTTP ${r.status}`);
+          return r.json();
+        })
+        .then((j) => {
+          setErr(null);
+          setResults((j as ItemSearchResponse).results);
+        })
+        .catch((e) => {
+          if (ac.signal.aborted) return;
+          setErr(e instanceof Error ? e.message : String(e));
+        });
+    }, 120);
+    return () => {
+      window.clearTimeout(t);
+      ac.abort();
+    };
+  }, [apiBaseUrl, query]);
+
+  return (
+    <div style={{ position: "relative", margin: "12px 0" }}>
+      <input
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        placeholder="Look up an item…"
+        style={{ width: 320, padding: "6px 8px", border: "1px solid #ddd" }}
+      />
+      {err ? <span style={{ color: "crimson", fontSize: 12, marginLeft: 8 }}>search error: {err}</span> : null}
+      {results.length > 0 ? (
+        <ul
+          style={{
+            position: "absolute",
+            zIndex: 1,
+            listStyle: "none",
+            margin: 0,
+            padding: 0,
+            width: 320,
+            background: "white",
+            border: "1px solid #ddd",
+          }}
+        >
+          {results.map((r) => (
+            <li key={r.item_id}>
+              <button
+                onClick={() => {
+                  setSelected(r);
+                  setQuery("");
+                }}
+                style={{ width: "100%", textAlign: "left", padding: "6px 8px", border: 0, background: "white" }}
+              >
+                {r.name} <span style={{ color: "#777", fontSize: 12 }}>#{r.item_id} · vol {r.daily_volume_24h.toLocaleString()}</span>
+              </button>
+            </li>
+          ))}
+        </ul>
+      ) : null}
+      {selected ? (
+        <div style={{ display: "flex", alignItems: "center", gap: 12, marginTop: 8 }}>
+          <div>
+            <div style={{ fontWeight: 600 }}>{selected.name}</div>
+            <div style={{ color: "#777", fontSize: 12 }}>
+              #{selected.item_id} · limit {selected.buy_limit ?? "?"} · 24h vol {selected.daily_volume_24h.toLocaleString()}
+            </div>
+          </div>
+          <Sparkline apiBaseUrl={apiBaseUrl} itemId={selected.item_id} hours={24} />
+        </div>
+      ) : null}
+    </div>
+  );
+}
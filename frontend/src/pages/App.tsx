@@ -1,10 +1,12 @@
 import React, { useMemo, useState } from "react";
+import { ItemSearch } from "../components/ItemSearch";
 import { Sparkline } from "../components/Sparkline";
 
 type VolumeMode = "absolute" | "relative_to_baseline" | "daily_pct";
 
 type ScanRequest = {
   baseline_hours: number;
+  baseline_resolution: "5m" | "1h";
   event_window_blocks: number;
   still_low_blocks: number;
   min_drop_pct: number;
@@ -85,6 +87,7 @@ export function App() {
     <div style={{ fontFamily: "system-ui, sans-serif", padding: 20, maxWidth: 1100, margin: "0 auto" }}>
       <h1 style={{ margin: 0 }}>Runestreet</h1>
       <p style={{ marginTop: 8, color: "#555" }}>OSRS scanning tools (on-demand, cached in Postgres).</p>
+      <ItemSearch apiBaseUrl={base} />
 
       <div style={{ display: "flex", gap: 8, margin: "12px 0 18px" }}>
         <button
@@ -117,6 +120,7 @@ export function App() {
 function DumpTab({ apiBase }: { apiBase: string }) {
   const [req, setReq] = useState<ScanRequest>({
     baseline_hours: 6,
+    baseline_resolution: "5m",
     event_window_blocks: 1,
     still_low_blocks: 3,
     min_drop_pct: 0.07,
@@ -166,11 +170,22 @@ function DumpTab({ apiBase }: { apiBase: string }) {
             type="number"
             value={req.baseline_hours}
             min={1}
-            max={30}
+            max={req.baseline_resolution === "1h" ? 336 : 30}
             onChange={(e) => setReq({ ...req, baseline_hours: Number(e.target.value) })}
             style={{ width: "100%" }}
           />
         </label>
+        <label>
+          Baseline resolution
+          <select
+            value={req.baseline_resolution}
+            onChange={(e) => setReq({ ...req, baseline_resolution: e.target.value as ScanRequest["baseline_resolution"] })}
+            style={{ width: "100%" }}
+          >
+            <option value="5m">5m buckets (up to 30h)</option>
+            <option value="1h">1h buckets (up to 14 days)</option>
+          </select>
+        </label>
         <label>
           Event window blocks (5m)
           <input